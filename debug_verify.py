@@ -3,10 +3,19 @@
 DEBUG VERIFICATION REPORT
 Samsung One UI P2P File Transfer - Project Status Check
 Generated: 2025-01-22
+
+Also the performance regression gate:
+    python debug_verify.py --perf record    # store this machine's baseline
+    python debug_verify.py --perf compare   # rerun scenarios, exit 1 on regression
 """
 
+import argparse
 import ast
+import os
+import socket
 import sys
+import tempfile
+import threading
 from pathlib import Path
 from zipfile import ZipFile
 
@@ -207,22 +216,149 @@ def verify_features():
     
     return all_ok
 
-def main():
+def verify_mux_batch(files=40):
+    """Send more files than MUX_MAX_OPEN in one multiplexed batch over loopback and compare them."""
+    print("\n=== MULTIPLEXED BATCH VERIFICATION ===\n")
+    from p2p import ListeningEvent, MUX_MAX_OPEN, receive_file, send_files
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src, out = Path(tmp, "src"), Path(tmp, "out")
+        src.mkdir()
+        paths = []
+        for i in range(files):
+            path = src / f"dosya{i:02d}.bin"
+            path.write_bytes(os.urandom(1024 + 97 * i))
+            paths.append(path)
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+
+        listening = threading.Event()
+        failure = []
+
+        def observer(event):
+            if isinstance(event, ListeningEvent):
+                listening.set()
+
+        def receiver():
+            try:
+                receive_file("127.0.0.1", port, "0000", out, observer=observer)
+            except Exception as e:
+                failure.append(e)
+                listening.set()
+
+        thread = threading.Thread(target=receiver, daemon=True)
+        thread.start()
+        try:
+            if not listening.wait(10) or failure:
+                raise failure[0] if failure else TimeoutError("receiver did not start")
+            send_files("127.0.0.1", port, "0000", paths, observer=lambda event: None)
+            thread.join(30)
+            if failure:
+                raise failure[0]
+        except Exception as e:
+            print(f"[!] {files}-file batch failed: {e}")
+            return False
+
+        bad = [path.name for path in paths
+               if not (out / path.name).is_file() or (out / path.name).read_bytes() != path.read_bytes()]
+        if bad:
+            print(f"[!] {len(bad)} of {files} files missing or corrupt: {', '.join(bad[:5])}")
+            return False
+        print(f"[✓] {files} files (MUX_MAX_OPEN={MUX_MAX_OPEN}) arrived intact")
+        return True
+
+def verify_performance(mode, baseline_path, scenarios=None, repeat=None, thresholds=None):
+    """Run the loopback scenarios and record them as this machine's baseline or gate against it."""
+    print(f"\n=== PERFORMANCE GATE ({mode.upper()}) ===\n")
+    from p2p import (BaselineStore, GATE_MIN_REPEAT, GATE_REPEAT, compare_to_baseline, format_comparison,
+                     machine_fingerprint, machine_info, run_scenarios)
+
+    repeat = repeat or GATE_REPEAT
+    if mode == "compare" and repeat < GATE_MIN_REPEAT:
+        print(f"[!] --repeat {repeat} is too few to compare; use at least {GATE_MIN_REPEAT}.")
+        return False
+
+    machine = machine_info()
+    fingerprint = machine_fingerprint(machine)
+    store = BaselineStore.open(baseline_path)
+    print(f"[✓] Machine fingerprint: {fingerprint} ({machine['host']}, {machine['machine']}, "
+          f"{machine['cpus']} CPU, Python {machine['python']})")
+    baseline = store.scenarios(fingerprint)
+    if mode == "compare":
+        scenarios = [name for name in (scenarios or baseline) if name in baseline]
+        if not scenarios:
+            print(f"[!] No baseline for this machine in {baseline_path}; run with --perf record first.")
+            return True
+
+    results = run_scenarios(scenarios, repeat)
+    failed = [name for name, case in results.items() if not case.get("runs")]
+    for name in failed:
+        print(f"[!] {name}: {results[name].get('error', 'no runs')}")
+
+    if mode == "record":
+        store.record(fingerprint, machine, results)
+        store.save()
+        print(f"[✓] Baseline recorded: {baseline_path} ({len(results) - len(failed)} scenarios)")
+        return not failed
+
+    rows = compare_to_baseline(baseline, results, thresholds)
+    print(format_comparison(rows))
+    regressions = [row for row in rows if row["regressed"]]
+    if regressions:
+        print(f"\n[!] {len(regressions)} regression(s) against the baseline")
+    else:
+        print("\n[✓] No regressions against the baseline")
+    return not regressions
+
+
+def threshold_arg(value):
+    metric, _, fraction = value.partition("=")
+    try:
+        return metric, float(fraction)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected METRIC=FRACTION, got {value}") from None
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Project checks and performance regression gate.")
+    parser.add_argument("--perf", choices=("off", "compare", "record"), default="off",
+                        help="compare: rerun loopback scenarios against the stored baseline and fail on regression; "
+                             "record: store them as this machine's baseline.")
+    parser.add_argument("--baseline", type=Path, default=Path(__file__).with_name("perf_baseline.json"),
+                        help="Baseline store (JSON keyed by machine fingerprint and scenario).")
+    parser.add_argument("--scenario", action="append", default=None,
+                        help="Scenario to run (repeatable; default: all).")
+    parser.add_argument("--repeat", type=int, default=None, help="Runs per scenario.")
+    parser.add_argument("--threshold", type=threshold_arg, action="append", default=[], metavar="METRIC=FRACTION",
+                        help="Override a regression threshold, e.g. mib_s=0.05 (repeatable).")
+    parser.add_argument("--perf-only", action="store_true", help="Skip the project checks.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Run all verifications."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
     print("\n" + "="*60)
     print("DEBUG VERIFICATION REPORT")
     print("Samsung One UI P2P File Transfer")
     print("="*60)
     
-    results = {
-        'Python Syntax': verify_python_syntax(),
-        'Functions': verify_functions(),
-        'Buffer Optimization': verify_buffer_optimization(),
-        'File Structure': verify_file_structure(),
-        'Documentation': verify_documentation(),
-        'Features': verify_features(),
-        'Package Manager': verify_package_manager(),
-    }
+    results = {}
+    if not args.perf_only:
+        results.update({
+            'Python Syntax': verify_python_syntax(),
+            'Functions': verify_functions(),
+            'Buffer Optimization': verify_buffer_optimization(),
+            'File Structure': verify_file_structure(),
+            'Documentation': verify_documentation(),
+            'Features': verify_features(),
+            'Package Manager': verify_package_manager(),
+            'Multiplexed Batch': verify_mux_batch(),
+        })
+    if args.perf != "off":
+        results['Performance Gate'] = verify_performance(args.perf, args.baseline, args.scenario, args.repeat,
+                                                         dict(args.threshold))
     
     print("\n" + "="*60)
     print("VERIFICATION SUMMARY")
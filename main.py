@@ -7,10 +7,10 @@ requirements: kivy, kivymd, pillow, pyjnius
 """
 from __future__ import annotations
 
+import socket
 import threading
-from contextlib import redirect_stdout
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Optional
 
 try:
     from jnius import autoclass, cast
@@ -39,7 +39,10 @@ from kivymd.uix.scrollview import MDScrollView
 from kivymd.theme_cls import ThemeManager
 from kivy.garden.filebrowser import FileBrowser
 
-from p2p import send_file, receive_file, ensure_local
+from p2p import DIGEST_POLICIES, send_file, receive_file, ensure_local, prefetch_key, ConnectionPool, \
+    derive_key, peer_address, peer_table
+
+PIN_PREFETCH_DELAY = 0.4
 
 
 # Android native locks
@@ -89,21 +92,6 @@ class AndroidLocks:
             print(f"[!] Lock release hatası: {e}")
 
 
-class LogWriter:
-    """stdout'u MDApp log ekranına yönlendirmek için."""
-
-    def __init__(self, append_fn: Callable[[str], None]):
-        self.append_fn = append_fn
-
-    def write(self, data: str) -> None:
-        text = data.rstrip("\n")
-        if text:
-            self.append_fn(text)
-
-    def flush(self) -> None:
-        return
-
-
 class P2PApp(MDApp):
     def build(self):
         Window.size = (360, 800)
@@ -115,6 +103,8 @@ class P2PApp(MDApp):
         self.theme_cls.theme_style = "Light"
         
         self.mode = "send"
+        self.pool = ConnectionPool()  # aynı alıcıya sonraki gönderimler bağlantıyı yeniden kullanır
+        self._start_discovery()
         self.android_locks = AndroidLocks()
         self._running = False
         self._file_manager = None
@@ -211,6 +201,40 @@ class P2PApp(MDApp):
         scope_grid.add_widget(scope_switch)
         root.add_widget(scope_card)
         
+        # ===== RESUME TOGGLE (receive mode) =====
+        resume_card = MDCard(
+            MDGridLayout(
+                cols=2,
+                spacing="12dp",
+                size_hint_y=1,
+                padding="8dp",
+            ),
+            size_hint_y=None,
+            height="56dp",
+            md_bg_color=(1, 1, 1, 1),
+            radius=[24, 24, 24, 24],
+            elevation="1dp",
+        )
+        
+        resume_grid = resume_card.children[0]
+        resume_label = MDLabel(
+            text="YARIDA KALANI SÜRDÜR (AL)",
+            size_hint_x=0.5,
+            theme_text_color="Custom",
+            text_color=(0, 0, 0, 0.6),
+            font_style="Caption",
+        )
+        resume_switch = MDSwitch(
+            size_hint_x=0.5,
+            active=False,
+        )
+        self.resume_switch = resume_switch
+        self.resume_card = resume_card
+        
+        resume_grid.add_widget(resume_label)
+        resume_grid.add_widget(resume_switch)
+        root.add_widget(resume_card)
+        
         # ===== INPUT FIELDS =====
         scroll = MDScrollView(size_hint=(1, 1))
         form = MDGridLayout(cols=1, spacing="12dp", size_hint_y=None, padding="8dp")
@@ -229,6 +253,9 @@ class P2PApp(MDApp):
             md_bg_color=(242/255, 242/255, 242/255, 1),
         )
         form.add_widget(self.pin_input)
+        self._pin_event = None
+        self.pin_input.bind(text=self._on_pin_change)
+        prefetch_key(self.pin_input.text.strip())
         
         # Port field
         self.port_input = MDTextField(
@@ -256,9 +283,36 @@ class P2PApp(MDApp):
         )
         form.add_widget(self.chunk_input)
         
+        # Socket buffer field (empty: sized from the measured RTT)
+        self.sock_buf_input = MDTextField(
+            hint_text="Soket tamponu (bayt)",
+            text="",
+            mode="rectangle",
+            size_hint_x=1,
+            size_hint_y=None,
+            height="48dp",
+            input_filter="int",
+            helper_text="Boş: RTT ölçümüyle otomatik",
+            md_bg_color=(242/255, 242/255, 242/255, 1),
+        )
+        form.add_widget(self.sock_buf_input)
+        
+        # Digest policy field
+        self.digest_input = MDTextField(
+            hint_text="Özet ilkesi (" + " / ".join(DIGEST_POLICIES) + ")",
+            text="auto",
+            mode="rectangle",
+            size_hint_x=1,
+            size_hint_y=None,
+            height="48dp",
+            helper_text="fast: CRC-32, yalnızca güvenilir yerel ağda",
+            md_bg_color=(242/255, 242/255, 242/255, 1),
+        )
+        form.add_widget(self.digest_input)
+        
         # Host field (send mode)
         self.host_input = MDTextField(
-            hint_text="Alıcı host (GÖNDER modu)",
+            hint_text="Alıcı host ya da eş adı (GÖNDER modu)",
             text="192.168.1.50",
             mode="rectangle",
             size_hint_x=1,
@@ -353,6 +407,12 @@ class P2PApp(MDApp):
         self.log_label.height = max(self.log_label.texture_size[1], 150)
         self.log_label.text_size = (self.log_label.width, None)
     
+    def _on_pin_change(self, _instance, _text):
+        # PIN anahtarı yazma durunca arka planda türetilir; Başlat'a basıldığında hazırdır.
+        if self._pin_event is not None:
+            self._pin_event.cancel()
+        self._pin_event = Clock.schedule_once(lambda *_: prefetch_key(self.pin_input.text.strip()), PIN_PREFETCH_DELAY)
+
     def on_mode_toggle(self, _instance, value: bool):
         self.mode = "send" if value else "receive"
         self._toggle_visibility()
@@ -363,6 +423,8 @@ class P2PApp(MDApp):
         self.file_input.opacity = 1 if send_mode else 0
         self.bind_input.opacity = 1 if not send_mode else 0
         self.out_input.opacity = 1 if not send_mode else 0
+        self.resume_card.opacity = 1 if not send_mode else 0
+        self.resume_switch.disabled = send_mode
     
     def append_log(self, text: str) -> None:
         if not self.log_label.text.startswith("İşlem kayıtları"):
@@ -418,8 +480,9 @@ class P2PApp(MDApp):
         try:
             port = int(self.port_input.text)
             chunk_size = int(self.chunk_input.text)
-            if port <= 0 or port > 65535 or chunk_size <= 0:
-                raise ValueError("Port ve blok boyutu geçersiz")
+            sock_buf = int(self.sock_buf_input.text) if self.sock_buf_input.text.strip() else None
+            if port <= 0 or port > 65535 or chunk_size <= 0 or (sock_buf is not None and sock_buf <= 0):
+                raise ValueError("Port, blok boyutu veya soket tamponu geçersiz")
         except ValueError as e:
             self.append_log(f"[!] Hata: {e}")
             return
@@ -430,6 +493,10 @@ class P2PApp(MDApp):
             return
         
         local_only = bool(self.scope_switch.active)
+        digest = self.digest_input.text.strip().lower() or "auto"
+        if digest not in DIGEST_POLICIES:
+            self.append_log(f"[!] Özet ilkesi şunlardan biri olmalı: {', '.join(DIGEST_POLICIES)}")
+            return
         
         if self.mode == "send":
             host = self.host_input.text.strip()
@@ -440,38 +507,59 @@ class P2PApp(MDApp):
             if not file_path.exists():
                 self.append_log("[!] Gönderilecek dosya/klasör bulunamadı.")
                 return
+            # Yerel ağda duyurulan bir eş adı yazıldıysa adresi ve portu duyurudan alınır.
+            host, port = peer_address(host, port, derive_key(pin))
             if local_only:
                 try:
                     ensure_local(host)
                 except Exception as exc:
                     self.append_log(f"[!] {exc}")
                     return
-            target_fn = lambda: send_file(host, port, pin, file_path, chunk_size)
+            target_fn = lambda: self._send(host, port, pin, file_path, chunk_size, digest, sock_buf)
         else:
             bind_addr = self.bind_input.text.strip() or "0.0.0.0"
             output_dir = Path(self.out_input.text or ".")
+            resume = bool(self.resume_switch.active)
             if local_only:
                 try:
                     ensure_local(bind_addr)
                 except Exception as exc:
                     self.append_log(f"[!] {exc}")
                     return
-            target_fn = lambda: receive_file(bind_addr, port, pin, output_dir, chunk_size)
+            announce = socket.gethostname() if local_only else None  # yerel ağda bu adla duyur
+            target_fn = lambda: receive_file(bind_addr, port, pin, output_dir, chunk_size, resume=resume, digest=digest,
+                                             sock_buf=sock_buf, announce=announce, observer=self._on_event)
         
         self._run_thread(target_fn)
     
+    def _start_discovery(self):
+        # Yerel ağdaki alıcıların duyurularını arka planda dinle; host alanına eş adı yazılabilir.
+        try:
+            peer_table()
+        except OSError:
+            pass
+
+    def _send(self, host, port, pin, file_path, chunk_size, digest, sock_buf):
+        send_file(host, port, pin, file_path, chunk_size, digest=digest, sock_buf=sock_buf, pool=self.pool,
+                  observer=self._on_event)
+        report = self.pool.report()
+        Clock.schedule_once(lambda *_: self.append_log(report))
+
+    def _on_event(self, event):
+        # Aktarım olayları iş parçacığından gelir; günlüğe UI iş parçacığında yazılır.
+        if event.message is not None:
+            Clock.schedule_once(lambda *_: self.append_log(event.message))
+
     def _run_thread(self, target_fn):
         self._running = True
         self.start_btn.disabled = True
-        writer = LogWriter(lambda t: Clock.schedule_once(lambda *_: self.append_log(t)))
         
         # Acquire Android locks
         self.android_locks.acquire()
         
         def runner():
             try:
-                with redirect_stdout(writer):
-                    target_fn()
+                target_fn()
                 Clock.schedule_once(lambda *_: self.append_log("[✓] Tamamlandı."))
             except Exception as exc:
                 Clock.schedule_once(lambda *_: self.append_log(f"[!] Hata: {exc}"))
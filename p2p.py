@@ -6,250 +6,5303 @@ Gönderici ve alıcı aynı betiği kullanır; bir taraf `receive`, diğer taraf
 from __future__ import annotations
 
 import argparse
+import asyncio
+import contextvars
+import errno
+import glob
 import hmac
 import hashlib
 import ipaddress
+import json
+import math
+import mmap
+import os
+import platform
+import queue
+import random
 import secrets
+import select
 import shutil
 import socket
+import statistics
 import struct
 import sys
 import tempfile
+import threading
 import time
-from pathlib import Path
-from typing import Tuple
+import weakref
+import zlib
+from functools import partial
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from pathlib import Path, PurePosixPath
+from typing import Callable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import lzma
+except ImportError:  # Python built without liblzma
+    lzma = None
+
+try:
+    import numpy as np
+except ImportError:  # optional: vectorized delta scan
+    np = None
 
 
 MAGIC = b"P2P1"
+MAGIC_V2 = b"P2P2"
+# Session tickets: a sender asks for one with "ticket" in its first v2 header, a ticket-capable
+# receiver answers with the id in its reply, and the sender later resumes with MAGIC_RESUME.
+MAGIC_RESUME = b"P2PR"
+TICKET_ID_SIZE = 16
+TICKET_TTL = 600
+TICKET_LIMIT = 1024
+TICKETS_PER_PEER = 4
 HANDSHAKE_SALT = b"p2p-pin-salt"
 NONCE_SIZE = 16
 HASH_SIZE = 32
+KEY_CACHE_TTL = 900
+SEND_ENGINES = ("auto", "sendfile", "pipeline", "loop")
+RECV_ENGINES = ("auto", "recv_into", "pipeline", "splice", "loop")
+DIR_MODES = ("stream", "zip")
+# Already-compressed formats are stored as-is in the zip instead of being deflated again.
+STORED_EXTENSIONS = frozenset({
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".mp4", ".mkv", ".mov", ".avi", ".webm",
+    ".mp3", ".aac", ".ogg", ".opus", ".flac", ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar",
+    ".zst", ".apk", ".jar", ".docx", ".xlsx", ".pptx",
+})
+ZIP_SPOOL_LIMIT = 8 * 1024 * 1024
+# Multiplexed batch sessions: frame = type (B), stream id (I), payload length (I)
+MUX_HEADER = struct.Struct(">BII")
+MUX_OPEN, MUX_DATA, MUX_CLOSE, MUX_END, MUX_CREDIT, MUX_ACK = range(1, 7)
+MUX_FRAME_SIZE = 256 * 1024
+MUX_WINDOW = 4 * 1024 * 1024
+MUX_MAX_OPEN = 32
+# Below this size sendfile saves nothing worth a hashing thread; small files use the loop engine.
+SENDFILE_MIN_SIZE = 1024 * 1024
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+MAX_STREAMS = 16
+MIN_STREAM_RANGE = 1024 * 1024
+JOIN_TIMEOUT = 10
+# Connection reuse: serve keeps a finished connection open for the next header; pooled senders
+# drop idle ones well before that, and TCP keepalives catch peers that vanished meanwhile.
+KEEP_IDLE_TIMEOUT = 120.0
+POOL_IDLE_TIMEOUT = 60.0
+POOL_MAX_IDLE = 4
+KEEPALIVE_IDLE = 15
+KEEPALIVE_INTERVAL = 5
+KEEPALIVE_COUNT = 3
+# Connect: resolved addresses are raced RFC 8305 style (families interleaved, a new attempt every
+# CONNECT_ATTEMPT_DELAY until one succeeds) behind a small TTL-bounded resolver cache.
+CONNECT_TIMEOUT = 10
+CONNECT_ATTEMPT_DELAY = 0.25
+RESOLVE_TTL = 60.0
+RESOLVE_NEGATIVE_TTL = 5.0
+RESOLVE_CACHE_SIZE = 256
+# LAN discovery: receivers announce themselves over UDP multicast and broadcast; senders cache what they hear.
+DISCOVERY_GROUP = "239.255.80.50"
+DISCOVERY_PORT = 50550
+DISCOVERY_MAGIC = b"P2PD"
+DISCOVERY_MAX_DATAGRAM = 1400
+ANNOUNCE_INTERVAL = 2.0
+PEER_TTL = 3 * ANNOUNCE_INTERVAL + 1
+DISCOVERY_WAIT = 1.0
+CHECKPOINT_INTERVAL = 64 * 1024 * 1024
+MERKLE_BLOCK = 4 * 1024 * 1024
+MERKLE_REPAIR_ROUNDS = 2
+DIGESTS = ("sha256", "blake2b", "blake2s", "crc32")
+CRYPTO_DIGESTS = DIGESTS[:3]
+DIGEST_POLICIES = ("auto", "fast") + DIGESTS
+DIGEST_SAMPLE = 8 * 1024 * 1024
+# Delta transfers: op = type (B), two operands (I, I); signature entry = Adler-32 (I) + BLAKE2b-128
+DELTA_OP = struct.Struct(">BII")
+DELTA_COPY, DELTA_LITERAL, DELTA_END = range(1, 4)
+DELTA_WEAK = struct.Struct(">I")
+DELTA_STRONG_SIZE = 16
+DELTA_ENTRY_SIZE = DELTA_WEAK.size + DELTA_STRONG_SIZE
+DELTA_MIN_BLOCK = 2 * 1024
+DELTA_MAX_BLOCK = 128 * 1024
+DELTA_MAX_LITERAL = 1024 * 1024
+DELTA_SCAN = 1024 * 1024
+# Compressed payloads: chunk = codec (B), wire length (I), raw length (I)
+COMPRESS_HEADER = struct.Struct(">BII")
+CODECS = ("zlib", "lzma")
+COMPRESS_RAW = 0
+COMPRESS_POLICIES = ("off", "auto") + CODECS
+COMPRESS_PROBE = 8 * 1024
+COMPRESS_MIN_SAVING = 0.1
+COMPRESS_REPROBE = 16
+COMPRESS_WINDOW = 16
+# Adaptive chunk sizing: hill-climb between CHUNK_MIN and a share of the buffer pool, one step per epoch.
+CHUNK_POLICIES = ("static", "adaptive")
+CHUNK_MIN = 16 * 1024
+CHUNK_POOL_SHARE = 8
+CHUNK_EPOCH = 0.1
+CHUNK_EPOCH_CALLS = 4
+CHUNK_TOLERANCE = 0.05
+CHUNK_HOLD = 4
+# Progress events are sampled: at most one per PROGRESS_INTERVAL seconds per payload (plus a final one).
+PROGRESS_INTERVAL = 0.5
+# Link probe: timestamped pings after the v2 header, then socket buffers sized to the bandwidth-delay product.
+RTT_PINGS = 2
+RTT_PROBE_SIZE = 64 * 1024
+# A padded ping on a fresh connection is held back by slow start, so the rate never counts as below 1 Gbit/s.
+BDP_NOMINAL_RATE = 125_000_000
+BDP_MIN_BUFFER = 64 * 1024
+BDP_MAX_BUFFER = 64 * 1024 * 1024
+# Loopback benchmark (bench): synthetic files are written in BENCH_UNIT pieces of random bytes padded with
+# zeros to the requested compressibility, so per-block compression probes see the same mix as the whole file.
+BENCH_SIZE = 64 * 1024 * 1024
+BENCH_CHUNKS = (64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024)
+BENCH_REPEAT = 3
+BENCH_UNIT = 4096
+BENCH_PIN = "bench"
+BENCH_TIMEOUT = 600
+# Regression gate: standard scenarios compared against a per-machine baseline by median with a bootstrap
+# confidence interval; a metric regresses when it is worse by more than its threshold (and its absolute
+# noise floor, for millisecond timings) and the intervals do not overlap. Fewer than GATE_MIN_REPEAT runs
+# leave the interval on the raw values, so compare refuses them.
+BENCH_SCENARIOS = {
+    "dosya-64m": {"size": 64 * 1024 * 1024, "chunk_size": 1024 * 1024},
+    "dosya-64m-64k": {"size": 64 * 1024 * 1024, "chunk_size": 64 * 1024},
+    "dosya-64m-loop": {"size": 64 * 1024 * 1024, "chunk_size": 1024 * 1024, "engine": "loop"},
+    "sikistirma-16m": {"size": 16 * 1024 * 1024, "chunk_size": 1024 * 1024, "compressibility": 0.5,
+                       "compress": "auto"},
+    "gecikme-256k": {"size": 256 * 1024, "chunk_size": 1024 * 1024},
+}
+GATE_REPEAT = 7
+GATE_MIN_REPEAT = 5
+GATE_METRICS = {"mib_s": "higher", "ttfb_ms": "lower", "cpu_s_per_gib": "lower"}
+GATE_THRESHOLDS = {"mib_s": 0.10, "ttfb_ms": 0.25, "cpu_s_per_gib": 0.15}
+GATE_NOISE_FLOOR = {"ttfb_ms": 2.0}
+GATE_CONFIDENCE = 0.95
+GATE_RESAMPLES = 2000
+
+
+def get_optimal_chunk_size(file_size: int) -> int:
+    """
+    Dynamically determine optimal TCP buffer size based on file size.
+    
+    - < 10 MB: 64 KB (low RAM footprint)
+    - 10 MB - 100 MB: 1 MB
+    - 100 MB - 1 GB: 4 MB
+    - > 1 GB: 8 MB (maximizes Gigabit LAN throughput)
+    """
+    if file_size < 10 * 1024 * 1024:  # < 10 MB
+        return 64 * 1024
+    elif file_size < 100 * 1024 * 1024:  # < 100 MB
+        return 1024 * 1024
+    elif file_size < 1024 * 1024 * 1024:  # < 1 GB
+        return 4 * 1024 * 1024
+    else:  # >= 1 GB
+        return 8 * 1024 * 1024
+
+
+def _pbkdf2_key(pin: str) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", pin.encode("utf-8"), HANDSHAKE_SALT, 100_000, dklen=32)
+
+
+class KeyCache:
+    """
+    In-process cache of PIN-derived keys so repeat transfers skip PBKDF2.
+
+    Entries are keyed by a hash of the PIN (the PIN itself is never stored) and
+    expire `ttl` seconds after derivation. Concurrent requests for the same PIN
+    share one derivation; prefetch() starts it in the background so it is done
+    by the time the user presses send/receive.
+    """
+
+    def __init__(self, ttl: float = KEY_CACHE_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[bytes, tuple[Future, float]] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, pin: str) -> Tuple[Future, bool]:
+        tag = hashlib.sha256(pin.encode("utf-8")).digest()
+        now = time.monotonic()
+        with self._lock:
+            for old in [t for t, (_, expires) in self._entries.items() if expires <= now]:
+                del self._entries[old]
+            entry = self._entries.get(tag)
+            if entry is not None:
+                self.hits += 1
+                return entry[0], False
+            self.misses += 1
+            future: Future = Future()
+            self._entries[tag] = (future, now + self.ttl)
+            return future, True
+
+    def _derive(self, pin: str, future: Future) -> None:
+        try:
+            future.set_result(_pbkdf2_key(pin))
+        except BaseException as exc:  # pylint: disable=broad-except
+            future.set_exception(exc)
+            self.forget(pin)
+
+    def get(self, pin: str) -> bytes:
+        future, owner = self._entry(pin)
+        if owner:
+            self._derive(pin, future)
+        return future.result()
+
+    def prefetch(self, pin: str) -> None:
+        """Start deriving the key for `pin` on a daemon thread unless it is cached or in flight."""
+        if not pin:
+            return
+        future, owner = self._entry(pin)
+        if owner:
+            threading.Thread(target=self._derive, args=(pin, future), daemon=True).start()
+
+    def forget(self, pin: str) -> None:
+        with self._lock:
+            self._entries.pop(hashlib.sha256(pin.encode("utf-8")).digest(), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+KEY_CACHE = KeyCache()
+
+
+def derive_key(pin: str) -> bytes:
+    """Derive a stable key from the PIN to use for HMAC authentication (cached, see KeyCache)."""
+    return KEY_CACHE.get(pin)
+
+
+def prefetch_key(pin: str) -> None:
+    """Derive the key for `pin` in the background, e.g. while the user is still typing it."""
+    KEY_CACHE.prefetch(pin)
+
+
+class BufferPool:
+    """
+    Bounded pool of reusable bytearrays shared by every transfer in the process.
+
+    Released buffers are cached per size and handed out again instead of being
+    reallocated. The total allocated (in use + cached) never exceeds max_bytes;
+    acquire() blocks until another transfer releases a buffer. A single request
+    larger than the limit is still served when nothing else is in use.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.allocated = 0
+        self.in_use = 0
+        self.peak = 0
+        self._free: dict[int, list[bytearray]] = {}
+        self._cond = threading.Condition()
+
+    def _drop_free(self, keep_size: int, needed: int) -> None:
+        for size, bufs in self._free.items():
+            while size != keep_size and bufs and self.allocated + needed > self.max_bytes:
+                bufs.pop()
+                self.allocated -= size
+
+    def acquire(self, size: int, block: bool = True) -> Optional[bytearray]:
+        """Take a buffer of exactly `size` bytes; with block=False return None instead of waiting."""
+        with self._cond:
+            while True:
+                cached = self._free.get(size)
+                if cached:
+                    buf = cached.pop()
+                    break
+                self._drop_free(size, size)
+                if self.allocated + size <= self.max_bytes or self.in_use == 0:
+                    buf = bytearray(size)
+                    self.allocated += size
+                    self.peak = max(self.peak, self.allocated)
+                    break
+                if not block:
+                    return None
+                self._cond.wait()
+            self.in_use += size
+            return buf
+
+    def release(self, buf: bytearray) -> None:
+        with self._cond:
+            self.in_use -= len(buf)
+            self._free.setdefault(len(buf), []).append(buf)
+            self._cond.notify_all()
+
+    @contextmanager
+    def buffer(self, size: int) -> Iterator[bytearray]:
+        buf = self.acquire(size)
+        try:
+            yield buf
+        finally:
+            self.release(buf)
+
+
+BUFFER_POOL = BufferPool()
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process (since the last reset_peak_rss), or None where unavailable."""
+    try:
+        with open("/proc/self/status", "rb") as status:
+            for line in status:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def reset_peak_rss() -> bool:
+    """Restart peak RSS tracking from the current RSS (Linux only); False where the peak cannot be reset."""
+    try:
+        with open("/proc/self/clear_refs", "w") as refs:
+            refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class TransferEvent:
+    """
+    Base of the typed events delivered to transfer observers. `message` is
+    the line the CLI prints for it (None: nothing to print), `transfer` the
+    label of the transfer it belongs to (the peer, for ReceiverDaemon) and
+    `time` its wall-clock timestamp.
+    """
+
+    kind = "event"
+
+    def __init__(self, message: Optional[str] = None):
+        self.message = message
+        self.transfer: Optional[str] = None
+        self.time = time.time()
+
+    def as_dict(self) -> dict:
+        return {"kind": self.kind, **self.__dict__}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={value!r}" for name, value in self.__dict__.items() if name != "time")
+        return f"{type(self).__name__}({fields})"
+
+
+class LogEvent(TransferEvent):
+    """A status line without structured data (negotiation results, warnings, reports)."""
+
+    kind = "log"
+
+
+class ListeningEvent(TransferEvent):
+    """The receiver's socket is listening."""
+
+    kind = "listening"
+
+    def __init__(self, bind: str, port: int, message: Optional[str] = None):
+        super().__init__(message)
+        self.bind = bind
+        self.port = port
+
+
+class HandshakeEvent(TransferEvent):
+    """PIN handshake completed with `peer` ("host:port") at protocol `version`; role is "send" or "receive"."""
+
+    kind = "handshake"
+
+    def __init__(self, role: str, peer: str, version: int, message: Optional[str] = None):
+        super().__init__(message)
+        self.role = role
+        self.peer = peer
+        self.version = version
+
+
+class StartEvent(TransferEvent):
+    """The payload of `name` (`size` bytes) is about to flow."""
+
+    kind = "start"
+
+    def __init__(self, role: str, name: str, size: int, message: Optional[str] = None):
+        super().__init__(message)
+        self.role = role
+        self.name = name
+        self.size = size
+
+
+class ProgressEvent(TransferEvent):
+    """`done` of `total` payload bytes moved; direction is "send" or "receive". Sampled (see TransferReporter)."""
+
+    kind = "progress"
+
+    def __init__(self, direction: str, done: int, total: int):
+        verb = "gönderildi" if direction == "send" else "alındı"
+        super().__init__(f"    {verb}: {done}/{total} bayt")
+        self.direction = direction
+        self.done = done
+        self.total = total
+
+
+class HashEvent(TransferEvent):
+    """
+    Integrity check of `size` bytes with `digest`: `wait` is the measured time
+    spent on the trailer (final digest and verification), `cost` the local
+    CPU estimate for hashing the whole payload (None until digest_costs ran).
+    """
+
+    kind = "hash"
+
+    def __init__(self, digest: str, size: int, wait: float, cost: Optional[float] = None):
+        super().__init__()
+        self.digest = digest
+        self.size = size
+        self.wait = wait
+        self.cost = cost
+
+
+class FinishedEvent(TransferEvent):
+    """A transfer finished and verified: `files` files, `size` bytes in `seconds`."""
+
+    kind = "finished"
+
+    def __init__(self, role: str, name: str, size: int, seconds: float, files: int = 1,
+                 message: Optional[str] = None):
+        super().__init__(message)
+        self.role = role
+        self.name = name
+        self.size = size
+        self.seconds = seconds
+        self.files = files
+        self.mib_s = size / seconds / (1024 * 1024) if seconds > 0 else 0.0
+
+
+class PrintObserver:
+    """
+    Observer that writes each event's message as one line to `stream`
+    (sys.stdout at the time of the event by default). This is the CLI's
+    subscriber; a lock keeps lines from concurrent transfers whole.
+    """
+
+    def __init__(self, stream=None, progress: bool = True):
+        self.stream = stream
+        self.progress = progress
+        self._lock = threading.Lock()
+
+    def __call__(self, event: TransferEvent) -> None:
+        if event.message is None or (not self.progress and isinstance(event, ProgressEvent)):
+            return
+        stream = self.stream or sys.stdout
+        with self._lock:
+            stream.write(event.message + "\n")
+            stream.flush()
+
+
+class _ProgressMeter:
+    """Counts the bytes of one payload (from any thread) and emits sampled ProgressEvents."""
+
+    def __init__(self, reporter: "TransferReporter", direction: str, total: int):
+        self.reporter = reporter
+        self.direction = direction
+        self.total = total
+        self.done = 0
+        self._next = time.monotonic() + (reporter.progress_interval or 0)
+        self._reported = False
+        self._lock = threading.Lock()
+
+    def add(self, n: int) -> None:
+        if self.reporter.progress_interval is None:
+            return
+        with self._lock:
+            self.done += n
+            done = self.done
+            now = time.monotonic()
+            if now < self._next and not (self._reported and done >= self.total):
+                return
+            self._next = now + self.reporter.progress_interval
+            self._reported = True
+        self.reporter.emit(ProgressEvent(self.direction, done, self.total))
+
+
+class TransferReporter:
+    """
+    Routes a transfer's events to its observer (a callable taking a
+    TransferEvent; PrintObserver when None) and labels them. Progress is
+    sampled to one event per `progress_interval` seconds per payload, plus a
+    final one if any was sent; 0 reports every chunk, None disables progress.
+    """
+
+    def __init__(self, observer: Optional[Callable[[TransferEvent], None]] = None,
+                 progress_interval: Optional[float] = PROGRESS_INTERVAL, label: Optional[str] = None):
+        self.observer = observer or _DEFAULT_OBSERVER
+        self.progress_interval = progress_interval
+        self.label = label
+
+    def emit(self, event: TransferEvent) -> None:
+        event.transfer = self.label
+        self.observer(event)
+
+    def meter(self, direction: str, total: int) -> _ProgressMeter:
+        return _ProgressMeter(self, direction, total)
+
+
+_DEFAULT_OBSERVER = PrintObserver()
+_REPORTER: contextvars.ContextVar = contextvars.ContextVar("p2p_reporter", default=None)
+
+
+def _reporter() -> TransferReporter:
+    """The current transfer's reporter (set by the public entry points), or one printing to stdout."""
+    reporter = _REPORTER.get()
+    if reporter is None:
+        reporter = TransferReporter()
+        _REPORTER.set(reporter)
+    return reporter
+
+
+def _log(message: str) -> None:
+    _reporter().emit(LogEvent(message))
+
+
+def _emit(event: TransferEvent) -> None:
+    _reporter().emit(event)
+
+
+@contextmanager
+def _observing(observer=None, progress_interval: Optional[float] = PROGRESS_INTERVAL,
+               label: Optional[str] = None) -> Iterator[TransferReporter]:
+    """Report this context's events (this thread or task) to observer."""
+    reporter = TransferReporter(observer, progress_interval, label)
+    token = _REPORTER.set(reporter)
+    try:
+        yield reporter
+    finally:
+        _REPORTER.reset(token)
+
+
+def _carry(fn, reporter: Optional[TransferReporter] = None):
+    """fn bound to the caller's reporter (or the given one), for work handed to another thread."""
+    reporter = reporter or _reporter()
+
+    def run(*args, **kwargs):
+        token = _REPORTER.set(reporter)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _REPORTER.reset(token)
+
+    return run
+
+
+def _hash_event(hasher, size: int, wait: float) -> HashEvent:
+    name = getattr(hasher, "digest_name", None) or getattr(hasher, "name", "sha256")
+    costs = _DIGEST_COSTS or {}
+    cost = costs[name] * size / (1 << 30) if name in costs else None
+    return HashEvent(name, size, wait, cost)
+
+
+class ChunkController:
+    """
+    Feedback-driven I/O block size for one direction of a transfer.
+
+    Engines ask for `size` before each read/send/recv call and report the bytes
+    moved and the seconds spent in the call. Every epoch (at least CHUNK_EPOCH
+    seconds and CHUNK_EPOCH_CALLS calls) the wall-clock throughput is compared
+    with the previous epoch: a gain keeps the size moving (doubling or halving),
+    a loss reverses the direction and steps back, and a result within
+    CHUNK_TOLERANCE holds the size for CHUNK_HOLD epochs before probing again.
+    Growth stops at 1/CHUNK_POOL_SHARE of the buffer pool (and MAX_FRAME_SIZE)
+    and whenever the pool is three quarters in use. Size changes are kept in
+    `trajectory` together with the throughput and the mean syscall cost.
+    """
+
+    def __init__(self, initial: int, minimum: int = CHUNK_MIN, maximum: Optional[int] = None):
+        self.minimum = minimum
+        self.maximum = maximum or max(minimum, min(MAX_FRAME_SIZE, BUFFER_POOL.max_bytes // CHUNK_POOL_SHARE))
+        self.size = min(max(initial, self.minimum), self.maximum)
+        self.direction = 1
+        self.total = self.calls = 0
+        self.syscall_seconds = 0.0
+        self.trajectory: list[Tuple[int, int, float, float]] = []
+        self._rate: Optional[float] = None
+        self._hold = 0
+        self._epoch_start: Optional[float] = None
+        self._epoch_bytes = self._epoch_calls = 0
+        self._epoch_syscall = 0.0
+
+    def record(self, nbytes: int, seconds: float) -> None:
+        """Account one call that moved `nbytes` in `seconds`; may change `size` for the next call."""
+        now = time.perf_counter()
+        if self._epoch_start is None:
+            self._epoch_start = now - seconds
+        self.total += nbytes
+        self.calls += 1
+        self.syscall_seconds += seconds
+        self._epoch_bytes += nbytes
+        self._epoch_calls += 1
+        self._epoch_syscall += seconds
+        elapsed = now - self._epoch_start
+        if elapsed >= CHUNK_EPOCH and self._epoch_calls >= CHUNK_EPOCH_CALLS:
+            self._adjust(self._epoch_bytes / elapsed, self._epoch_syscall / self._epoch_calls)
+            self._epoch_start = now
+            self._epoch_bytes = self._epoch_calls = 0
+            self._epoch_syscall = 0.0
+
+    def _adjust(self, rate: float, per_call: float) -> None:
+        previous, self._rate = self._rate, rate
+        if previous is not None and rate <= previous * (1 - CHUNK_TOLERANCE):
+            # The last step hurt: go back and settle there for a while.
+            self.direction = -self.direction
+            self._hold = CHUNK_HOLD
+        elif self._hold:
+            # Settling; probe again in the current direction once the hold runs out.
+            self._hold -= 1
+            if self._hold:
+                return
+        elif previous is not None and rate < previous * (1 + CHUNK_TOLERANCE):
+            self._hold = CHUNK_HOLD
+            return
+        if self.direction > 0 and BUFFER_POOL.in_use + self.size > BUFFER_POOL.max_bytes * 3 // 4:
+            self.direction = -1
+        new = min(max(self.size * 2 if self.direction > 0 else self.size // 2, self.minimum), self.maximum)
+        if new == self.size:
+            self.direction = -self.direction
+            return
+        self.trajectory.append((self.total, new, rate, per_call))
+        self.size = new
+
+    def report(self) -> str:
+        kib, mib = 1024, 1024 * 1024
+        steps = [f"{size // kib}K@{offset / mib:.0f}M ({rate / mib:.0f} MiB/s, {per_call * 1e6:.0f}µs/çağrı)"
+                 for offset, size, rate, per_call in self.trajectory]
+        if len(steps) > 12:
+            steps = steps[:4] + [f"... {len(steps) - 8} adım ..."] + steps[-4:]
+        per_call = self.syscall_seconds / self.calls if self.calls else 0.0
+        path = " -> ".join(steps) if steps else "değişmedi"
+        return (f"[+] Uyarlamalı blok boyutu: son {self.size // kib} KiB ({self.minimum // kib}-{self.maximum // kib} "
+                f"KiB), {self.calls} çağrı, ort. {per_call * 1e6:.0f}µs/çağrı; yol: {path}")
+
+
+def _pooled_view(bufs: list, index: int, size: int) -> memoryview:
+    """`size` bytes of pool buffer bufs[index], swapped for a larger one when an adaptive size outgrows it."""
+    if bufs[index] is None or len(bufs[index]) < size:
+        if bufs[index] is not None:
+            BUFFER_POOL.release(bufs[index])
+            bufs[index] = None
+        bufs[index] = BUFFER_POOL.acquire(size)
+    return memoryview(bufs[index])[:size]
+
+
+def _release_views(bufs: list) -> None:
+    for buf in bufs:
+        if buf is not None:
+            BUFFER_POOL.release(buf)
+
+
+def chunk_controller(policy: str, chunk_size: int) -> Optional[ChunkController]:
+    """A ChunkController starting at chunk_size for the adaptive policy, None for static."""
+    if policy not in CHUNK_POLICIES:
+        raise ValueError(f"Bilinmeyen blok boyutu ilkesi: {policy}")
+    return ChunkController(chunk_size) if policy == "adaptive" else None
+
+
+def _print_chunk_report(controller: Optional[ChunkController]) -> None:
+    if controller is not None and controller.calls:
+        _log(controller.report())
+
+
+def recv_exact_into(conn: socket.socket, buf) -> None:
+    """Fill the caller-supplied writable buffer completely or raise on unexpected EOF."""
+    view = memoryview(buf).cast("B")
+    got = 0
+    while got < len(view):
+        n = conn.recv_into(view[got:])
+        if not n:
+            raise ConnectionError("Bağlantı beklenmedik şekilde kapandı.")
+        got += n
+
+
+def recv_exact(conn: socket.socket, num_bytes: int) -> bytes:
+    """Receive exactly num_bytes or raise on unexpected EOF."""
+    if num_bytes == 0:
+        return b""
+    first = conn.recv(num_bytes)
+    if not first:
+        raise ConnectionError("Bağlantı beklenmedik şekilde kapandı.")
+    if len(first) == num_bytes:
+        return first
+    buf = bytearray(num_bytes)
+    buf[: len(first)] = first
+    recv_exact_into(conn, memoryview(buf)[len(first):])
+    return bytes(buf)
+
+
+class SessionTickets:
+    """
+    Single-use session resumption tickets (see handshake()).
+
+    After a full handshake the sender asks for a ticket in its first v2 header
+    and a ticket-capable receiver answers with a random ticket id in its reply
+    (older peers ignore both keys); both ends derive the ticket secret from the
+    PIN key and the handshake nonce.
+    The sender keeps it under the receiver's address, and its next connection to
+    that address opens with the id and an HMAC over it instead of waiting for the
+    nonce, which saves a round trip. Every redemption issues a fresh ticket whose
+    secret chains from the old one, and a redeemed id is never accepted again.
+    """
+
+    LABEL = b"P2P-ticket"
+
+    def __init__(self, ttl: float = TICKET_TTL):
+        self.ttl = ttl
+        self.resumed = 0
+        self._issued: dict[bytes, tuple[bytes, float, bytes]] = {}
+        self._held: dict[tuple, list[tuple[bytes, bytes, float]]] = {}
+        # Connections fresh from a full handshake: (key, nonce) until their first header is answered.
+        self._pending: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key_tag(key: bytes) -> bytes:
+        return hashlib.sha256(b"P2P-ticket-key" + key).digest()[:8]
+
+    @staticmethod
+    def _peer(conn: socket.socket) -> Optional[tuple]:
+        try:
+            return tuple(conn.getpeername()[:2])
+        except (OSError, TypeError):
+            return None
+
+    def _secret(self, base: bytes, nonce: bytes, ticket_id: bytes) -> bytes:
+        return hmac.new(base, self.LABEL + nonce + ticket_id, hashlib.sha256).digest()
+
+    def pend(self, conn: socket.socket, key: bytes, nonce: bytes) -> None:
+        """Record a full v2 handshake on conn (either end) so its first header can carry the ticket exchange."""
+        with self._lock:
+            self._pending[conn] = (key, nonce)
+
+    # Receiver side
+
+    def answer(self, conn: socket.socket, header: dict) -> dict:
+        """Reply fields for conn's header: a fresh ticket id if the sender asked for one after a full handshake."""
+        with self._lock:
+            pending = self._pending.pop(conn, None)
+        if pending is None or not header.get("ticket"):
+            return {}
+        key, nonce = pending
+        return {"ticket": self.issue(key, key, nonce).hex()}
+
+    def issue(self, key: bytes, base: bytes, nonce: bytes) -> bytes:
+        ticket_id = secrets.token_bytes(TICKET_ID_SIZE)
+        now = time.monotonic()
+        with self._lock:
+            for old in [t for t, (_, expires, _) in self._issued.items() if expires <= now]:
+                del self._issued[old]
+            while len(self._issued) >= TICKET_LIMIT:
+                del self._issued[next(iter(self._issued))]
+            self._issued[ticket_id] = (self._secret(base, nonce, ticket_id), now + self.ttl, self._key_tag(key))
+        return ticket_id
+
+    def redeem(self, key: bytes, message: bytes, proof: bytes) -> Optional[bytes]:
+        """Consume the ticket named in a resume message; returns its secret, or None if it is not valid."""
+        with self._lock:
+            entry = self._issued.pop(message[len(MAGIC_RESUME):len(MAGIC_RESUME) + TICKET_ID_SIZE], None)
+        if entry is None:
+            return None
+        secret, expires, key_tag = entry
+        expected = hmac.new(secret, message, hashlib.sha256).digest()
+        if expires <= time.monotonic() or key_tag != self._key_tag(key) or not hmac.compare_digest(proof, expected):
+            return None
+        self.resumed += 1
+        return secret
+
+    # Sender side
+
+    def wants(self, conn: socket.socket) -> bool:
+        """Whether conn's next header should ask for a ticket."""
+        with self._lock:
+            return conn in self._pending
+
+    def settle(self, conn: socket.socket, reply: dict) -> None:
+        """Keep the ticket the receiver put in its reply to conn's first header, if any."""
+        with self._lock:
+            pending = self._pending.pop(conn, None)
+        if pending is None or "ticket" not in reply:
+            return
+        try:
+            ticket_id = bytes.fromhex(str(reply["ticket"]))
+        except ValueError:
+            ticket_id = b""
+        if len(ticket_id) != TICKET_ID_SIZE:
+            raise ValueError("Geçersiz oturum bileti.")
+        key, nonce = pending
+        self.keep(conn, key, key, nonce, ticket_id)
+
+    def keep(self, conn: socket.socket, key: bytes, base: bytes, nonce: bytes, ticket_id: bytes) -> None:
+        peer = self._peer(conn)
+        if peer is None:
+            return
+        # Expire a little early so a ticket is never presented just as the receiver drops it.
+        expires = time.monotonic() + self.ttl * 0.9
+        with self._lock:
+            held = self._held.setdefault((peer, self._key_tag(key)), [])
+            held.append((ticket_id, self._secret(base, nonce, ticket_id), expires))
+            del held[:-TICKETS_PER_PEER]
+
+    def take(self, conn: socket.socket, key: bytes) -> Optional[tuple[bytes, bytes]]:
+        """Pop a live ticket for this connection's peer; returns (resume message + proof, secret)."""
+        peer = self._peer(conn)
+        if peer is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            held = self._held.get((peer, self._key_tag(key)), [])
+            while held:
+                ticket_id, secret, expires = held.pop()
+                if expires > now:
+                    break
+            else:
+                return None
+        message = MAGIC_RESUME + ticket_id + secrets.token_bytes(HASH_SIZE - len(MAGIC_RESUME) - TICKET_ID_SIZE)
+        return message + hmac.new(secret, message, hashlib.sha256).digest(), secret
+
+    def clear(self) -> None:
+        with self._lock:
+            self._issued.clear()
+            self._held.clear()
+            self._pending.clear()
+
+
+SESSION_TICKETS = SessionTickets()
+
+
+# --- protocol steps -------------------------------------------------------
+#
+# The control protocol (handshake, frames and replies, link probes, header
+# negotiation, the digest trailer and Merkle repair) is written once, as
+# generators that yield the I/O they need instead of doing it:
+#
+#   ("recv", n)         the next n bytes are sent back in
+#   ("send", data)      data is written out
+#   ("run", fn, *args)  blocking work (hashing, disk); its result is sent back
+#
+# _drive runs them on a blocking socket and _aio_drive on the event loop, so
+# the threaded and asyncio engines share one implementation. Bulk payload
+# loops stay specific to each.
+
+
+def _drive(conn: socket.socket, steps):
+    """Run protocol steps on a blocking socket; returns their result."""
+    value = None
+    while True:
+        try:
+            op = steps.send(value)
+        except StopIteration as done:
+            return done.value
+        if op[0] == "recv":
+            value = recv_exact(conn, op[1])
+        elif op[0] == "send":
+            conn.sendall(op[1])
+            value = None
+        else:
+            value = op[1](*op[2:])
+
+
+def handshake(conn: socket.socket, key: bytes, initiator: bool) -> int:
+    """
+    HMAC tabanlı karşılıklı doğrulama.
+    Server (alıcı) nonce gönderir; client (gönderici) HMAC ile yanıtlar.
+
+    Protokol sürümü de burada anlaşılır: v2 alıcı nonce'u MAGIC_V2 ile başlatır,
+    v2 gönderici bunu görünce HMAC'i MAGIC_V2 ile hesaplar. Eski (P2P1) uçlar
+    nonce'u yalnızca HMAC girdisi olarak gördüğünden etkilenmez.
+    Anlaşılan sürümü (1 veya 2) döndürür.
+
+    Tam doğrulamadan sonra gönderici ilk v2 başlığında bilet ister; bilet
+    destekleyen alıcı yanıtında bir oturum bileti verir. Aynı alıcıya sonraki bağlantıda gönderici nonce'u beklemeden
+    bileti sunar (bir gidiş-dönüş kazanılır); alıcı bileti tanımazsa "RT" ile
+    aynı nonce üzerinden tam doğrulamaya döner.
+    """
+    return _drive(conn, _handshake_steps(conn, key, initiator))
+
+
+def _handshake_steps(conn: socket.socket, key: bytes, initiator: bool):
+    """Protocol steps of handshake(); conn only keys the session tickets."""
+    if initiator:
+        resume = SESSION_TICKETS.take(conn, key)
+        if resume is not None:
+            yield "send", resume[0]
+        peer_nonce = yield "recv", NONCE_SIZE
+        version = 2 if peer_nonce.startswith(MAGIC_V2) else 1
+        if resume is not None:
+            status = yield "recv", 2
+            if status == b"OK":
+                SESSION_TICKETS.keep(conn, key, resume[1], peer_nonce, (yield "recv", TICKET_ID_SIZE))
+                return version
+            if status != b"RT":
+                raise PermissionError("Oturum bileti reddedildi (alıcı yeniden başlatılmış olabilir); tekrar deneyin.")
+        yield "send", _handshake_token(key, peer_nonce, version)
+        status = yield "recv", 2
+        if status != b"OK":
+            raise PermissionError("PIN doğrulaması başarısız.")
+        if version >= 2:
+            SESSION_TICKETS.pend(conn, key, peer_nonce)
+        return version
+    nonce = MAGIC_V2 + secrets.token_bytes(NONCE_SIZE - len(MAGIC_V2))
+    yield "send", nonce
+    token = yield "recv", HASH_SIZE
+    version = _check_handshake_token(key, nonce, token)
+    if not version and token.startswith(MAGIC_RESUME):
+        secret = SESSION_TICKETS.redeem(key, token, (yield "recv", HASH_SIZE))
+        if secret is not None:
+            yield "send", b"OK" + SESSION_TICKETS.issue(key, secret, nonce)
+            return 2
+        yield "send", b"RT"
+        version = _check_handshake_token(key, nonce, (yield "recv", HASH_SIZE))
+    if not version:
+        yield "send", b"NO"
+        raise PermissionError("PIN doğrulaması başarısız.")
+    yield "send", b"OK"
+    if version >= 2:
+        SESSION_TICKETS.pend(conn, key, nonce)
+    return version
+
+
+def _handshake_token(key: bytes, nonce: bytes, version: int) -> bytes:
+    magic = MAGIC_V2 if version == 2 else MAGIC
+    return hmac.new(key, magic + nonce, hashlib.sha256).digest()
+
+
+def _check_handshake_token(key: bytes, nonce: bytes, token: bytes) -> int:
+    """Protocol version the initiator's token proves, or 0 if it matches neither."""
+    for version in (2, 1):
+        if hmac.compare_digest(token, _handshake_token(key, nonce, version)):
+            return version
+    return 0
+
+
+def send_frame(conn: socket.socket, obj: dict) -> None:
+    """Send a length-prefixed JSON control frame (protocol v2)."""
+    conn.sendall(_encode_frame(obj))
+
+
+def recv_frame(conn: socket.socket) -> dict:
+    """Receive a length-prefixed JSON control frame (protocol v2)."""
+    return _drive(conn, _frame_steps())
+
+
+def _frame_steps():
+    length = struct.unpack(">I", (yield "recv", 4))[0]
+    if length > MAX_FRAME_SIZE:
+        raise ValueError("Kontrol çerçevesi çok büyük.")
+    return _decode_frame((yield "recv", length))
+
+
+def _encode_frame(obj: dict) -> bytes:
+    data = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    return struct.pack(">I", len(data)) + data
+
+
+def _decode_frame(data: bytes) -> dict:
+    obj = json.loads(data.decode("utf-8"))
+    if not isinstance(obj, dict):
+        raise ValueError("Geçersiz kontrol çerçevesi.")
+    return obj
+
+
+def recv_reply(conn: socket.socket) -> dict:
+    """
+    Read the receiver's reply to a v2 header, answering its link probe pings
+    first and surfacing a refusal (e.g. a busy daemon) as ConnectionError.
+    """
+    return _drive(conn, _reply_steps(conn))
+
+
+def _reply_steps(conn: socket.socket):
+    reply = yield from _frame_steps()
+    while "ping" in reply:
+        yield "send", _pong(reply, (yield "recv", _ping_pad(reply)))
+        reply = yield from _frame_steps()
+    if "error" in reply:
+        raise ConnectionError(f"Alıcı isteği reddetti: {reply['error']}")
+    SESSION_TICKETS.settle(conn, reply)
+    return reply
+
+
+def _ping_pad(frame: dict) -> int:
+    pad = int(frame.get("pad", 0))
+    if not 0 <= pad <= RTT_PROBE_SIZE:
+        raise ValueError("Geçersiz ping çerçevesi.")
+    return pad
+
+
+def _pong(ping: dict, pad: bytes) -> bytes:
+    return _encode_frame({"pong": ping["ping"], "t": ping.get("t"), "pad": len(pad)}) + pad
+
+
+def _ping_steps(pad: int):
+    """One timestamped ping carrying `pad` bytes each way; returns its round-trip time in seconds."""
+    sent = time.perf_counter_ns()
+    yield "send", _encode_frame({"ping": 1, "t": sent, "pad": pad}) + bytes(pad)
+    pong = yield from _frame_steps()
+    yield "recv", _ping_pad(pong)
+    if pong.get("t") != sent:
+        raise ValueError("Geçersiz ping yanıtı.")
+    return (time.perf_counter_ns() - sent) / 1e9
+
+
+def probe_link(conn: socket.socket) -> dict:
+    """
+    Measure the link from the receiving side before replying to a v2 header:
+    the fastest of RTT_PINGS empty pings is the round-trip time, and the extra
+    delay of one ping padded with RTT_PROBE_SIZE bytes each way gives a rough
+    rate (None when it is lost in the noise).
+    """
+    return _drive(conn, _probe_steps())
+
+
+def _probe_steps():
+    rtts = []
+    for _ in range(RTT_PINGS):
+        rtts.append((yield from _ping_steps(0)))
+    rtt = min(rtts)
+    extra = (yield from _ping_steps(RTT_PROBE_SIZE)) - rtt
+    return {"rtt": rtt, "rate": 2 * RTT_PROBE_SIZE / extra if extra > 0 else None}
+
+
+def _reply_link(reply: dict) -> Optional[dict]:
+    """The receiver's link measurement echoed in its reply, if it probed."""
+    if "rtt" not in reply:
+        return None
+    return {"rtt": float(reply["rtt"]), "rate": float(reply["rate"]) if reply.get("rate") else None}
+
+
+def bdp_bytes(link: dict) -> int:
+    """Bandwidth-delay product of a probed link, with the rate floored at BDP_NOMINAL_RATE."""
+    return int(max(link.get("rate") or 0, BDP_NOMINAL_RATE) * link["rtt"])
+
+
+def bdp_chunk(link: dict) -> int:
+    """Smallest power-of-two block covering the BDP, between 64 KiB and 8 MiB."""
+    return min(max(1 << max(bdp_bytes(link) - 1, 1).bit_length(), 64 * 1024), 8 * 1024 * 1024)
+
+
+def _sockbuf_limits(option: int) -> Optional[Tuple[int, int]]:
+    """(setsockopt cap, autotuning ceiling) for a Linux socket buffer, or None where /proc does not say."""
+    core, tcp = ("wmem_max", "tcp_wmem") if option == socket.SO_SNDBUF else ("rmem_max", "tcp_rmem")
+    try:
+        cap = int(Path(f"/proc/sys/net/core/{core}").read_text())
+        ceiling = int(Path(f"/proc/sys/net/ipv4/{tcp}").read_text().split()[2])
+    except (OSError, ValueError, IndexError):
+        return None
+    return cap, ceiling
+
+
+def tune_socket(conn: socket.socket, link: Optional[dict], sock_buf: Optional[int] = None) -> dict:
+    """
+    Size SO_SNDBUF and SO_RCVBUF for a transfer. A pinned sock_buf is set as
+    is. Otherwise each buffer should hold twice the probed BDP (within
+    BDP_MIN_BUFFER..BDP_MAX_BUFFER): it is only ever grown, and on Linux it is
+    left to the kernel's autotuning when that already reaches the target, or
+    when net.core.*mem_max would clamp an explicit value below it (setting the
+    option disables autotuning). Returns the effective sizes and how they were
+    chosen.
+    """
+    want = min(max(2 * bdp_bytes(link), BDP_MIN_BUFFER), BDP_MAX_BUFFER) if link else None
+    result = {}
+    for option, name in ((socket.SO_SNDBUF, "sndbuf"), (socket.SO_RCVBUF, "rcvbuf")):
+        how = "varsayılan"
+        if sock_buf:
+            conn.setsockopt(socket.SOL_SOCKET, option, sock_buf)
+            how = "sabit"
+        elif want and want > conn.getsockopt(socket.SOL_SOCKET, option):
+            limits = _sockbuf_limits(option)
+            if limits is not None and (want <= limits[1] or limits[0] < limits[1]):
+                how = "çekirdek otomatik ayarı"
+            else:
+                conn.setsockopt(socket.SOL_SOCKET, option, want)
+                how = "BDP"
+        result[name] = (conn.getsockopt(socket.SOL_SOCKET, option), how)
+    return result
+
+
+def _apply_link(conn: socket.socket, link: Optional[dict], sock_buf: Optional[int]) -> None:
+    """Tune the socket for the probed link (or the pinned size) and report what was chosen."""
+    if link is None and not sock_buf:
+        return
+    tuned = tune_socket(conn, link, sock_buf)
+    kib = 1024
+    parts = []
+    if link is not None:
+        rate = f"~{link['rate'] / (1024 * 1024):.0f} MiB/s" if link["rate"] else "ölçülemedi"
+        parts.append(f"RTT {link['rtt'] * 1000:.2f} ms, hız {rate}, BDP {bdp_bytes(link) // kib} KiB")
+    parts.extend(f"{name.upper()} {size // kib} KiB ({how})" for name, (size, how) in tuned.items())
+    _log(f"[+] Bağlantı: {'; '.join(parts)}")
+
+
+def _link_chunk(link: Optional[dict], chunk_size: int, auto_chunk: bool) -> int:
+    """Raise an automatically chosen block size to cover the probed BDP; an explicit --chunk-size is kept."""
+    if link is None or not auto_chunk or bdp_chunk(link) <= chunk_size:
+        return chunk_size
+    _log(f"[+] Blok boyutu BDP'ye göre büyütüldü: {chunk_size} -> {bdp_chunk(link)}")
+    return bdp_chunk(link)
+
+
+def split_ranges(size: int, streams: int, start: int = 0) -> list[Tuple[int, int]]:
+    """Split [start, size) into `streams` contiguous (offset, length) ranges; the last one takes the remainder."""
+    base = (size - start) // streams
+    ranges = []
+    for index in range(streams):
+        offset = start + index * base
+        length = base if index < streams - 1 else size - offset
+        ranges.append((offset, length))
+    return ranges
+
+
+def accepted_streams(requested: int, size: int) -> int:
+    """Number of parallel streams the receiver grants: at most MAX_STREAMS and one per MIN_STREAM_RANGE bytes."""
+    return max(1, min(requested, MAX_STREAMS, size // MIN_STREAM_RANGE))
+
+
+def resolve_ip(addr: str) -> ipaddress.IPv4Address | ipaddress.IPv6Address:
+    """
+    Resolve host/address to an IP object. Raises if resolution fails.
+    Prefers literal parsing, then peers already heard on the LAN (if the
+    shared peer table is running); falls back to DNS/hosts via RESOLVER.
+    """
+    try:
+        return ipaddress.ip_address(addr)
+    except ValueError:
+        peer = _PEER_TABLE.find(addr) if _PEER_TABLE is not None else None
+        if peer is not None:
+            return ipaddress.ip_address(peer.host)
+        # Try resolve hostname (cached; shared with the connect path)
+        return ipaddress.ip_address(RESOLVER.lookup(addr)[0][1])
+
+
+def ensure_local(addr: str) -> None:
+    """
+    Ensure the given host/bind is private or loopback.
+    Raises ValueError if not.
+    """
+    ip_obj = resolve_ip(addr)
+    if not (ip_obj.is_private or ip_obj.is_loopback):
+        raise ValueError(f"{addr} yerel degil; yerel IP veya localhost kullanin.")
+
+
+def resolve_send_engine(engine: str) -> str:
+    """
+    Map the requested send engine to one this platform supports.
+
+    - sendfile: kernel copies pages from the page cache straight to the socket
+    - pipeline: read, hash and send overlapped on three threads (StagePipeline)
+    - loop: classic read() + sendall() loop
+    - auto: sendfile when available, pipeline otherwise
+    """
+    if engine not in SEND_ENGINES:
+        raise ValueError(f"Bilinmeyen gönderim motoru: {engine}")
+    if engine in ("loop", "pipeline"):
+        return engine
+    if hasattr(os, "sendfile"):
+        return "sendfile"
+    if engine == "sendfile":
+        _log("[!] sendfile bu platformda desteklenmiyor; boru hattı motoruna geçiliyor.")
+    return "pipeline"
+
+
+def resolve_recv_engine(engine: str) -> str:
+    """
+    Map the requested receive engine to one this platform supports.
+
+    - recv_into: recv_into() over a pooled, reused buffer; no per-chunk allocation
+    - pipeline: receive, write and hash overlapped on three threads (StagePipeline)
+    - splice: socket -> pipe -> file inside the kernel (Linux os.splice)
+    - loop: classic recv() loop allocating a new bytes object per chunk
+    - auto: recv_into
+    """
+    if engine not in RECV_ENGINES:
+        raise ValueError(f"Bilinmeyen alım motoru: {engine}")
+    if engine == "splice":
+        if hasattr(os, "splice"):
+            return "splice"
+        _log("[!] splice bu platformda desteklenmiyor; recv_into motoruna geçiliyor.")
+        return "recv_into"
+    if engine in ("loop", "pipeline"):
+        return engine
+    return "recv_into"
+
+
+def file_hasher(path: Path, chunk_size: int, length: Optional[int] = None, hasher=None):
+    """Hasher (SHA-256 unless given) fed with the first `length` bytes of a file (the whole file if None)."""
+    sha = hasher or hashlib.sha256()
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    remaining = length
+    with Path(path).open("rb") as f:
+        while remaining is None or remaining > 0:
+            want = chunk_size if remaining is None else min(chunk_size, remaining)
+            n = f.readinto(view[:want])
+            if not n:
+                break
+            sha.update(view[:n])
+            if remaining is not None:
+                remaining -= n
+    if remaining:
+        raise ValueError("Dosya beklenenden kısa.")
+    return sha
+
+
+def hash_file(path: Path, chunk_size: int, hasher=None) -> bytes:
+    """Read-only digest pass over a file, used to keep hashing off the sendfile data path."""
+    return file_hasher(path, chunk_size, hasher=hasher).digest()
+
+
+class Crc32Hasher:
+    """
+    hashlib-style CRC-32 for trusted LANs: catches transmission errors, not
+    tampering. The digest is the 4-byte big-endian checksum.
+    """
+
+    name = "crc32"
+    digest_size = 4
+
+    def __init__(self, data=b""):
+        self._crc = zlib.crc32(data)
+
+    def update(self, data) -> None:
+        self._crc = zlib.crc32(data, self._crc)
+
+    def copy(self) -> "Crc32Hasher":
+        other = Crc32Hasher()
+        other._crc = self._crc
+        return other
+
+    def digest(self) -> bytes:
+        return struct.pack(">I", self._crc)
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+
+def new_digest(name: str, data=b""):
+    """New hasher for a negotiated digest name; the cryptographic ones all produce 32 bytes."""
+    if name == "sha256":
+        return hashlib.sha256(data)
+    if name == "blake2b":
+        return hashlib.blake2b(data, digest_size=32)
+    if name == "blake2s":
+        return hashlib.blake2s(data)
+    if name == "crc32":
+        return Crc32Hasher(data)
+    raise ValueError(f"Bilinmeyen özet algoritması: {name}")
+
+
+_DIGEST_COSTS: Optional[dict[str, float]] = None
+
+
+def digest_costs() -> dict[str, float]:
+    """Local cost of each digest in seconds per GiB, measured once per process on a DIGEST_SAMPLE buffer."""
+    global _DIGEST_COSTS
+    if _DIGEST_COSTS is None:
+        sample = memoryview(bytes(DIGEST_SAMPLE))
+        costs = {}
+        for name in DIGESTS:
+            start = time.perf_counter()
+            new_digest(name, sample).digest()
+            costs[name] = (time.perf_counter() - start) * (1 << 30) / DIGEST_SAMPLE
+        _DIGEST_COSTS = costs
+    return _DIGEST_COSTS
+
+
+def format_digest_costs() -> str:
+    costs = digest_costs()
+    return "[+] Özet maliyeti: " + ", ".join(f"{name} {costs[name]:.2f}s/GiB" for name in sorted(costs, key=costs.get))
+
+
+def digest_offer(policy: str) -> list[str]:
+    """
+    Digests the sender offers, most preferred first.
+
+    - auto: the cryptographic digests, cheapest on this machine first
+    - fast: CRC-32 first, then the cryptographic ones as a fallback
+    - a digest name: only that one
+    """
+    if policy not in DIGEST_POLICIES:
+        raise ValueError(f"Bilinmeyen özet ilkesi: {policy}")
+    if policy in DIGESTS:
+        return [policy]
+    costs = digest_costs()
+    ranked = sorted(CRYPTO_DIGESTS, key=costs.get)
+    return ["crc32"] + ranked if policy == "fast" else ranked
+
+
+def choose_digest(offer: list[str], policy: str) -> Optional[str]:
+    """
+    Receiver side: the first offered digest the policy accepts, or None.
+    auto only accepts cryptographic digests, fast also accepts CRC-32, and a
+    digest name accepts only itself.
+    """
+    if policy not in DIGEST_POLICIES:
+        raise ValueError(f"Bilinmeyen özet ilkesi: {policy}")
+    if policy in DIGESTS:
+        accepted = (policy,)
+    else:
+        accepted = CRYPTO_DIGESTS + (("crc32",) if policy == "fast" else ())
+    return next((name for name in offer if name in accepted), None)
+
+
+def merkle_leaf(data, digest: str = "sha256") -> bytes:
+    leaf = new_digest(digest, b"\x00")
+    leaf.update(data)
+    return leaf.digest()
+
+
+def merkle_root(leaves: list[bytes], digest: str = "sha256") -> bytes:
+    """Root over leaf hashes: interior nodes are H(0x01 || left || right), an odd node is carried up."""
+    level = list(leaves)
+    while len(level) > 1:
+        paired = [new_digest(digest, b"\x01" + level[i] + level[i + 1]).digest()
+                  for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0]
+
+
+_MERKLE_POOL: Optional[ThreadPoolExecutor] = None
+_MERKLE_POOL_LOCK = threading.Lock()
+
+
+def _merkle_pool() -> ThreadPoolExecutor:
+    global _MERKLE_POOL
+    with _MERKLE_POOL_LOCK:
+        if _MERKLE_POOL is None:
+            _MERKLE_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 2, thread_name_prefix="p2p-merkle")
+        return _MERKLE_POOL
+
+
+class MerkleHasher:
+    """
+    hashlib-style hasher whose digest is the root of a Merkle tree over
+    MERKLE_BLOCK-sized leaves (an empty input is one empty leaf).
+
+    With more than one CPU each completed block is copied out of the caller's
+    (reused) buffer and hashed on a shared thread pool, so blocks are verified
+    in parallel while the rest of the file is still arriving; at most two
+    blocks per worker are in flight. On a single CPU the copy would only cost
+    time, so leaves are hashed inline. `leaves` is the per-block manifest used
+    for selective repair. Leaves and nodes use the negotiated digest; under
+    CRC-32 each leaf is simply the block's checksum.
+    """
+
+    def __init__(self, block_size: int = MERKLE_BLOCK, digest: str = "sha256"):
+        self.block_size = block_size
+        self.digest_name = digest
+        self.digest_size = new_digest(digest).digest_size
+        self._workers = os.cpu_count() or 1
+        self._block = bytearray(block_size) if self._workers > 1 else None
+        self._leaf = new_digest(digest, b"\x00")
+        self._fill = 0
+        self._pending: list = []  # leaf digests, or futures of them
+        self._settled = 0
+        self._root: Optional[bytes] = None
+        self._leaves: list[bytes] = []
+
+    def _close_block(self) -> None:
+        if self._block is None:
+            self._pending.append(self._leaf.digest())
+            self._leaf = new_digest(self.digest_name, b"\x00")
+        else:
+            self._pending.append(_merkle_pool().submit(merkle_leaf, memoryview(self._block)[:self._fill],
+                                                       self.digest_name))
+            self._block = bytearray(self.block_size)
+            while len(self._pending) - self._settled > 2 * self._workers:
+                self._pending[self._settled].result()
+                self._settled += 1
+        self._fill = 0
+
+    def update(self, data) -> None:
+        view = memoryview(data).cast("B")
+        while len(view):
+            take = min(len(view), self.block_size - self._fill)
+            if self._block is None:
+                self._leaf.update(view[:take])
+            else:
+                self._block[self._fill:self._fill + take] = view[:take]
+            self._fill += take
+            view = view[take:]
+            if self._fill == self.block_size:
+                self._close_block()
+
+    def digest(self) -> bytes:
+        if self._root is None:
+            if self._fill or not self._pending:
+                self._close_block()
+            self._leaves = [leaf if isinstance(leaf, bytes) else leaf.result() for leaf in self._pending]
+            self._root = merkle_root(self._leaves, self.digest_name)
+        return self._root
+
+    @property
+    def leaves(self) -> list[bytes]:
+        self.digest()
+        return self._leaves
+
+
+def _block_span(index: int, size: int, block_size: int) -> Tuple[int, int]:
+    offset = index * block_size
+    if index < 0 or offset > size or (offset == size and size):
+        raise ValueError(f"Geçersiz blok numarası: {index}")
+    return offset, min(block_size, size - offset)
+
+
+def _read_block(path: Path, offset: int, length: int) -> bytes:
+    with path.open("rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def _write_block(path: Path, offset: int, data: bytes) -> None:
+    with path.open("r+b") as f:
+        f.seek(offset)
+        f.write(data)
+
+
+def _finish_send_steps(file_path: Path, size: int, hasher):
+    """
+    Send the trailer digest and return the receiver's final status. On a
+    Merkle transfer the receiver may answer RP instead: it then gets the
+    manifest once and names the corrupt blocks, and only those are resent.
+    """
+    yield "send", (yield "run", hasher.digest)
+    status = yield "recv", 2
+    manifest_sent = False
+    while status == b"RP" and isinstance(hasher, MerkleHasher):
+        if not manifest_sent:
+            yield "send", struct.pack(">I", len(hasher.leaves)) + b"".join(hasher.leaves)
+            manifest_sent = True
+        blocks = (yield from _frame_steps()).get("blocks", [])
+        _log(f"[!] Alıcı {len(blocks)} bozuk blok bildirdi; yalnızca bunlar yeniden gönderiliyor.")
+        for index in blocks:
+            offset, length = _block_span(int(index), size, hasher.block_size)
+            yield "send", (yield "run", _read_block, file_path, offset, length)
+        status = yield "recv", 2
+    return status
+
+
+def _finish_recv_steps(target: Path, size: int, hasher):
+    """
+    Check the sender's trailer against the local digest and answer OK/NO.
+    On a Merkle transfer a mismatch is repaired instead: the sender's manifest
+    (checked against its root) pinpoints the corrupt blocks, only those are
+    fetched and rewritten in place, for up to MERKLE_REPAIR_ROUNDS rounds.
+    """
+    expected = yield "recv", hasher.digest_size
+    if hmac.compare_digest((yield "run", hasher.digest), expected):
+        yield "send", b"OK"
+        return True
+    if not isinstance(hasher, MerkleHasher):
+        yield "send", b"NO"
+        return False
+    leaves = list(hasher.leaves)
+    manifest = None
+    for _ in range(MERKLE_REPAIR_ROUNDS):
+        yield "send", b"RP"
+        if manifest is None:
+            count = struct.unpack(">I", (yield "recv", 4))[0]
+            if count != len(leaves):
+                raise ValueError("Blok listesi dosya boyutuyla uyuşmuyor.")
+            data = yield "recv", count * hasher.digest_size
+            manifest = [data[i:i + hasher.digest_size] for i in range(0, len(data), hasher.digest_size)]
+            if not hmac.compare_digest(merkle_root(manifest, hasher.digest_name), expected):
+                raise ValueError("Blok listesi kök özetle uyuşmuyor.")
+        bad = [i for i, (mine, theirs) in enumerate(zip(leaves, manifest)) if mine != theirs]
+        _log(f"[!] {len(bad)}/{len(leaves)} blok bozuk; yalnızca bunlar yeniden isteniyor.")
+        yield "send", _encode_frame({"blocks": bad})
+        for index in bad:
+            offset, length = _block_span(index, size, hasher.block_size)
+            block = yield "recv", length
+            yield "run", _write_block, target, offset, block
+            leaves[index] = merkle_leaf(block, hasher.digest_name)
+        if hmac.compare_digest(merkle_root(leaves, hasher.digest_name), expected):
+            _log(f"[✓] {len(bad)} blok onarıldı.")
+            yield "send", b"OK"
+            return True
+    yield "send", b"NO"
+    return False
+
+
+def delta_block_size(basis_size: int) -> int:
+    """rsync-style block length for an old copy: about sqrt(size), rounded up to 1 KiB and clamped."""
+    block = -(-math.isqrt(basis_size) // 1024) * 1024
+    return max(DELTA_MIN_BLOCK, min(DELTA_MAX_BLOCK, block))
+
+
+def _delta_strong(data) -> bytes:
+    return hashlib.blake2b(data, digest_size=DELTA_STRONG_SIZE).digest()
+
+
+def delta_signature(path: Path, block_size: int) -> bytes:
+    """Weak (Adler-32) and strong (BLAKE2b-128) hash of every full block of the receiver's old copy."""
+    entries = bytearray()
+    with path.open("rb") as f, BUFFER_POOL.buffer(block_size) as buf:
+        view = memoryview(buf)
+        while f.readinto(view) == block_size:
+            entries += DELTA_WEAK.pack(zlib.adler32(view)) + _delta_strong(view)
+    return bytes(entries)
+
+
+class _RollingAdler32:
+    """
+    Vectorized (NumPy) rolling Adler-32 over windows of the sender's file:
+    candidates(data) returns the offsets whose block_size window has a weak
+    checksum from the receiver's signature, with that checksum.
+
+    Both Adler sums come from prefix sums (the second one from a prefix sum of
+    the first), computed into scratch arrays allocated once per transfer. A
+    bitmap over the top 22 checksum bits discards almost every offset before
+    the exact comparison.
+    """
+
+    TABLE_BITS = 22
+
+    def __init__(self, block_size: int, weaks: set[int], window: int = DELTA_SCAN):
+        self.block_size = block_size
+        size = window + block_size
+        self._s1 = np.zeros(size, dtype=np.int64)
+        self._s2 = np.zeros(size, dtype=np.int64)
+        self._a = np.empty(size, dtype=np.int64)
+        self._b = np.empty(size, dtype=np.int64)
+        self._weaks = np.array(sorted(weaks), dtype=np.int64)
+        self._table = np.zeros(1 << self.TABLE_BITS, dtype=bool)
+        self._table[self._weaks >> (32 - self.TABLE_BITS)] = True
+
+    def checksums(self, data):
+        """zlib.adler32(data[k:k + block_size]) for every k, as one array."""
+        length, block = len(data), self.block_size
+        count = length - block + 1
+        s1, s2, a, b = self._s1[:length + 1], self._s2[:length + 1], self._a[:count], self._b[:count]
+        np.cumsum(np.frombuffer(data, dtype=np.uint8), dtype=np.int64, out=s1[1:])
+        np.cumsum(s1[1:], out=s2[1:])
+        # a = 1 + window sum; b = block + sum of (block - i) * x[k + i] = block + window sum of s1 - block * s1[k]
+        np.subtract(s1[block:], s1[:count], out=a)
+        np.subtract(s2[block:], s2[:count], out=b)
+        b -= block * s1[:count]
+        b += block
+        b %= 65521
+        a += 1
+        a %= 65521
+        b <<= 16
+        a |= b
+        return a
+
+    def candidates(self, data) -> list[Tuple[int, int]]:
+        rolled = self.checksums(data)
+        hits = np.flatnonzero(self._table[rolled >> (32 - self.TABLE_BITS)])
+        hits = hits[np.isin(rolled[hits], self._weaks)]
+        return list(zip(hits.tolist(), rolled[hits].tolist()))
+
+
+def _send_delta(conn: socket.socket, file_path: Path, size: int, chunk_size: int, block_size: int,
+                signature: bytes, hasher) -> Tuple[int, int]:
+    """
+    Send a file as copy/literal ops against the receiver's block signature
+    (the rsync algorithm) and return (bytes copied, literal bytes).
+
+    The block right after the last match is probed first (Adler-32, then
+    BLAKE2b), so unchanged stretches cost one C hash pass. After a miss the
+    next match is searched at every byte offset with a vectorized rolling
+    Adler-32 over windows that start at one block and double up to
+    DELTA_SCAN while nothing matches. Without NumPy only those aligned
+    probes run, so data shifted by an insertion goes out as literals.
+    Runs of consecutive blocks become a single copy op.
+    """
+    blocks: dict[bytes, int] = {}
+    for index in range(len(signature) // DELTA_ENTRY_SIZE):
+        blocks.setdefault(signature[index * DELTA_ENTRY_SIZE:(index + 1) * DELTA_ENTRY_SIZE], index)
+    weaks = {DELTA_WEAK.unpack_from(entry)[0] for entry in blocks}
+    roller = _RollingAdler32(block_size, weaks) if np is not None and weaks else None
+    last = size - block_size
+    copied = literal = 0
+    run = [0, 0]  # pending copy: first block, block count
+    span = block_size  # current search window; doubles on every miss
+
+    def lookup(weak: int, start: int) -> Optional[int]:
+        if weak not in weaks:
+            return None
+        return blocks.get(DELTA_WEAK.pack(weak) + _delta_strong(data[start:start + block_size]))
+
+    def search(start: int) -> Tuple[Optional[int], int]:
+        nonlocal span
+        if roller is None:
+            return None, start - 1 + block_size
+        end = min(start + span, last + 1)
+        if start >= end:
+            return None, start
+        for offset, weak in roller.candidates(data[start:end + block_size - 1]):
+            index = lookup(weak, start + offset)
+            if index is not None:
+                span = block_size
+                return index, start + offset
+        span = min(span * 2, DELTA_SCAN)
+        return None, end
+
+    def flush_run() -> None:
+        if run[1]:
+            conn.sendall(DELTA_OP.pack(DELTA_COPY, run[0], run[1]))
+            run[1] = 0
+
+    def send_literal(start: int, end: int) -> None:
+        nonlocal literal
+        if start < end:
+            flush_run()
+        piece = min(chunk_size, DELTA_MAX_LITERAL)
+        for lo in range(start, end, piece):
+            hi = min(lo + piece, end)
+            conn.sendall(DELTA_OP.pack(DELTA_LITERAL, hi - lo, 0))
+            conn.sendall(data[lo:hi])
+            hasher.update(data[lo:hi])
+        literal += end - start
+
+    with file_path.open("rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    data = memoryview(mm)
+    try:
+        pos = pending = 0
+        while pos <= last:
+            index = lookup(zlib.adler32(data[pos:pos + block_size]), pos)
+            if index is None:
+                index, pos = search(pos + 1)
+                if index is None:
+                    continue
+            send_literal(pending, pos)
+            if run[1] and run[0] + run[1] == index:
+                run[1] += 1
+            else:
+                flush_run()
+                run[:] = [index, 1]
+            hasher.update(data[pos:pos + block_size])
+            copied += block_size
+            pos = pending = pos + block_size
+        send_literal(pending, size)
+        flush_run()
+        conn.sendall(DELTA_OP.pack(DELTA_END, 0, 0))
+    finally:
+        data.release()
+        mm.close()
+    return copied, literal
+
+
+def _recv_delta(conn: socket.socket, basis: Path, f, size: int, block_size: int, blocks: int,
+                hasher) -> Tuple[int, int]:
+    """Rebuild the new file from copy/literal ops, copying blocks out of the old copy; returns (copied, literal)."""
+    written = copied = 0
+    with basis.open("rb") as old, BUFFER_POOL.buffer(max(block_size, DELTA_MAX_LITERAL)) as buf:
+        view = memoryview(buf)
+        while True:
+            op, first, count = DELTA_OP.unpack(recv_exact(conn, DELTA_OP.size))
+            if op == DELTA_END:
+                break
+            if op == DELTA_COPY:
+                if not count or first + count > blocks:
+                    raise ValueError("Geçersiz delta kopya talimatı.")
+                old.seek(first * block_size)
+                piece = view[:block_size]
+                for _ in range(count):
+                    if old.readinto(piece) != block_size:
+                        raise ValueError("Eski kopya aktarım sırasında kısaldı.")
+                    f.write(piece)
+                    hasher.update(piece)
+                copied += count * block_size
+                written += count * block_size
+            elif op == DELTA_LITERAL:
+                if not 0 < first <= DELTA_MAX_LITERAL:
+                    raise ValueError("Geçersiz delta literal uzunluğu.")
+                piece = view[:first]
+                recv_exact_into(conn, piece)
+                f.write(piece)
+                hasher.update(piece)
+                written += first
+            else:
+                raise ValueError(f"Bilinmeyen delta talimatı: {op}")
+            if written > size:
+                raise ValueError("Delta akışı beklenen boyutu aşıyor.")
+    if written != size:
+        raise ValueError("Delta akışı eksik.")
+    return copied, written - copied
+
+
+def _print_delta_summary(copied: int, literal: int, seconds: float) -> None:
+    total = copied + literal
+    reused = 100 * copied / total if total else 0
+    _log(f"[+] Delta: {copied} bayt eski kopyadan, {literal} bayt ağdan (%{reused:.1f} yeniden kullanıldı, "
+          f"{seconds:.2f}s).")
+
+
+class StageTimings:
+    """Busy seconds per pipeline stage; idle is the rest of the wall time. The busiest stage is the bottleneck."""
+
+    def __init__(self, *names: str):
+        self.busy = dict.fromkeys(names, 0.0)
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.busy[name] += seconds
+
+    def report(self) -> str:
+        wall = time.perf_counter() - self._start
+        parts = ", ".join(f"{name} {busy:.2f}s meşgul/{max(wall - busy, 0.0):.2f}s boşta"
+                          for name, busy in self.busy.items())
+        return f"[+] Aşamalar ({wall:.2f}s): {parts}; darboğaz: {max(self.busy, key=self.busy.get)}"
+
+
+class StagePipeline:
+    """
+    Threaded pipeline over a small ring of recycled pool buffers.
+
+    The first stage fills a free buffer and returns how many bytes it holds
+    (0 ends the run); every later stage gets a view of those bytes, in order,
+    on its own thread, linked by bounded queues. The last stage hands the
+    buffer back to the ring, so nothing is reallocated. After a failure the
+    remaining stages only pass buffers through, the source stops, and run()
+    re-raises the first error.
+    """
+
+    def __init__(self, chunk_size: int, stages: list, depth: int = 4):
+        self.chunk_size = chunk_size
+        self.stages = stages
+        self.depth = depth
+        self.timings = StageTimings(*(name for name, _ in stages))
+        self._error: Optional[BaseException] = None
+        self._failed = threading.Event()
+
+    def _fail(self, exc: BaseException) -> None:
+        if not self._failed.is_set():
+            self._error = exc
+            self._failed.set()
+
+    def _source(self, name: str, fn, free: queue.Queue, out: queue.Queue) -> None:
+        try:
+            while not self._failed.is_set():
+                buf = free.get()
+                start = time.perf_counter()
+                try:
+                    n = fn(memoryview(buf))
+                except BaseException as exc:  # pylint: disable=broad-except
+                    self._fail(exc)
+                    n = 0
+                self.timings.add(name, time.perf_counter() - start)
+                if not n:
+                    free.put(buf)
+                    break
+                out.put((buf, n))
+        finally:
+            out.put(None)
+
+    def _stage(self, name: str, fn, inbox: queue.Queue, out: Optional[queue.Queue], free: queue.Queue) -> None:
+        while True:
+            item = inbox.get()
+            if item is None:
+                break
+            if not self._failed.is_set():
+                start = time.perf_counter()
+                try:
+                    fn(memoryview(item[0])[:item[1]])
+                except BaseException as exc:  # pylint: disable=broad-except
+                    self._fail(exc)
+                self.timings.add(name, time.perf_counter() - start)
+            if out is not None:
+                out.put(item)
+            else:
+                free.put(item[0])
+        if out is not None:
+            out.put(None)
+
+    def run(self) -> StageTimings:
+        ring = [BUFFER_POOL.acquire(self.chunk_size)]
+        # Extra buffers only if the pool has room: a short ring is slower, never deadlocked.
+        while len(ring) < self.depth:
+            buf = BUFFER_POOL.acquire(self.chunk_size, block=False)
+            if buf is None:
+                break
+            ring.append(buf)
+        try:
+            free: queue.Queue = queue.Queue()
+            for buf in ring:
+                free.put(buf)
+            links = [queue.Queue(self.depth) for _ in self.stages[1:]]
+            (name, fn), rest = self.stages[0], self.stages[1:]
+            threads = [threading.Thread(target=self._source, args=(name, fn, free, links[0]), daemon=True)]
+            for i, (name, fn) in enumerate(rest):
+                out = links[i + 1] if i + 1 < len(links) else None
+                threads.append(threading.Thread(target=self._stage, args=(name, fn, links[i], out, free), daemon=True))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            for buf in ring:
+                BUFFER_POOL.release(buf)
+        if self._error is not None:
+            raise self._error
+        return self.timings
+
+
+def _run_blocking(coro_fn, *args):
+    """
+    Run an async entry point to completion from synchronous code. Inside an
+    already running event loop (an asyncio-hosted GUI, Jupyter) asyncio.run
+    would raise, so the transfer then gets its own loop on a helper thread and
+    the caller blocks until it ends, as it did before the asyncio engine.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro_fn(*args))
+    outcome: dict = {}
+
+    def run() -> None:
+        try:
+            outcome["result"] = asyncio.run(coro_fn(*args))
+        except BaseException as exc:  # pylint: disable=broad-except
+            outcome["error"] = exc
+
+    worker = threading.Thread(target=_carry(run), name="p2p-blocking", daemon=True)
+    worker.start()
+    worker.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("result")
+
+
+def send_file(host: str, port: int, pin: str, file_path: Path, chunk_size: int = None, engine: str = "auto",
+              streams: int = 1, dir_mode: str = "stream", digest: str = "auto", delta: bool = False,
+              compress: str = "off", chunk_policy: str = "static", sock_buf: Optional[int] = None,
+              pool: Optional[ConnectionPool] = None, observer: Optional[Callable[[TransferEvent], None]] = None,
+              progress_interval: Optional[float] = PROGRESS_INTERVAL) -> None:
+    """Blocking wrapper over async_send_file; also callable from inside a running event loop."""
+    _run_blocking(async_send_file, host, port, pin, file_path, chunk_size, engine, streams, dir_mode, digest, delta,
+                  compress, chunk_policy, sock_buf, pool, observer, progress_interval)
+
+
+def _send_payload_loop(conn: socket.socket, f, size: int, chunk_size: int, hasher=None,
+                       controller: Optional[ChunkController] = None) -> bytes:
+    """Read, hash and send chunk by chunk; returns the digest (SHA-256 unless a hasher is given)."""
+    sha = hasher or hashlib.sha256()
+    meter = _reporter().meter("send", size)
+    sent = 0
+    while sent < size:
+        chunk = f.read(min(controller.size if controller else chunk_size, size - sent))
+        if not chunk:
+            raise ConnectionError("Dosya gönderim sırasında beklenmedik şekilde bitti.")
+        sha.update(chunk)
+        start = time.perf_counter()
+        conn.sendall(chunk)
+        if controller:
+            controller.record(len(chunk), time.perf_counter() - start)
+        meter.add(len(chunk))
+        sent += len(chunk)
+    return sha.digest()
+
+
+def _send_payload_pipeline(conn: socket.socket, f, size: int, chunk_size: int, hasher=None) -> bytes:
+    """Read, hash and send as three overlapped stages (StagePipeline); returns the digest."""
+    sha = hasher or hashlib.sha256()
+    meter = _reporter().meter("send", size)
+    read = 0
+
+    def reader(view) -> int:
+        nonlocal read
+        want = min(chunk_size, size - read)
+        if not want:
+            return 0
+        n = f.readinto(view[:want])
+        if not n:
+            raise ConnectionError("Dosya gönderim sırasında beklenmedik şekilde bitti.")
+        read += n
+        return n
+
+    def sender(view) -> None:
+        conn.sendall(view)
+        meter.add(len(view))
+
+    timings = StagePipeline(chunk_size, [("okuma", reader), ("özet", sha.update), ("gönderim", sender)]).run()
+    if size >= 50 * chunk_size:
+        _log(timings.report())
+    return sha.digest()
+
+
+def _send_payload_sendfile(conn: socket.socket, f, size: int, chunk_size: int, offset: int = 0,
+                           controller: Optional[ChunkController] = None,
+                           meter: Optional[_ProgressMeter] = None) -> None:
+    """
+    Zero-copy send of [offset, offset + size) via socket.sendfile, in 50-chunk
+    steps so progress is still reported (or in the controller's block size).
+    """
+    step = 50 * chunk_size
+    meter = meter or _reporter().meter("send", size)
+    sent = 0
+    while sent < size:
+        count = min(controller.size if controller else step, size - sent)
+        start = time.perf_counter()
+        n = conn.sendfile(f, offset=offset + sent, count=count)
+        if n == 0:
+            raise ConnectionError("Dosya gönderim sırasında beklenmedik şekilde bitti.")
+        if controller:
+            controller.record(n, time.perf_counter() - start)
+        meter.add(n)
+        sent += n
+
+
+def _send_range(conn: socket.socket, file_path: Path, offset: int, length: int, chunk_size: int, engine: str,
+                meter: Optional[_ProgressMeter] = None) -> None:
+    """Send bytes [offset, offset + length) of file_path on its own file handle, without hashing."""
+    with file_path.open("rb") as f:
+        if engine == "sendfile":
+            _send_payload_sendfile(conn, f, length, chunk_size, offset, meter=meter)
+            return
+        f.seek(offset)
+        remaining = length
+        with BUFFER_POOL.buffer(chunk_size) as buf:
+            view = memoryview(buf)
+            while remaining > 0:
+                n = f.readinto(view[: min(chunk_size, remaining)])
+                if not n:
+                    raise ConnectionError("Dosya gönderim sırasında beklenmedik şekilde bitti.")
+                conn.sendall(view[:n])
+                if meter is not None:
+                    meter.add(n)
+                remaining -= n
+
+
+class ResolverCache:
+    """
+    Small TTL-bounded cache in front of getaddrinfo, shared by resolve_ip and
+    the connect path. Entries hold (family, address, sockaddr tail) without
+    the port; failures are remembered for negative_ttl so a dead name does not
+    stall every retry. The address that last connected moves to the front.
+    """
+
+    def __init__(self, ttl: float = RESOLVE_TTL, negative_ttl: float = RESOLVE_NEGATIVE_TTL,
+                 max_entries: int = RESOLVE_CACHE_SIZE):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[str, tuple[object, float]] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, host: str) -> list[tuple]:
+        """[(family, address, sockaddr tail), ...] in getaddrinfo order (last successful first)."""
+        try:
+            ipaddress.ip_address(host.split("%", 1)[0])
+            literal = True
+        except ValueError:
+            literal = False
+        now = time.monotonic()
+        if not literal:
+            with self._lock:
+                entry = self._entries.get(host)
+                if entry is not None and entry[1] > now:
+                    self.hits += 1
+                    if isinstance(entry[0], OSError):
+                        raise entry[0]
+                    return list(entry[0])
+                self.misses += 1
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except OSError as exc:
+            if not literal:
+                self._store(host, exc, now + self.negative_ttl)
+            raise
+        addrs = []
+        for family, _, _, _, sockaddr in infos:
+            item = (family, sockaddr[0], tuple(sockaddr[2:]))
+            if family in (socket.AF_INET, socket.AF_INET6) and item not in addrs:
+                addrs.append(item)
+        if not addrs:
+            raise OSError(f"Adres çözümlenemedi: {host}")
+        if not literal:
+            self._store(host, addrs, now + self.ttl)
+        return addrs
+
+    def _store(self, host: str, value, expires: float) -> None:
+        with self._lock:
+            self._entries.pop(host, None)
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[host] = (value, expires)
+
+    def candidates(self, host: str, port: int) -> list[tuple[int, tuple]]:
+        """(family, sockaddr) pairs to try, families interleaved starting with the preferred one (RFC 8305)."""
+        addrs = self.lookup(host)
+        first = [a for a in addrs if a[0] == addrs[0][0]]
+        other = [a for a in addrs if a[0] != addrs[0][0]]
+        ordered = [a for pair in zip(first, other) for a in pair] + first[len(other):] + other[len(first):]
+        return [(family, (address, port) + tail) for family, address, tail in ordered]
+
+    def prefer(self, host: str, sockaddr: tuple) -> None:
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is None or isinstance(entry[0], OSError):
+                return
+            addrs = sorted(entry[0], key=lambda a: a[1] != sockaddr[0])
+            self._entries[host] = (addrs, entry[1])
+
+    def forget(self, host: str) -> None:
+        with self._lock:
+            self._entries.pop(host, None)
+
+
+RESOLVER = ResolverCache()
+
+
+def _connect_error(host: str, port: int, errors: list) -> OSError:
+    if not errors:
+        return TimeoutError(f"Bağlantı zaman aşımı: {host}:{port}")
+    if len(errors) == 1:
+        return errors[0]
+    return OSError(f"{host}:{port} adreslerinin hiçbirine bağlanılamadı: " + "; ".join(str(e) for e in errors))
+
+
+def _connect(host: str, port: int, timeout: float = CONNECT_TIMEOUT,
+             delay: float = CONNECT_ATTEMPT_DELAY) -> socket.socket:
+    """
+    Happy Eyeballs connect: start a non-blocking connect to the first
+    candidate, then another every `delay` seconds (or as soon as one fails)
+    until one completes; the rest are closed. A broken address family costs
+    `delay`, not the whole timeout. The winner is blocking with `timeout`.
+    """
+    candidates = RESOLVER.candidates(host, port)
+    pending: dict[socket.socket, tuple] = {}
+    errors: list[OSError] = []
+    deadline = time.monotonic() + timeout
+    next_start = 0.0
+    winner = None
+    try:
+        while winner is None and (candidates or pending):
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if candidates and (now >= next_start or not pending):
+                family, sockaddr = candidates.pop(0)
+                try:
+                    sock = socket.socket(family, socket.SOCK_STREAM)
+                except OSError as exc:  # e.g. EAFNOSUPPORT for an IPv6 address on an IPv4-only host
+                    errors.append(OSError(exc.errno, f"{exc.strerror} ({sockaddr[0]})"))
+                    continue
+                sock.setblocking(False)
+                err = sock.connect_ex(sockaddr)
+                if err == 0:
+                    winner = sock, sockaddr
+                    break
+                if err not in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN, getattr(errno, "WSAEWOULDBLOCK", -1)):
+                    sock.close()
+                    errors.append(OSError(err, f"{os.strerror(err)} ({sockaddr[0]})"))
+                    continue
+                pending[sock] = sockaddr
+                next_start = now + delay
+            wake = min(deadline, next_start) if candidates else deadline
+            _, writable, failed = select.select([], list(pending), list(pending), max(0.0, wake - time.monotonic()))
+            for sock in set(writable) | set(failed):
+                sockaddr = pending.pop(sock)
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if err == 0 and winner is None:
+                    winner = sock, sockaddr
+                    continue
+                sock.close()
+                if err:
+                    errors.append(OSError(err, f"{os.strerror(err)} ({sockaddr[0]})"))
+                    next_start = 0.0
+    finally:
+        for sock in pending:
+            sock.close()
+    if winner is None:
+        RESOLVER.forget(host)
+        raise _connect_error(host, port, errors)
+    conn, sockaddr = winner
+    RESOLVER.prefer(host, sockaddr)
+    conn.setblocking(True)
+    conn.settimeout(timeout)
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return conn
+
+
+def _enable_keepalive(conn: socket.socket) -> None:
+    conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (("TCP_KEEPIDLE", KEEPALIVE_IDLE), ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL),
+                          ("TCP_KEEPCNT", KEEPALIVE_COUNT)):
+        if hasattr(socket, option):
+            try:
+                conn.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+            except OSError:
+                pass
+
+
+def _idle_alive(conn: socket.socket) -> bool:
+    """An idle connection is healthy only while it has nothing to read: EOF, a reset or stray data all mean it is done."""
+    try:
+        readable, _, _ = select.select([conn], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+
+class PooledConnection:
+    """An authenticated connection leased from a ConnectionPool (or opened for a single transfer)."""
+
+    def __init__(self, conn: socket.socket, version: int, reused: bool = False):
+        self.conn = conn
+        self.version = version
+        self.reused = reused
+        # Seconds the receiver promised to keep the connection open; set from its reply after a transfer.
+        self.keep = 0.0
+
+
+class ConnectionPool:
+    """
+    Authenticated connections kept open between sends to the same peer.
+
+    Connections are keyed by (host, port, PIN key). A transfer asks the
+    receiver to keep the connection ("keep" in its header); only a `serve`
+    daemon agrees, and only those connections come back to the pool. Idle
+    connections are evicted after `idle_timeout` (or half of the time the
+    receiver promised, if shorter) and TCP keepalives run while they wait.
+    A connection that turns out to be closed or reset at checkout is dropped
+    and replaced by a fresh one. hits/misses/evicted/replaced count what
+    happened; report() formats them.
+    """
+
+    def __init__(self, idle_timeout: float = POOL_IDLE_TIMEOUT, max_idle: int = POOL_MAX_IDLE):
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.replaced = 0
+        self._idle: dict[tuple, list[tuple[PooledConnection, float]]] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+
+    def acquire(self, host: str, port: int, key: bytes) -> PooledConnection:
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get((host, port, key), [])
+            while idle:
+                lease, expires = idle.pop()
+                if expires <= now:
+                    self.evicted += 1
+                elif _idle_alive(lease.conn):
+                    self.hits += 1
+                    lease.reused, lease.keep = True, 0.0
+                    return lease
+                else:
+                    self.replaced += 1
+                lease.conn.close()
+            self.misses += 1
+        conn = _connect(host, port)
+        try:
+            _enable_keepalive(conn)
+            return PooledConnection(conn, handshake(conn, key, initiator=True))
+        except BaseException:
+            conn.close()
+            raise
+
+    def release(self, host: str, port: int, key: bytes, lease: PooledConnection) -> None:
+        """Return a connection after a successful transfer; closed unless the receiver agreed to keep it."""
+        if lease.keep <= 0:
+            lease.conn.close()
+            return
+        expires = time.monotonic() + min(self.idle_timeout, lease.keep / 2)
+        with self._lock:
+            idle = self._idle.setdefault((host, port, key), [])
+            idle.append((lease, expires))
+            while len(idle) > self.max_idle:
+                idle.pop(0)[0].conn.close()
+                self.evicted += 1
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, name="p2p-pool-reaper", daemon=True)
+                self._reaper.start()
+
+    @contextmanager
+    def connection(self, host: str, port: int, key: bytes) -> Iterator[PooledConnection]:
+        lease = self.acquire(host, port, key)
+        try:
+            yield lease
+        except BaseException:
+            lease.conn.close()
+            raise
+        self.release(host, port, key, lease)
+
+    def _reap(self) -> None:
+        """Close idle connections as they expire; exits once the pool is empty."""
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                for idle in self._idle.values():
+                    for entry in [e for e in idle if e[1] <= now]:
+                        idle.remove(entry)
+                        entry[0].conn.close()
+                        self.evicted += 1
+                pending = [expires for idle in self._idle.values() for _, expires in idle]
+                if not pending:
+                    self._reaper = None
+                    return
+            time.sleep(max(0.05, min(pending) - now))
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def close(self) -> None:
+        with self._lock:
+            for idle in self._idle.values():
+                for lease, _ in idle:
+                    lease.conn.close()
+            self._idle.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evicted": self.evicted, "replaced": self.replaced,
+                "idle": self.idle_count()}
+
+    def report(self) -> str:
+        stats = self.stats()
+        return (f"[+] Bağlantı havuzu: {stats['hits']} isabet, {stats['misses']} ıska, {stats['evicted']} boşta "
+                f"kapatıldı, {stats['replaced']} kopuk bağlantı yenilendi; {stats['idle']} bağlantı beklemede.")
+
+
+@contextmanager
+def _authenticated(host: str, port: int, key: bytes, pool: Optional[ConnectionPool]) -> Iterator[PooledConnection]:
+    """A handshaken connection to the peer: leased from `pool` if given, otherwise opened for this transfer only."""
+    if pool is not None:
+        with pool.connection(host, port, key) as lease:
+            if not lease.reused:
+                _emit(HandshakeEvent("send", f"{host}:{port}", lease.version))
+            yield lease
+        return
+    with _connect(host, port) as conn:
+        lease = PooledConnection(conn, handshake(conn, key, initiator=True))
+        _emit(HandshakeEvent("send", f"{host}:{port}", lease.version))
+        yield lease
+
+
+def _send_parallel(host: str, port: int, key: bytes, conn: socket.socket, file_path: Path, size: int,
+                   chunk_size: int, engine: str, streams: int, session: str, start: int = 0,
+                   hasher=None) -> bytes:
+    """
+    Send [start, size) of file_path as `streams` byte ranges: range 0 over the
+    control connection, the others over extra authenticated connections that
+    join the session. The whole-file digest (including any prefix the receiver
+    already has) is computed in a parallel read-only pass.
+    """
+    ranges = split_ranges(size, streams, start)
+    extra = []
+    try:
+        for index in range(1, streams):
+            side = _connect(host, port)
+            extra.append(side)
+            if handshake(side, key, initiator=True) < 2:
+                raise ConnectionError("Ek akış eski protokolle el sıkıştı.")
+            send_frame(side, {"join": session, "index": index})
+        conns = [conn] + extra
+        meter = _reporter().meter("send", size - start)
+        with ThreadPoolExecutor(max_workers=streams + 1) as pool:
+            digest_future = pool.submit(hash_file, file_path, chunk_size, hasher)
+            futures = [
+                pool.submit(_send_range, c, file_path, offset, length, chunk_size, engine, meter)
+                for c, (offset, length) in zip(conns, ranges)
+            ]
+            for future in futures:
+                future.result()
+            return digest_future.result()
+    finally:
+        for side in extra:
+            side.close()
+
+
+def available_codecs() -> list[str]:
+    """On-the-wire codecs this Python build can encode and decode (lzma is optional)."""
+    return [codec for codec in CODECS if codec != "lzma" or lzma is not None]
+
+
+def compress_offer(policy: str) -> list[str]:
+    """Codecs the sender offers: none for off, every available one for auto, otherwise just the named one."""
+    if policy not in COMPRESS_POLICIES:
+        raise ValueError(f"Bilinmeyen sıkıştırma ilkesi: {policy}")
+    if policy == "off":
+        return []
+    if policy == "auto":
+        return available_codecs()
+    if policy not in available_codecs():
+        raise ValueError(f"{policy} bu Python kurulumunda kullanılamıyor.")
+    return [policy]
+
+
+def _compress(codec: str, data) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, 1)
+    return lzma.compress(data, preset=1)
+
+
+def _decompress(kind: int, payload: bytes, raw_len: int) -> bytes:
+    """Inflate one chunk, refusing anything that does not decode to exactly raw_len bytes."""
+    if kind == 1 + CODECS.index("zlib"):
+        inflater = zlib.decompressobj()
+        data = inflater.decompress(payload, raw_len)
+        ok = inflater.eof and not inflater.unconsumed_tail
+    elif kind == 1 + CODECS.index("lzma") and lzma is not None:
+        inflater = lzma.LZMADecompressor()
+        data = inflater.decompress(payload, max_length=raw_len)
+        ok = inflater.eof
+    else:
+        raise ValueError(f"Bilinmeyen sıkıştırma türü: {kind}")
+    if not ok or len(data) != raw_len:
+        raise ValueError("Sıkıştırılmış blok bozuk.")
+    return data
+
+
+class AdaptiveCompressor:
+    """
+    Decides per chunk whether to send it raw or compressed, and with which codec.
+
+    A zlib trial on the first COMPRESS_PROBE bytes skips chunks that would not
+    shrink by COMPRESS_MIN_SAVING (media, archives) at almost no CPU cost. For
+    the rest, the measured compression speed and ratio of each codec are set
+    against the link rate (wire bytes over time spent in sendall, over the last
+    COMPRESS_WINDOW chunks): a codec is used only while compressing and sending
+    the smaller chunk is predicted to beat sending it raw. Once the CPU rather
+    than the link is the bottleneck chunks go out raw, with one trial every
+    COMPRESS_REPROBE chunks to keep the estimates current.
+    """
+
+    def __init__(self, codecs: list[str]):
+        self.codecs = list(codecs)
+        self.chunks = self.raw_bytes = self.wire_bytes = 0
+        self.incompressible = self.cpu_bound = 0
+        self.used = dict.fromkeys(self.codecs, 0)
+        self._speed: dict[str, float] = {}
+        self._ratio: dict[str, float] = {}
+        self._sends: list[Tuple[int, float]] = []
+
+    def _link_rate(self) -> Optional[float]:
+        seconds = sum(t for _, t in self._sends)
+        return sum(n for n, _ in self._sends) / seconds if seconds > 0 else None
+
+    def _pick(self, size: int) -> Optional[str]:
+        for codec in self.codecs:
+            if codec not in self._speed:
+                return codec
+        if self.chunks % COMPRESS_REPROBE == 0:
+            return self.codecs[self.chunks // COMPRESS_REPROBE % len(self.codecs)]
+        link = self._link_rate()
+        if link is None:
+            return self.codecs[0]
+        cost = {codec: size / self._speed[codec] + size * self._ratio[codec] / link for codec in self.codecs}
+        best = min(cost, key=cost.get)
+        return best if cost[best] < size / link else None
+
+    def encode(self, data) -> Tuple[int, object]:
+        """(codec kind, payload) for one chunk; kind COMPRESS_RAW sends `data` itself."""
+        self.chunks += 1
+        self.raw_bytes += len(data)
+        sample = data[:COMPRESS_PROBE]
+        codec = None
+        if len(zlib.compress(sample, 1)) > len(sample) * (1 - COMPRESS_MIN_SAVING):
+            self.incompressible += 1
+        else:
+            codec = self._pick(len(data))
+            if codec is None:
+                self.cpu_bound += 1
+        if codec is not None:
+            start = time.perf_counter()
+            packed = _compress(codec, data)
+            seconds = max(time.perf_counter() - start, 1e-6)
+            speed, ratio = len(data) / seconds, len(packed) / len(data)
+            self._speed[codec] = speed if codec not in self._speed else 0.7 * self._speed[codec] + 0.3 * speed
+            self._ratio[codec] = ratio if codec not in self._ratio else 0.7 * self._ratio[codec] + 0.3 * ratio
+            if len(packed) < len(data):
+                self.used[codec] += 1
+                self.wire_bytes += len(packed)
+                return 1 + CODECS.index(codec), packed
+        self.wire_bytes += len(data)
+        return COMPRESS_RAW, data
+
+    def sent(self, nbytes: int, seconds: float) -> None:
+        self._sends.append((nbytes, seconds))
+        del self._sends[:-COMPRESS_WINDOW]
+
+    def report(self) -> str:
+        saved = 100 * (1 - self.wire_bytes / self.raw_bytes) if self.raw_bytes else 0
+        used = ", ".join(f"{codec} {count}" for codec, count in self.used.items())
+        return (f"[+] Sıkıştırma: {self.raw_bytes} -> {self.wire_bytes} bayt (%{saved:.1f} tasarruf); "
+                f"{self.chunks} blok: {used}, sıkıştırılamaz {self.incompressible}, CPU darboğazı nedeniyle ham "
+                f"{self.cpu_bound}")
+
+
+def _send_payload_compressed(conn: socket.socket, f, size: int, chunk_size: int, compressor: AdaptiveCompressor,
+                             hasher=None) -> bytes:
+    """Send chunk by chunk, each raw or compressed as the compressor decides; the digest covers the raw bytes."""
+    sha = hasher or hashlib.sha256()
+    step = min(chunk_size, MAX_FRAME_SIZE)
+    meter = _reporter().meter("send", size)
+    sent = 0
+    with BUFFER_POOL.buffer(step) as buf:
+        view = memoryview(buf)
+        while sent < size:
+            n = f.readinto(view[:min(step, size - sent)])
+            if not n:
+                raise ConnectionError("Dosya gönderim sırasında beklenmedik şekilde bitti.")
+            chunk = view[:n]
+            sha.update(chunk)
+            kind, payload = compressor.encode(chunk)
+            start = time.perf_counter()
+            conn.sendall(COMPRESS_HEADER.pack(kind, len(payload), n))
+            conn.sendall(payload)
+            compressor.sent(len(payload), time.perf_counter() - start)
+            sent += n
+            meter.add(n)
+    return sha.digest()
+
+
+def _send_payload(conn: socket.socket, file_path: Path, f, size: int, chunk_size: int, engine: str,
+                  hasher=None, controller: Optional[ChunkController] = None) -> bytes:
+    """
+    Send a whole file over one stream with the resolved engine; returns its
+    digest (SHA-256 by default). The pipeline engine keeps its fixed ring of
+    chunk_size buffers and ignores the controller.
+    """
+    if engine == "sendfile" and size >= SENDFILE_MIN_SIZE:
+        # Hash in a parallel read-only pass; the data itself never enters user space.
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            digest_future = pool.submit(hash_file, file_path, chunk_size, hasher)
+            _send_payload_sendfile(conn, f, size, chunk_size, controller=controller)
+            return digest_future.result()
+    if engine == "pipeline":
+        return _send_payload_pipeline(conn, f, size, chunk_size, hasher)
+    return _send_payload_loop(conn, f, size, chunk_size, hasher, controller)
+
+
+def iter_tree(root: Path) -> Iterator[Tuple[str, Path]]:
+    """Yield (relative POSIX path, path) for every directory and regular file under root, top-down and sorted."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        base = Path(dirpath)
+        if base != root:
+            yield base.relative_to(root).as_posix(), base
+        for name in sorted(filenames):
+            path = base / name
+            if path.is_file():
+                yield path.relative_to(root).as_posix(), path
+
+
+def _zip_dos_time(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(max(mtime, 315532800))  # zip cannot express dates before 1980
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def _deflate_member(path: Path, store: bool, level: int, chunk_size: int):
+    """
+    Compress one file to raw deflate in a spooled buffer (runs on a worker thread;
+    zlib releases the GIL). Returns (crc, size, compressed_size, data); data is None
+    when the member is stored, either by extension or because deflate did not help.
+    """
+    crc = usize = 0
+    comp = None if store else zlib.compressobj(level, zlib.DEFLATED, -15)
+    out = None if store else tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_LIMIT)
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            usize += len(chunk)
+            if comp is not None:
+                out.write(comp.compress(chunk))
+    if comp is None:
+        return crc, usize, usize, None
+    out.write(comp.flush())
+    csize = out.tell()
+    if csize >= usize:
+        out.close()
+        return crc, usize, usize, None
+    out.seek(0)
+    return crc, usize, csize, out
+
+
+class ZipAssembler:
+    """
+    Minimal zip writer for members that were already compressed elsewhere.
+    Writes local headers with known CRC/sizes, the central directory and, when
+    sizes, offsets or the entry count need it, the ZIP64 records.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.entries = []
+
+    def add(self, name: str, method: int, crc: int, usize: int, csize: int, mtime: float, mode: int, data) -> None:
+        """Append a member; `data` is a readable file object positioned at the (compressed) bytes, or None."""
+        name_bytes = name.encode("utf-8")
+        offset = self.f.tell()
+        dos_time, dos_date = _zip_dos_time(mtime)
+        zip64 = usize >= 0xFFFFFFFF or csize >= 0xFFFFFFFF
+        extra = struct.pack("<HHQQ", 1, 16, usize, csize) if zip64 else b""
+        self.f.write(struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, 45 if zip64 else 20, 0x0800, method, dos_time, dos_date, crc,
+            0xFFFFFFFF if zip64 else csize, 0xFFFFFFFF if zip64 else usize, len(name_bytes), len(extra),
+        ))
+        self.f.write(name_bytes + extra)
+        if data is not None:
+            shutil.copyfileobj(data, self.f, 1024 * 1024)
+        self.entries.append((name_bytes, method, crc, usize, csize, dos_time, dos_date, mode, offset))
+
+    def close(self) -> None:
+        cd_offset = self.f.tell()
+        for name_bytes, method, crc, usize, csize, dos_time, dos_date, mode, offset in self.entries:
+            extra_fields = [v for v in (usize, csize, offset) if v >= 0xFFFFFFFF]
+            extra = struct.pack(f"<HH{len(extra_fields)}Q", 1, 8 * len(extra_fields), *extra_fields) if extra_fields else b""
+            external = (mode & 0xFFFF) << 16 | (0x10 if name_bytes.endswith(b"/") else 0)
+            self.f.write(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | 45, 45 if extra else 20, 0x0800, method,
+                dos_time, dos_date, crc, min(csize, 0xFFFFFFFF), min(usize, 0xFFFFFFFF), len(name_bytes),
+                len(extra), 0, 0, 0, external, min(offset, 0xFFFFFFFF),
+            ))
+            self.f.write(name_bytes + extra)
+        cd_size = self.f.tell() - cd_offset
+        count = len(self.entries)
+        if count >= 0xFFFF or cd_size >= 0xFFFFFFFF or cd_offset >= 0xFFFFFFFF:
+            eocd64_offset = self.f.tell()
+            self.f.write(struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, cd_size, cd_offset))
+            self.f.write(struct.pack("<IIQI", 0x07064B50, 0, eocd64_offset, 1))
+        self.f.write(struct.pack(
+            "<IHHHHIIH", 0x06054B50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+            min(cd_size, 0xFFFFFFFF), min(cd_offset, 0xFFFFFFFF), 0,
+        ))
+
+
+def build_zip_parallel(src: Path, dest: Path, workers: Optional[int] = None, level: int = 6,
+                       chunk_size: int = 1024 * 1024) -> dict:
+    """
+    Zip a directory tree, deflating member files concurrently on a thread pool and
+    storing already-compressed formats as-is. Members are written in tree order;
+    at most a few results per worker are in flight so memory stays bounded.
+    Returns stats: files, raw and compressed bytes, stored member count, seconds, workers.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.time()
+    stats = {"files": 0, "raw": 0, "compressed": 0, "stored": 0, "workers": workers}
+    pending: list = []
+
+    def drain(zipf: ZipAssembler, keep: int) -> None:
+        while len(pending) > keep:
+            rel, path, stat, future = pending.pop(0)
+            crc, usize, csize, data = future.result()
+            method = zlib.DEFLATED if data is not None else 0
+            try:
+                if data is None:
+                    with path.open("rb") as raw:
+                        zipf.add(rel, method, crc, usize, csize, stat.st_mtime, stat.st_mode, raw)
+                    stats["stored"] += 1
+                else:
+                    zipf.add(rel, method, crc, usize, csize, stat.st_mtime, stat.st_mode, data)
+            finally:
+                if data is not None:
+                    data.close()
+            stats["files"] += 1
+            stats["raw"] += usize
+            stats["compressed"] += csize
+
+    with dest.open("wb") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        zipf = ZipAssembler(out)
+        for rel, path in iter_tree(src):
+            stat = path.stat()
+            if path.is_dir():
+                drain(zipf, 0)
+                zipf.add(rel + "/", 0, 0, 0, 0, stat.st_mtime, stat.st_mode, None)
+                continue
+            store = path.suffix.lower() in STORED_EXTENSIONS
+            pending.append((rel, path, stat, pool.submit(_deflate_member, path, store, level, chunk_size)))
+            drain(zipf, workers * 4)
+        drain(zipf, 0)
+        zipf.close()
+    stats["seconds"] = time.time() - start
+    return stats
+
+
+def _offer_digests(policy: str) -> list[str]:
+    """Sender's digest offer for a v2 header; ranked policies also print the local cost table."""
+    offer = digest_offer(policy)
+    if policy not in DIGESTS:
+        _log(format_digest_costs())
+    return offer
+
+
+def _accepted_digest(reply: dict, offer: list[str]) -> str:
+    """The digest named in the receiver's reply; receivers that predate negotiation use SHA-256."""
+    chosen = reply.get("digest", "sha256")
+    if chosen not in offer and "digest" in reply:
+        raise ValueError(f"Alıcı önerilmeyen bir özet seçti: {chosen}")
+    _log(f"[+] Özet algoritması: {chosen}")
+    return chosen
+
+
+def _accepted_codecs(reply: dict, offer: list[str]) -> list[str]:
+    """Codecs the receiver accepted for this session (none from receivers that predate compression)."""
+    if not offer:
+        return []
+    codecs = [codec for codec in reply.get("codecs", []) if codec in offer]
+    if codecs:
+        _log(f"[+] Uyarlamalı sıkıştırma: {', '.join(codecs)}")
+    else:
+        _log("[+] Sıkıştırma bu oturumda kullanılmıyor (alıcı desteklemiyor ya da paralel/devam/delta aktarımı); veri ham gönderilecek.")
+    return codecs
+
+
+def _send_tree(conn: socket.socket, root: Path, chunk_size: int, engine: str, digest: str = "auto",
+               compress: str = "off", controller: Optional[ChunkController] = None,
+               sock_buf: Optional[int] = None, keep: bool = False) -> dict:
+    """
+    Stream a directory as framed entries straight into the socket while walking it:
+    a JSON frame per directory/file, each file followed by its bytes and digest,
+    then an end frame with the totals. No temporary archive is written. With
+    compression accepted, one AdaptiveCompressor carries over between files.
+    Returns the receiver's header reply (see _send_over for keep).
+    """
+    offer = _offer_digests(digest)
+    header = {"name": root.name, "kind": "tree", "digests": offer, "probe": True}
+    if compress_offer(compress):
+        header["codecs"] = compress_offer(compress)
+    if keep:
+        header["keep"] = True
+    if SESSION_TICKETS.wants(conn):
+        header["ticket"] = True
+    send_frame(conn, header)
+    reply = recv_reply(conn)
+    link = _reply_link(reply)
+    _apply_link(conn, link, sock_buf)
+    chunk_size = _link_chunk(link, chunk_size, chunk_size == 1024 * 1024)
+    digest = _accepted_digest(reply, offer)
+    codecs = _accepted_codecs(reply, header.get("codecs", []))
+    compressor = AdaptiveCompressor(codecs) if codecs else None
+    files = total = 0
+    start = time.time()
+    for rel, path in iter_tree(root):
+        if path.is_dir():
+            send_frame(conn, {"type": "dir", "path": rel})
+            continue
+        stat = path.stat()
+        send_frame(conn, {"type": "file", "path": rel, "size": stat.st_size, "mtime": stat.st_mtime_ns})
+        with path.open("rb") as f:
+            if compressor is not None:
+                conn.sendall(_send_payload_compressed(conn, f, stat.st_size, chunk_size, compressor, new_digest(digest)))
+            else:
+                conn.sendall(_send_payload(conn, path, f, stat.st_size, chunk_size, engine, new_digest(digest),
+                                           controller))
+        files += 1
+        total += stat.st_size
+    send_frame(conn, {"type": "end", "files": files, "bytes": total})
+    status = recv_exact(conn, 2)
+    duration = time.time() - start
+    speed = total / duration / (1024 * 1024) if duration > 0 else 0
+    if status != b"OK":
+        raise ConnectionError("Alıcı doğrulama hatası bildirdi.")
+    if compressor is not None:
+        _log(compressor.report())
+    _print_chunk_report(controller)
+    _emit(FinishedEvent("send", root.name, total, duration, files,
+                        f"[✓] Dizin aktarımı tamamlandı: {files} dosya, {total} bayt ({duration:.2f}s, {speed:.2f} MiB/s)."))
+    return reply
+
+
+def expand_paths(patterns) -> list[Path]:
+    """Expand --file arguments: glob patterns are expanded (sorted), plain paths are kept as given."""
+    paths: list[Path] = []
+    for pattern in patterns:
+        pattern = str(pattern)
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise FileNotFoundError(f"Desenle eşleşen dosya yok: {pattern}")
+            paths.extend(Path(m) for m in matches)
+        else:
+            paths.append(Path(pattern))
+    return paths
+
+
+def _drain_acks(conn: socket.socket, acks: list, expected: int, block: bool) -> None:
+    """Collect per-file OK/NO acks; without block only those already buffered, so neither side stalls."""
+    while len(acks) < expected:
+        if not block:
+            readable, _, _ = select.select([conn], [], [], 0)
+            if not readable:
+                return
+        acks.append(recv_exact(conn, 2))
+
+
+class _MuxStream:
+    """Sender-side state of one logical stream in a multiplexed session."""
+
+    def __init__(self, sid: int, path: Path, digest: str = "sha256"):
+        self.sid = sid
+        self.path = path
+        self.f = path.open("rb")
+        self.remaining = os.fstat(self.f.fileno()).st_size
+        self.sha = new_digest(digest)
+
+
+def _send_mux(conn: socket.socket, paths: list[Path], window: int, digest: str = "sha256") -> Tuple[list, int]:
+    """
+    Interleave up to MUX_MAX_OPEN files over one connection in MUX_FRAME_SIZE frames.
+
+    Each stream may have at most `window` unacknowledged bytes in flight; the
+    receiver returns credit as it writes. The scheduler always serves the open
+    stream with the fewest bytes left that has credit, so small files finish
+    right away while a large one fills the remaining capacity. A reader thread
+    collects credits and per-file acks. Returns (acks in path order, total bytes).
+    """
+    cond = threading.Condition()
+    credits: dict[int, int] = {}
+    acks: dict[int, bytes] = {}
+    errors: list = []
+
+    def reader() -> None:
+        try:
+            while len(acks) < len(paths):
+                kind, sid, length = MUX_HEADER.unpack(recv_exact(conn, MUX_HEADER.size))
+                payload = recv_exact(conn, length)
+                with cond:
+                    if kind == MUX_CREDIT:
+                        credits[sid] += struct.unpack(">I", payload)[0]
+                    elif kind == MUX_ACK:
+                        acks[sid] = payload
+                    cond.notify_all()
+        except Exception as exc:  # pylint: disable=broad-except
+            with cond:
+                errors.append(exc)
+                cond.notify_all()
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
+    pending = list(enumerate(paths, 1))
+    active: dict[int, _MuxStream] = {}
+    total = 0
+    try:
+        with BUFFER_POOL.buffer(MUX_HEADER.size + MUX_FRAME_SIZE) as buf:
+            view = memoryview(buf)
+            while pending or active:
+                while pending and len(active) < MUX_MAX_OPEN:
+                    sid, path = pending.pop(0)
+                    stream = _MuxStream(sid, path, digest)
+                    active[sid] = stream
+                    with cond:
+                        credits[sid] = window
+                    meta = json.dumps({"name": path.name, "size": stream.remaining}).encode("utf-8")
+                    conn.sendall(MUX_HEADER.pack(MUX_OPEN, sid, len(meta)) + meta)
+                with cond:
+                    while True:
+                        if errors:
+                            raise errors[0]
+                        ready = [st for st in active.values() if st.remaining == 0 or credits[st.sid] > 0]
+                        if ready:
+                            break
+                        cond.wait()
+                    stream = min(ready, key=lambda st: st.remaining)
+                    n = min(MUX_FRAME_SIZE, stream.remaining, credits[stream.sid])
+                    credits[stream.sid] -= n
+                if stream.remaining == 0:
+                    trailer = stream.sha.digest()
+                    conn.sendall(MUX_HEADER.pack(MUX_CLOSE, stream.sid, len(trailer)) + trailer)
+                    stream.f.close()
+                    del active[stream.sid]
+                    continue
+                # Header and payload share one pooled buffer: one sendall, no copy.
+                data = view[MUX_HEADER.size: MUX_HEADER.size + n]
+                got = stream.f.readinto(data)
+                if got != n:
+                    raise ConnectionError(f"Dosya gönderim sırasında değişti: {stream.path}")
+                MUX_HEADER.pack_into(buf, 0, MUX_DATA, stream.sid, n)
+                stream.sha.update(data)
+                conn.sendall(view[: MUX_HEADER.size + n])
+                stream.remaining -= n
+                total += n
+        conn.sendall(MUX_HEADER.pack(MUX_END, 0, 0))
+        reader_thread.join()
+        if errors:
+            raise errors[0]
+    finally:
+        for stream in active.values():
+            stream.f.close()
+    return [acks.get(sid) for sid in range(1, len(paths) + 1)], total
+
+
+def _send_sequential(conn: socket.socket, paths: list[Path], chunk_size: int, engine: str,
+                     digest: str = "sha256") -> Tuple[list, int]:
+    """Send files strictly one after another; returns (acks in path order, total bytes)."""
+    acks: list = []
+    total = 0
+    for path in paths:
+        size = path.stat().st_size
+        send_frame(conn, {"type": "file", "name": path.name, "size": size})
+        with path.open("rb") as f:
+            conn.sendall(_send_payload(conn, path, f, size, chunk_size, engine, new_digest(digest)))
+        total += size
+        _drain_acks(conn, acks, len(paths), block=False)
+    send_frame(conn, {"type": "end"})
+    _drain_acks(conn, acks, len(paths), block=True)
+    return acks, total
+
+
+def send_files(host: str, port: int, pin: str, paths, chunk_size: int = None, engine: str = "auto",
+               mux: bool = True, digest: str = "auto", pool: Optional[ConnectionPool] = None,
+               observer: Optional[Callable[[TransferEvent], None]] = None,
+               progress_interval: Optional[float] = PROGRESS_INTERVAL) -> None:
+    """
+    Send several files over one authenticated connection (batch session).
+
+    With mux (default) the files are interleaved as framed logical streams with
+    per-stream flow control, so small files are not queued behind large ones.
+    Otherwise they go strictly one after another: a name/size frame, data and
+    digest per file, acknowledged by the receiver and drained as acks arrive.
+    Events go to observer (see TransferReporter).
+    """
+    with _observing(observer, progress_interval):
+        _send_batch(host, port, pin, paths, chunk_size, engine, mux, digest, pool)
+
+
+def _send_batch(host: str, port: int, pin: str, paths, chunk_size: Optional[int], engine: str, mux: bool,
+                digest: str, pool: Optional[ConnectionPool]) -> None:
+    key = derive_key(pin)
+    paths = [Path(p) for p in paths]
+    for path in paths:
+        if not path.is_file():
+            raise FileNotFoundError(f"Gönderilecek dosya bulunamadı: {path}")
+    if chunk_size is None:
+        chunk_size = 1024 * 1024
+    engine = resolve_send_engine(engine)
+    _log(f"[+] {len(paths)} dosya toplu gönderiliyor -> {host}:{port} (motor: {engine})")
+    with _authenticated(host, port, key, pool) as lease:
+        conn = lease.conn
+        if lease.version < 2:
+            raise ConnectionError("Alıcı toplu gönderimi desteklemiyor (P2P1); dosyaları tek tek gönderin.")
+        offer = _offer_digests(digest)
+        header = {"kind": "mux" if mux else "batch", "count": len(paths), "digests": offer}
+        if pool is not None:
+            header["keep"] = True
+        if SESSION_TICKETS.wants(conn):
+            header["ticket"] = True
+        send_frame(conn, header)
+        reply = recv_reply(conn)
+        digest = _accepted_digest(reply, offer)
+        start = time.time()
+        if mux:
+            _log(f"[+] Çoklanmış oturum: en fazla {MUX_MAX_OPEN} eşzamanlı akış")
+            acks, total = _send_mux(conn, paths, int(reply.get("window", MUX_WINDOW)), digest)
+        else:
+            acks, total = _send_sequential(conn, paths, chunk_size, engine, digest)
+        duration = time.time() - start
+        lease.keep = float(reply.get("keep", 0))
+    failed = [path.name for path, ack in zip(paths, acks) if ack != b"OK"]
+    _print_batch_summary("Toplu gönderim", len(paths), len(failed), total, duration, "send")
+    if failed:
+        raise ConnectionError(f"Alıcı {len(failed)} dosyada doğrulama hatası bildirdi: {', '.join(failed[:5])}")
+
+
+def _print_batch_summary(label: str, files: int, failed: int, total: int, duration: float,
+                         role: str = "receive") -> None:
+    files_per_s = files / duration if duration > 0 else 0
+    speed = total / duration / (1024 * 1024) if duration > 0 else 0
+    _emit(FinishedEvent(role, label, total, duration, files,
+                        f"[✓] {label}: {files} dosya ({failed} hatalı), {total} bayt, {duration:.2f}s; "
+                        f"{files_per_s:.1f} dosya/s, {speed:.2f} MiB/s."))
+
+
+def _send_dir_internal(host: str, port: int, key: bytes, dir_path: Path, chunk_size: int, engine: str,
+                       streams: int, dir_mode: str, digest: str = "auto", compress: str = "off",
+                       chunk_policy: str = "static", sock_buf: Optional[int] = None,
+                       pool: Optional[ConnectionPool] = None) -> None:
+    """Send a directory as an entry stream (v2 receivers) or as a zip archive over the same connection."""
+    if dir_mode not in DIR_MODES:
+        raise ValueError(f"Bilinmeyen dizin modu: {dir_mode}")
+    engine = resolve_send_engine(engine)
+    with _authenticated(host, port, key, pool) as lease:
+        conn, version = lease.conn, lease.version
+        if dir_mode == "stream" and version >= 2:
+            _log(f"[+] Dizin akış olarak gönderiliyor -> {host}:{port} (motor: {engine})")
+            reply = _send_tree(conn, dir_path, chunk_size, engine, digest, compress,
+                               chunk_controller(chunk_policy, chunk_size), sock_buf, pool is not None)
+            lease.keep = float(reply.get("keep", 0))
+            return
+        if dir_mode == "stream":
+            _log("[!] Alıcı eski protokolü (P2P1) kullanıyor; zip arşivine geçiliyor.")
+        _log(f"[+] Arşivleniyor...")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            temp_zip = Path(tmpdir) / f"{dir_path.name}.zip"
+            stats = build_zip_parallel(dir_path, temp_zip)
+            _log(
+                f"[+] Arşiv oluşturuldu: {temp_zip} ({stats['files']} dosya, {stats['raw']} -> {stats['compressed']} bayt, "
+                f"{stats['stored']} sıkıştırmadan saklandı; sıkıştırma {stats['seconds']:.2f}s, {stats['workers']} iş parçacığı)"
+            )
+            reply = _send_over(conn, version, host, port, key, temp_zip, chunk_size, engine, streams, digest,
+                               compress=compress, chunk_policy=chunk_policy, sock_buf=sock_buf, keep=pool is not None)
+            lease.keep = float(reply.get("keep", 0))
+
+
+def _send_file_internal(host: str, port: int, pin: str, key: bytes, file_path: Path, chunk_size: int,
+                        engine: str = "auto", streams: int = 1, digest: str = "auto", delta: bool = False,
+                        compress: str = "off", chunk_policy: str = "static", sock_buf: Optional[int] = None,
+                        pool: Optional[ConnectionPool] = None) -> None:
+    """Internal function to send a file with automatic chunk size optimization."""
+    engine = resolve_send_engine(engine)
+    with _authenticated(host, port, key, pool) as lease:
+        reply = _send_over(lease.conn, lease.version, host, port, key, file_path, chunk_size, engine, streams, digest,
+                           delta, compress, chunk_policy, sock_buf, pool is not None)
+        lease.keep = float(reply.get("keep", 0))
+
+
+class _SendPlan:
+    """What the receiver agreed to for one file (see _offer_steps)."""
+
+    def __init__(self, chunk_size: int, streams: int):
+        self.chunk_size = chunk_size
+        self.streams = streams
+        self.session: Optional[str] = None
+        self.offset = 0
+        self.hasher = hashlib.sha256()
+        self.block_size = 0
+        self.signature: Optional[bytes] = None
+        self.codecs: list[str] = []
+        self.reply: dict = {}
+
+
+def _offer_steps(conn: socket.socket, version: int, host: str, port: int, file_path: Path, stat: os.stat_result,
+                 chunk_size: int, engine: str, streams: int, digest: str = "auto", delta: bool = False,
+                 compress: str = "off", sock_buf: Optional[int] = None, keep: bool = False):
+    """
+    Protocol steps announcing one file: the v2 header and the receiver's reply
+    (or the legacy P2P1 header), returning the agreed _SendPlan.
+    """
+    size = stat.st_size
+
+    # Auto-optimize chunk size if it looks like default
+    auto_chunk = chunk_size == 1024 * 1024
+    if auto_chunk:
+        optimal_size = get_optimal_chunk_size(size)
+        if optimal_size != chunk_size:
+            _log(f"[+] Blok boyutu optimize edildi: {chunk_size} -> {optimal_size} (dosya boyutu: {size} bayt)")
+            chunk_size = optimal_size
+
+    name_bytes = file_path.name.encode("utf-8")
+    if len(name_bytes) > 65535:
+        raise ValueError("Dosya adı çok uzun.")
+
+    _emit(StartEvent("send", file_path.name, size,
+                     f"[+] {file_path} ({size} bayt) gönderiliyor -> {host}:{port} (motor: {engine})"))
+    plan = _SendPlan(chunk_size, streams)
+    if version < 2:
+        if streams > 1:
+            _log("[!] Alıcı eski protokolü (P2P1) kullanıyor; tek akışa geçiliyor.")
+        plan.streams = 1
+        _apply_link(conn, None, sock_buf)
+        yield "send", struct.pack(">H", len(name_bytes)) + name_bytes + struct.pack(">Q", size)
+        return plan
+
+    offer = _offer_digests(digest)
+    header = {"name": file_path.name, "size": size, "mtime": stat.st_mtime_ns, "streams": streams,
+              "integrity": "merkle", "digests": offer, "probe": True}
+    if compress_offer(compress):
+        header["codecs"] = compress_offer(compress)
+    if keep:
+        header["keep"] = True
+    if SESSION_TICKETS.wants(conn):
+        header["ticket"] = True
+    if delta and size:
+        if streams > 1:
+            _log("[!] Delta aktarımı tek akış kullanır.")
+        header["streams"] = streams = 1
+        header["delta"] = True
+    yield "send", _encode_frame(header)
+    reply = plan.reply = yield from _reply_steps(conn)
+    link = _reply_link(reply)
+    _apply_link(conn, link, sock_buf)
+    plan.chunk_size = _link_chunk(link, chunk_size, auto_chunk)
+    digest = _accepted_digest(reply, offer)
+    if reply.get("integrity") == "merkle":
+        plan.hasher = MerkleHasher(digest=digest)
+    else:
+        plan.hasher = new_digest(digest)
+    granted = int(reply.get("streams", 1))
+    if granted != streams:
+        _log(f"[+] Alıcı {granted} paralel akış kabul etti (istenen {streams}).")
+    plan.streams, plan.session = granted, reply.get("session")
+    plan.offset = offset = int(reply.get("offset", 0))
+    if not 0 <= offset <= size:
+        raise ValueError("Alıcı geçersiz devam ofseti bildirdi.")
+    if offset:
+        _log(f"[+] Alıcıda {offset} bayt mevcut; kalan {size - offset} bayt gönderilecek.")
+    if "delta" in reply:
+        block_size, blocks = int(reply["delta"]["block"]), int(reply["delta"]["blocks"])
+        if not DELTA_MIN_BLOCK <= block_size <= DELTA_MAX_BLOCK or granted != 1 or offset:
+            raise ValueError("Alıcı geçersiz delta parametreleri bildirdi.")
+        plan.block_size = block_size
+        plan.signature = yield "recv", blocks * DELTA_ENTRY_SIZE
+        _log(f"[+] Alıcıda eski kopya var ({blocks} blok x {block_size} bayt); yalnızca değişen veri gönderilecek.")
+        if np is None:
+            _log("[!] NumPy yok; yalnızca hizalı bloklar aranıyor (kayan veri literal olarak gider).")
+    elif delta and size:
+        _log("[+] Alıcı delta önermedi (eski kopya yok ya da desteklemiyor); dosyanın tamamı gönderilecek.")
+    plan.codecs = _accepted_codecs(reply, header.get("codecs", []))
+    return plan
+
+
+def _close_send_steps(file_path: Path, size: int, plan: _SendPlan, start: float):
+    """Protocol steps after the payload: the digest trailer (with any Merkle repair) and the receiver's verdict."""
+    finish = time.perf_counter()
+    status = yield from _finish_send_steps(file_path, size, plan.hasher)
+    _emit(_hash_event(plan.hasher, size, time.perf_counter() - finish))
+    duration = time.time() - start
+    speed = size / duration / (1024 * 1024) if duration > 0 else 0
+    if status != b"OK":
+        raise ConnectionError("Alıcı doğrulama hatası bildirdi.")
+    _emit(FinishedEvent("send", file_path.name, size - plan.offset, duration,
+                        message=f"[✓] Aktarım tamamlandı ({duration:.2f}s, {speed:.2f} MiB/s)."))
+
+
+def _send_over(conn: socket.socket, version: int, host: str, port: int, key: bytes, file_path: Path,
+               chunk_size: int, engine: str, streams: int, digest: str = "auto", delta: bool = False,
+               compress: str = "off", chunk_policy: str = "static", sock_buf: Optional[int] = None,
+               keep: bool = False) -> dict:
+    """
+    Send one file over an authenticated connection: header, payload and digest
+    trailer. With delta, a receiver holding an old copy answers with its block
+    signature and only the changed data is sent (see _send_delta). With
+    compression accepted, chunks go through an AdaptiveCompressor. The adaptive
+    chunk policy applies to plain single-stream sends. A v2 receiver probes the
+    link before replying; its RTT and rate size the socket buffers. With keep,
+    the receiver is asked to hold the connection open for another transfer.
+    Returns the receiver's header reply ({} for P2P1).
+    """
+    stat = file_path.stat()
+    size = stat.st_size
+    start = time.time()
+    plan = _drive(conn, _offer_steps(conn, version, host, port, file_path, stat, chunk_size, engine, streams, digest,
+                                     delta, compress, sock_buf, keep))
+    chunk_size, hasher = plan.chunk_size, plan.hasher
+
+    if plan.signature is not None:
+        delta_start = time.time()
+        copied, literal = _send_delta(conn, file_path, size, chunk_size, plan.block_size, plan.signature, hasher)
+        _print_delta_summary(copied, literal, time.time() - delta_start)
+    elif plan.codecs:
+        compressor = AdaptiveCompressor(plan.codecs)
+        with file_path.open("rb") as f:
+            _send_payload_compressed(conn, f, size, chunk_size, compressor, hasher)
+        _log(compressor.report())
+    elif plan.streams > 1 or plan.offset:
+        if plan.streams > 1:
+            _log(f"[+] {plan.streams} paralel akış açılıyor.")
+        _send_parallel(host, port, key, conn, file_path, size, chunk_size, engine, plan.streams, plan.session,
+                       plan.offset, hasher)
+    else:
+        controller = chunk_controller(chunk_policy, chunk_size)
+        with file_path.open("rb") as f:
+            _send_payload(conn, file_path, f, size, chunk_size, engine, hasher, controller)
+        _print_chunk_report(controller)
+
+    _drive(conn, _close_send_steps(file_path, size, plan, start))
+    return plan.reply
+
+
+def _print_memory_report() -> None:
+    mib = 1024 * 1024
+    line = f"[+] Tampon havuzu tepe: {BUFFER_POOL.peak / mib:.1f} MiB (sınır {BUFFER_POOL.max_bytes / mib:.0f} MiB)"
+    rss = peak_rss_bytes()
+    if rss is not None:
+        line += f", süreç RSS tepe: {rss / mib:.1f} MiB"
+    _log(line)
+
+
+def unique_target(path: Path) -> Path:
+    """Avoid overwriting: append numeric suffix if needed."""
+    if not path.exists():
+        return path
+    stem, suffix = path.stem, path.suffix
+    parent = path.parent
+    for i in range(1, 10_000):
+        candidate = parent / f"{stem}_{i}{suffix}"
+        if not candidate.exists():
+            return candidate
+    raise FileExistsError("Uygun hedef adı bulunamadı (çok fazla çakışma).")
+
+
+def _recv_payload_loop(conn: socket.socket, f, size: int, chunk_size: int, hasher=None,
+                       controller: Optional[ChunkController] = None) -> bytes:
+    """Classic recv() loop; returns the digest of the received bytes (SHA-256 unless a hasher is given)."""
+    sha = hasher or hashlib.sha256()
+    meter = _reporter().meter("receive", size)
+    remaining = size
+    while remaining > 0:
+        start = time.perf_counter()
+        chunk = conn.recv(min(controller.size if controller else chunk_size, remaining))
+        if not chunk:
+            raise ConnectionError("Beklenmedik bağlantı kesildi.")
+        if controller:
+            controller.record(len(chunk), time.perf_counter() - start)
+        f.write(chunk)
+        sha.update(chunk)
+        meter.add(len(chunk))
+        remaining -= len(chunk)
+    return sha.digest()
+
+
+def _recv_payload_into(conn: socket.socket, f, size: int, chunk_size: int, hasher=None,
+                       controller: Optional[ChunkController] = None) -> bytes:
+    """recv_into() a pooled buffer and feed the same memory to write() and the hash."""
+    sha = hasher or hashlib.sha256()
+    meter = _reporter().meter("receive", size)
+    remaining = size
+    bufs = [None]
+    try:
+        while remaining > 0:
+            view = _pooled_view(bufs, 0, min(controller.size if controller else chunk_size, remaining))
+            start = time.perf_counter()
+            n = conn.recv_into(view)
+            if not n:
+                raise ConnectionError("Beklenmedik bağlantı kesildi.")
+            if controller:
+                controller.record(n, time.perf_counter() - start)
+            data = view[:n]
+            f.write(data)
+            sha.update(data)
+            meter.add(n)
+            remaining -= n
+    finally:
+        _release_views(bufs)
+    return sha.digest()
+
+
+def _recv_payload_pipeline(conn: socket.socket, f, size: int, chunk_size: int, hasher=None) -> bytes:
+    """Receive, write and hash as three overlapped stages (StagePipeline); returns the digest."""
+    sha = hasher or hashlib.sha256()
+    meter = _reporter().meter("receive", size)
+    remaining = size
+
+    def receiver(view) -> int:
+        nonlocal remaining
+        want = min(chunk_size, remaining)
+        if want:
+            recv_exact_into(conn, view[:want])
+            meter.add(want)
+            remaining -= want
+        return want
+
+    timings = StagePipeline(chunk_size, [("alım", receiver), ("yazma", f.write), ("özet", sha.update)]).run()
+    if size >= 50 * chunk_size:
+        _log(timings.report())
+    return sha.digest()
+
+
+def _splice_all(src: int, dst: int, count: int, offset_dst: Optional[int], timeout: Optional[float]) -> int:
+    """
+    splice() up to count bytes, waiting on non-blocking sockets.
+    Returns the number of bytes moved; 0 means the source reached EOF.
+    """
+    while True:
+        try:
+            return os.splice(src, dst, count, offset_dst=offset_dst, flags=os.SPLICE_F_MOVE)
+        except BlockingIOError:
+            readable, _, _ = select.select([src], [], [], timeout)
+            if not readable:
+                raise TimeoutError("Veri beklerken zaman aşımı.") from None
+
+
+def _hash_spliced(fd: int, size: int, progress: queue.Queue, chunk_size: int, hasher=None) -> bytes:
+    """Hash the ranges the splice loop reports as written, reading them back from the page cache."""
+    sha = hasher or hashlib.sha256()
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    hashed = 0
+    while hashed < size:
+        limit = progress.get()
+        if limit is None:
+            break
+        while hashed < limit:
+            n = os.preadv(fd, [view[: min(chunk_size, limit - hashed)]], hashed)
+            if not n:
+                raise ValueError("Yazılan veri geri okunamadı.")
+            sha.update(view[:n])
+            hashed += n
+    return sha.digest()
+
+
+def _recv_payload_splice(conn: socket.socket, f, size: int, chunk_size: int, hasher=None) -> bytes:
+    """
+    Move the payload socket -> pipe -> file with os.splice so no byte enters Python.
+    A helper thread hashes each written range from the page cache, keeping the
+    trailer check unchanged.
+    """
+    fd = f.fileno()
+    sock_fd = conn.fileno()
+    timeout = conn.gettimeout()
+    pipe_r, pipe_w = os.pipe()
+    progress: queue.Queue = queue.Queue()
+    meter = _reporter().meter("receive", size)
+    try:
+        if fcntl is not None and hasattr(fcntl, "F_SETPIPE_SZ"):
+            # Unprivileged pipes are capped by /proc/sys/fs/pipe-max-size (1 MiB by default).
+            for pipe_size in (chunk_size, 1024 * 1024):
+                try:
+                    fcntl.fcntl(pipe_w, fcntl.F_SETPIPE_SZ, pipe_size)
+                    break
+                except OSError:
+                    continue
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            digest_future = pool.submit(_hash_spliced, fd, size, progress, chunk_size, hasher)
+            written = 0
+            try:
+                while written < size:
+                    n = _splice_all(sock_fd, pipe_w, min(chunk_size, size - written), None, timeout)
+                    if not n:
+                        raise ConnectionError("Beklenmedik bağlantı kesildi.")
+                    moved = 0
+                    while moved < n:
+                        moved += _splice_all(pipe_r, fd, n - moved, written + moved, None)
+                    written += n
+                    progress.put(written)
+                    meter.add(n)
+            finally:
+                progress.put(None)
+            return digest_future.result()
+    finally:
+        os.close(pipe_r)
+        os.close(pipe_w)
+
+
+_SEEK_WRITE_LOCK = threading.Lock()
+
+
+def _pwrite_all(fd: int, data, offset: int) -> None:
+    """Write all of data at offset without moving other writers' file position."""
+    view = memoryview(data)
+    while view:
+        if hasattr(os, "pwrite"):
+            n = os.pwrite(fd, view, offset)
+        else:  # Windows: emulate pwrite with a locked seek + write
+            with _SEEK_WRITE_LOCK:
+                os.lseek(fd, offset, os.SEEK_SET)
+                n = os.write(fd, view)
+        view = view[n:]
+        offset += n
+
+
+def _preallocate(f, size: int) -> None:
+    """Reserve the full target size up front so parallel ranges can be written at their offsets."""
+    if hasattr(os, "posix_fallocate") and size > 0:
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return
+        except OSError:
+            pass  # e.g. filesystems without fallocate support
+    f.truncate(size)
+
+
+class TransferJournal:
+    """
+    Checkpoint journal for resumable receives.
+
+    Data is written to <name>.part; <name>.part.json records the sender's file
+    identity (name, size, mtime) and the length of the contiguous prefix that
+    has been fsync'ed. A sender reconnecting with the same identity is told to
+    resume from there. One session at a time may hold a given .part file; the
+    claim is dropped with release().
+    """
+
+    _held: set[str] = set()
+    _held_lock = threading.Lock()
+
+    def __init__(self, part: Path, meta: dict, offset: int):
+        self.part = part
+        self.path = part.with_name(part.name + ".json")
+        self.meta = meta
+        self.offset = offset
+        self._fd: Optional[int] = None
+        self._ranges: list[Tuple[int, int]] = []
+        self._progress: list[int] = []
+        self._saved_at = offset
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, part: Path, meta: dict) -> Optional["TransferJournal"]:
+        """Claim part and load its journal; None while another session in this process holds it."""
+        with cls._held_lock:
+            if os.path.abspath(part) in cls._held:
+                return None
+            cls._held.add(os.path.abspath(part))
+        journal = cls(part, meta, 0)
+        try:
+            saved = json.loads(journal.path.read_text(encoding="utf-8"))
+            if all(saved.get(k) == v for k, v in meta.items()) and part.exists():
+                journal.offset = min(int(saved.get("offset", 0)), part.stat().st_size, int(meta["size"]))
+        except (OSError, ValueError):
+            pass
+        journal._saved_at = journal.offset
+        return journal
+
+    def track(self, fd: int, ranges: list[Tuple[int, int]]) -> None:
+        """Follow the contiguous (offset, length) ranges that are about to be written through fd."""
+        with self._lock:
+            self._fd = fd
+            self._ranges = ranges
+            self._progress = [offset for offset, _ in ranges]
+
+    def advance(self, index: int, position: int) -> None:
+        with self._lock:
+            self._progress[index] = position
+            if self._contiguous() - self._saved_at >= CHECKPOINT_INTERVAL:
+                self._save_locked()
+
+    def save(self) -> int:
+        """fsync the data and record the durable prefix; returns its length."""
+        with self._lock:
+            return self._save_locked()
+
+    def remove(self) -> None:
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def release(self) -> None:
+        with self._held_lock:
+            self._held.discard(os.path.abspath(self.part))
+
+    def _contiguous(self) -> int:
+        done = self.offset
+        for (offset, length), position in zip(self._ranges, self._progress):
+            done = position
+            if position < offset + length:
+                break
+        return done
+
+    def _save_locked(self) -> int:
+        if self._fd is not None:
+            os.fsync(self._fd)
+        done = self._contiguous()
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({**self.meta, "offset": done}), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._saved_at = done
+        return done
+
+
+def _recv_range(conn: socket.socket, fd: int, offset: int, length: int, chunk_size: int,
+                sha=None, on_progress=None, meter: Optional[_ProgressMeter] = None) -> None:
+    """
+    recv_into a pooled buffer and write each piece at its offset in the target file.
+    Optionally feeds a running hash and reports the new end position after each write.
+    """
+    end = offset + length
+    with BUFFER_POOL.buffer(chunk_size) as buf:
+        view = memoryview(buf)
+        while offset < end:
+            n = conn.recv_into(view, min(chunk_size, end - offset))
+            if not n:
+                raise ConnectionError("Beklenmedik bağlantı kesildi.")
+            data = view[:n]
+            _pwrite_all(fd, data, offset)
+            if sha is not None:
+                sha.update(data)
+            offset += n
+            if on_progress is not None:
+                on_progress(offset)
+            if meter is not None:
+                meter.add(n)
+
+
+def _recv_resumable(conn: socket.socket, target: Path, f, offset: int, size: int, chunk_size: int,
+                    journal: TransferJournal, hasher=None) -> bytes:
+    """Single-stream receive into the .part file with checkpoints; the prefix already on disk is hashed first."""
+    sha = file_hasher(target, chunk_size, offset, hasher)
+    journal.track(f.fileno(), [(offset, size - offset)])
+    _recv_range(conn, f.fileno(), offset, size - offset, chunk_size, sha, partial(journal.advance, 0),
+                _reporter().meter("receive", size - offset))
+    f.truncate(size)
+    return sha.digest()
+
+
+def _recv_parallel(joins, conn: socket.socket, target: Path, f, size: int, chunk_size: int, streams: int,
+                   session: str, start: int = 0, journal: Optional[TransferJournal] = None,
+                   hasher=None) -> bytes:
+    """
+    Receive [start, size) as `streams` byte ranges concurrently: range 0 on the
+    control connection, the others on connections that authenticate and join
+    with the session token (handed over by `joins`). Each range is written at
+    its offset; the whole file is hashed once all have landed.
+    """
+    _preallocate(f, size)
+    ranges = split_ranges(size, streams, start)
+    fd = f.fileno()
+    if journal is not None:
+        journal.track(fd, ranges)
+
+    def progress(index: int):
+        return partial(journal.advance, index) if journal is not None else None
+
+    meter = _reporter().meter("receive", size - start)
+    extra = []
+    try:
+        with ThreadPoolExecutor(max_workers=streams) as pool:
+            futures = [pool.submit(_recv_range, conn, fd, *ranges[0], chunk_size, None, progress(0), meter)]
+            joined = set()
+            while len(joined) < streams - 1:
+                index, side = joins.next(session)
+                extra.append(side)
+                if not 0 < index < streams or index in joined:
+                    _log(f"[!] Ek akış reddedildi: geçersiz akış numarası {index}")
+                    side.close()
+                    continue
+                joined.add(index)
+                futures.append(pool.submit(_recv_range, side, fd, *ranges[index], chunk_size, None, progress(index),
+                                           meter))
+            for future in futures:
+                future.result()
+    finally:
+        for side in extra:
+            side.close()
+    return hash_file(target, chunk_size, hasher)
+
+
+class _ListenerJoins:
+    """Extra parallel streams of a single receive, accepted straight from its own listener."""
+
+    def __init__(self, srv: socket.socket, key: bytes):
+        self.srv = srv
+        self.key = key
+
+    def open(self, session: str) -> None:
+        return
+
+    def close(self, session: str) -> None:
+        return
+
+    def next(self, session: str) -> Tuple[int, socket.socket]:
+        self.srv.settimeout(JOIN_TIMEOUT)
+        try:
+            while True:
+                side, addr = self.srv.accept()
+                addr = _peer_addr(addr)
+                side.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                try:
+                    handshake(side, self.key, initiator=False)
+                    join = recv_frame(side)
+                    if join.get("join") != session:
+                        raise ValueError("geçersiz oturum")
+                    return int(join.get("index", 0)), side
+                except (PermissionError, ValueError, ConnectionError) as exc:
+                    _log(f"[!] Ek akış reddedildi ({addr[0]}:{addr[1]}): {exc}")
+                    side.close()
+        finally:
+            self.srv.settimeout(None)
+
+
+class _SessionJoins:
+    """Extra parallel streams routed to their session by a daemon's accept loop."""
+
+    def __init__(self):
+        self._queues: dict[str, queue.Queue] = {}
+        self._lock = threading.Lock()
+
+    def open(self, session: str) -> None:
+        with self._lock:
+            self._queues[session] = queue.Queue()
+
+    def close(self, session: str) -> None:
+        with self._lock:
+            pending = self._queues.pop(session, None)
+        while pending is not None and not pending.empty():
+            pending.get_nowait()[1].close()
+
+    def deliver(self, session: str, index: int, side: socket.socket) -> bool:
+        with self._lock:
+            target = self._queues.get(session)
+            if target is None:
+                return False
+            target.put((index, side))
+            return True
+
+    def next(self, session: str) -> Tuple[int, socket.socket]:
+        with self._lock:
+            pending = self._queues[session]
+        try:
+            return pending.get(timeout=JOIN_TIMEOUT)
+        except queue.Empty:
+            raise TimeoutError("Ek akış bağlantısı zaman aşımına uğradı.") from None
+
+
+def _recv_payload_compressed(conn: socket.socket, f, size: int, hasher=None) -> bytes:
+    """Receive a chunked, per-chunk compressed payload; the digest is taken over the decompressed bytes."""
+    sha = hasher or hashlib.sha256()
+    meter = _reporter().meter("receive", size)
+    received = 0
+    while received < size:
+        kind, wire_len, raw_len = COMPRESS_HEADER.unpack(recv_exact(conn, COMPRESS_HEADER.size))
+        if not 0 < raw_len <= min(MAX_FRAME_SIZE, size - received) or wire_len > MAX_FRAME_SIZE:
+            raise ValueError("Geçersiz sıkıştırılmış blok başlığı.")
+        payload = recv_exact(conn, wire_len)
+        if kind == COMPRESS_RAW:
+            if wire_len != raw_len:
+                raise ValueError("Geçersiz sıkıştırılmış blok başlığı.")
+            data = payload
+        else:
+            data = _decompress(kind, payload, raw_len)
+        f.write(data)
+        sha.update(data)
+        meter.add(raw_len)
+        received += raw_len
+    return sha.digest()
+
+
+def _recv_payload(conn: socket.socket, f, size: int, chunk_size: int, engine: str, hasher=None,
+                  controller: Optional[ChunkController] = None) -> bytes:
+    """
+    Receive a whole payload over one stream with the resolved engine; returns
+    its digest (SHA-256 by default). Only recv_into and loop use the controller.
+    """
+    if engine == "splice":
+        return _recv_payload_splice(conn, f, size, chunk_size, hasher)
+    if engine == "recv_into":
+        return _recv_payload_into(conn, f, size, chunk_size, hasher, controller)
+    if engine == "pipeline":
+        return _recv_payload_pipeline(conn, f, size, chunk_size, hasher)
+    return _recv_payload_loop(conn, f, size, chunk_size, hasher, controller)
+
+
+def _safe_join(root: Path, rel: str) -> Path:
+    """Join a sender-supplied relative POSIX path under root, rejecting anything that could escape it."""
+    rel_path = PurePosixPath(rel)
+    parts = rel_path.parts
+    if not parts or rel_path.is_absolute() or any(
+        part in ("..", ".") or "\\" in part or (os.name == "nt" and ":" in part) for part in parts
+    ):
+        raise ValueError(f"Güvensiz yol reddedildi: {rel}")
+    return root.joinpath(*parts)
+
+
+def _negotiate_digest(header: dict, policy: str) -> str:
+    """
+    Pick the digest for a v2 session from the sender's offer (senders that
+    predate negotiation only know SHA-256). Raises ValueError without a common
+    choice; the caller then answers {"error": "digest"}.
+    """
+    offer = [str(name) for name in header.get("digests", ["sha256"])]
+    chosen = choose_digest(offer, policy)
+    if chosen is None:
+        raise ValueError(f"Ortak özet algoritması yok (önerilen: {', '.join(offer)}; ilke: {policy}).")
+    _log(f"[+] Özet algoritması: {chosen}")
+    return chosen
+
+
+def _accept_steps(conn: socket.socket, header: dict, output_dir: Path, digest: str, sock_buf: Optional[int]):
+    """
+    Protocol steps on a v2 header before the reply: settle the digest and
+    the destination (answering {"error": ...} when either is refused), then
+    probe the link if asked. Returns (digest, destination or None for
+    batch/mux sessions, link).
+    """
+    try:
+        digest = _negotiate_digest(header, digest)
+    except ValueError:
+        yield "send", _encode_frame({"error": "digest"})
+        raise
+    dest = None
+    if header.get("kind") not in ("mux", "batch"):
+        try:
+            dest = _safe_join(output_dir, PurePosixPath(str(header["name"])).name)
+        except ValueError:
+            yield "send", _encode_frame({"error": "name"})
+            raise
+    link = (yield from _probe_steps()) if header.get("probe") else None
+    _apply_link(conn, link, sock_buf)
+    return digest, dest, link
+
+
+def _legacy_header_steps(conn: socket.socket, output_dir: Path, sock_buf: Optional[int]):
+    """Protocol steps reading a P2P1 header; returns (name, size, destination)."""
+    _apply_link(conn, None, sock_buf)
+    name_len = struct.unpack(">H", (yield "recv", 2))[0]
+    name = (yield "recv", name_len).decode("utf-8", errors="replace")
+    size = struct.unpack(">Q", (yield "recv", 8))[0]
+    return name, size, _safe_join(output_dir, PurePosixPath(name).name)
+
+
+def _reply_hasher(header: dict, reply: dict, digest: str):
+    """Payload hasher for a single file, agreeing to Merkle integrity in the reply when the sender asked for it."""
+    if header.get("integrity") == "merkle":
+        reply["integrity"] = "merkle"
+        return MerkleHasher(digest=digest)
+    return new_digest(digest)
+
+
+def _receive_chunk(chunk_size: int, size: int, link: Optional[dict]) -> int:
+    """Block size for receiving `size` bytes: a default chunk_size follows the file size and the probed BDP."""
+    auto_chunk = chunk_size == 1024 * 1024
+    if auto_chunk:
+        optimal_size = get_optimal_chunk_size(size)
+        if optimal_size != chunk_size:
+            _log(f"[+] Blok boyutu optimize edildi: {chunk_size} -> {optimal_size} (dosya boyutu: {size} bayt)")
+            chunk_size = optimal_size
+    return _link_chunk(link, chunk_size, auto_chunk)
+
+
+def _close_recv_steps(target: Path, size: int, hasher):
+    """Protocol steps after the payload: check (or repair) against the sender's trailer; returns whether it verified."""
+    finish = time.perf_counter()
+    verified = yield from _finish_recv_steps(target, size, hasher)
+    _emit(_hash_event(hasher, size, time.perf_counter() - finish))
+    return verified
+
+
+def _recv_tree(conn: socket.socket, dest: Path, chunk_size: int, engine: str, digest: str = "sha256",
+               compressed: bool = False, controller: Optional[ChunkController] = None) -> Tuple[int, int]:
+    """
+    Extract a streamed directory entry by entry into dest (or a free variant
+    of it), verifying every file. The stream is read to its end frame before
+    the single OK/NO status, so the sender sees the verdict rather than a
+    reset; on any failure the partially extracted directory is removed.
+    """
+    root = unique_target(dest)
+    root.mkdir(parents=True)
+    _log(f"[+] Dizin alınıyor -> {root} (motor: {engine})")
+    files = total = 0
+    bad: list[str] = []
+    start = time.time()
+    try:
+        while True:
+            entry = recv_frame(conn)
+            kind = entry.get("type")
+            if kind == "end":
+                break
+            rel = str(entry.get("path", ""))
+            target = _safe_join(root, rel)
+            if kind == "dir":
+                target.mkdir(parents=True, exist_ok=True)
+                continue
+            if kind != "file":
+                raise ValueError(f"Bilinmeyen dizin girdisi: {kind}")
+            size = int(entry["size"])
+            target.parent.mkdir(parents=True, exist_ok=True)
+            hasher = new_digest(digest)
+            with target.open("w+b") as f:
+                if compressed:
+                    actual_hash = _recv_payload_compressed(conn, f, size, hasher)
+                else:
+                    actual_hash = _recv_payload(conn, f, size, chunk_size, engine, hasher, controller)
+            expected_hash = recv_exact(conn, hasher.digest_size)
+            if not hmac.compare_digest(actual_hash, expected_hash):
+                bad.append(rel)
+                _log(f"[!] Hash eşleşmedi: {rel}")
+            elif "mtime" in entry:
+                os.utime(target, ns=(int(entry["mtime"]), int(entry["mtime"])))
+            files += 1
+            total += size
+        if bad:
+            conn.sendall(b"NO")
+            raise ValueError(f"Dizinde {len(bad)} dosyanın hash'i eşleşmedi (ilki: {bad[0]}); dizin silindi.")
+        if entry.get("files") != files or entry.get("bytes") != total:
+            conn.sendall(b"NO")
+            raise ValueError("Dizin akışı eksik: dosya/bayt sayıları uyuşmuyor; dizin silindi.")
+        conn.sendall(b"OK")
+    except BaseException:
+        shutil.rmtree(root, ignore_errors=True)
+        raise
+    duration = time.time() - start
+    speed = total / duration / (1024 * 1024) if duration > 0 else 0
+    _emit(FinishedEvent("receive", root.name, total, duration, files,
+                        f"[✓] Dizin alındı: {files} dosya, {total} bayt ({duration:.2f}s, {speed:.2f} MiB/s)."))
+    return files, total
+
+
+def _recv_batch(conn: socket.socket, output_dir: Path, chunk_size: int, engine: str,
+                digest: str = "sha256") -> Tuple[int, int]:
+    """Receive a batch session: write and verify each file in turn, acknowledging it with OK/NO."""
+    _log(f"[+] Toplu alım başladı -> {output_dir} (motor: {engine})")
+    files = failed = total = 0
+    start = time.time()
+    while True:
+        entry = recv_frame(conn)
+        if entry.get("type") == "end":
+            break
+        name = str(entry.get("name", ""))
+        size = int(entry["size"])
+        target = unique_target(_safe_join(output_dir, PurePosixPath(name).name))
+        hasher = new_digest(digest)
+        with target.open("w+b") as f:
+            actual_hash = _recv_payload(conn, f, size, chunk_size, engine, hasher)
+        expected_hash = recv_exact(conn, hasher.digest_size)
+        files += 1
+        total += size
+        if hmac.compare_digest(actual_hash, expected_hash):
+            conn.sendall(b"OK")
+        else:
+            failed += 1
+            target.unlink()
+            conn.sendall(b"NO")
+            _log(f"[!] Hash eşleşmedi: {name}; dosya silindi.")
+    _print_batch_summary("Toplu alım", files, failed, total, time.time() - start)
+    if failed:
+        raise ValueError(f"{failed} dosya doğrulanamadı.")
+    return files, total
+
+
+def _recv_mux(conn: socket.socket, output_dir: Path, digest: str = "sha256") -> Tuple[int, int]:
+    """
+    Receive a multiplexed batch session: frames of interleaved streams are
+    written to their files as they arrive. Credit is returned once a quarter
+    window has been written, and every stream is acknowledged on close. The
+    sender's framing is checked against MUX_MAX_OPEN and each announced size;
+    a session that breaks off removes the files it left half-written.
+    """
+    _log(f"[+] Çoklanmış toplu alım başladı -> {output_dir}")
+    streams: dict[int, list] = {}
+    files = failed = total = 0
+    start = time.time()
+    try:
+        with BUFFER_POOL.buffer(MUX_FRAME_SIZE) as buf:
+            view = memoryview(buf)
+            while True:
+                kind, sid, length = MUX_HEADER.unpack(recv_exact(conn, MUX_HEADER.size))
+                if kind == MUX_END:
+                    break
+                if kind == MUX_OPEN:
+                    if sid in streams or len(streams) >= MUX_MAX_OPEN or length > MUX_FRAME_SIZE:
+                        raise ValueError("Geçersiz çoklama çerçevesi: akış açılamaz.")
+                    meta = json.loads(recv_exact(conn, length).decode("utf-8"))
+                    name = str(meta.get("name", ""))
+                    size = int(meta["size"])
+                    if size < 0:
+                        raise ValueError(f"Geçersiz dosya boyutu: {name}")
+                    target = unique_target(_safe_join(output_dir, PurePosixPath(name).name))
+                    f = target.open("wb")
+                    # [name, target, file, hasher, expected size, received, uncredited bytes]
+                    streams[sid] = [name, target, f, new_digest(digest), size, 0, 0]
+                elif kind == MUX_DATA:
+                    stream = streams.get(sid)
+                    if stream is None or length > MUX_FRAME_SIZE or stream[5] + length > stream[4]:
+                        raise ValueError("Geçersiz çoklama çerçevesi.")
+                    data = view[:length]
+                    recv_exact_into(conn, data)
+                    stream[2].write(data)
+                    stream[3].update(data)
+                    stream[5] += length
+                    stream[6] += length
+                    if stream[6] >= MUX_WINDOW // 4:
+                        conn.sendall(MUX_HEADER.pack(MUX_CREDIT, sid, 4) + struct.pack(">I", stream[6]))
+                        stream[6] = 0
+                elif kind == MUX_CLOSE:
+                    if sid not in streams or length > HASH_SIZE * 2:
+                        raise ValueError("Geçersiz çoklama çerçevesi.")
+                    name, target, f, sha, size, received, _ = streams.pop(sid)
+                    f.close()
+                    expected_hash = recv_exact(conn, length)
+                    files += 1
+                    total += received
+                    if received == size and hmac.compare_digest(sha.digest(), expected_hash):
+                        conn.sendall(MUX_HEADER.pack(MUX_ACK, sid, 2) + b"OK")
+                    else:
+                        failed += 1
+                        target.unlink()
+                        conn.sendall(MUX_HEADER.pack(MUX_ACK, sid, 2) + b"NO")
+                        _log(f"[!] Hash eşleşmedi: {name}; dosya silindi.")
+                else:
+                    raise ValueError(f"Bilinmeyen çoklama çerçevesi: {kind}")
+    finally:
+        for name, target, f, *_ in streams.values():
+            f.close()
+            target.unlink(missing_ok=True)
+            _log(f"[!] Yarım kalan dosya silindi: {name}")
+    _print_batch_summary("Çoklanmış toplu alım", files, failed, total, time.time() - start)
+    if failed:
+        raise ValueError(f"{failed} dosya doğrulanamadı.")
+    return files, total
+
+
+def _receive_session(conn: socket.socket, version: int, header: Optional[dict], output_dir: Path, chunk_size: int,
+                     engine: str, resume: bool, joins, digest: str = "auto", chunk_policy: str = "static",
+                     sock_buf: Optional[int] = None, keep: float = 0) -> dict:
+    """
+    Receive one transfer over an authenticated connection: dispatch on the v2
+    header kind (or read the legacy P2P1 header) and return its stats. When the
+    sender asks for it, the link is probed before replying (see probe_link).
+    A positive keep (seconds) is promised to senders that ask to reuse the
+    connection; holding it open afterwards is up to the caller.
+    """
+    with ExitStack() as held:
+        return _receive_transfer(conn, version, header, output_dir, chunk_size, engine, resume, joins, digest,
+                                 chunk_policy, sock_buf, keep, held)
+
+
+def _receive_transfer(conn: socket.socket, version: int, header: Optional[dict], output_dir: Path, chunk_size: int,
+                      engine: str, resume: bool, joins, digest: str, chunk_policy: str, sock_buf: Optional[int],
+                      keep: float, held: ExitStack) -> dict:
+    """Body of _receive_session; claims that must be dropped however it exits (the resume journal) go on held."""
+    started = time.time()
+    streams, session, offset, journal, hasher, reply, link = 1, None, 0, None, hashlib.sha256(), {}, None
+    auto_chunk = chunk_size == 1024 * 1024
+    if header is not None:
+        digest, dest, link = _drive(conn, _accept_steps(conn, header, output_dir, digest, sock_buf))
+        probe = {"rtt": link["rtt"], "rate": link["rate"]} if link else {}
+        kept = {"keep": keep} if keep > 0 and header.get("keep") else {}
+        ticket = SESSION_TICKETS.answer(conn, header)
+        codecs = [codec for codec in header.get("codecs", []) if codec in available_codecs()]
+        if header.get("kind") == "tree":
+            send_frame(conn, {"streams": 1, "digest": digest, "codecs": codecs, **probe, **kept, **ticket})
+            chunk_size = _link_chunk(link, chunk_size, auto_chunk)
+            controller = chunk_controller(chunk_policy, chunk_size)
+            files, total = _recv_tree(conn, dest, chunk_size, engine, digest, bool(codecs), controller)
+            _print_chunk_report(controller)
+            return {"name": str(header["name"]), "files": files, "bytes": total, "seconds": time.time() - started}
+        if header.get("kind") == "mux":
+            send_frame(conn, {"streams": 1, "window": MUX_WINDOW, "digest": digest, **kept, **ticket})
+            files, total = _recv_mux(conn, output_dir, digest)
+            return {"name": "mux", "files": files, "bytes": total, "seconds": time.time() - started}
+        if header.get("kind") == "batch":
+            send_frame(conn, {"streams": 1, "digest": digest, **kept, **ticket})
+            files, total = _recv_batch(conn, output_dir, chunk_size, engine, digest)
+            return {"name": "batch", "files": files, "bytes": total, "seconds": time.time() - started}
+        name, size = str(header["name"]), int(header["size"])
+        if resume:
+            meta = {"name": name, "size": size, "mtime": header.get("mtime")}
+            journal = TransferJournal.open(dest.with_name(f"{dest.name}.part"), meta)
+            if journal is None:
+                _log(f"[!] {dest.name} için başka bir sürdürülebilir alım sürüyor; bu aktarım sürdürmesiz alınıyor.")
+            else:
+                held.callback(journal.release)
+                offset = journal.offset
+        streams = accepted_streams(int(header.get("streams", 1)), size - offset)
+        session = secrets.token_hex(8)
+        joins.open(session)
+        reply = {"streams": streams, "session": session, "offset": offset, "digest": digest, **probe, **kept,
+                 **ticket}
+        hasher = _reply_hasher(header, reply, digest)
+        basis = dest
+        if header.get("delta") and journal is None and streams == 1 and basis.is_file():
+            delta = {"block": delta_block_size(basis.stat().st_size)}
+            signature = delta_signature(basis, delta["block"])
+            delta["blocks"] = len(signature) // DELTA_ENTRY_SIZE
+            if delta["blocks"]:
+                reply["delta"] = delta
+        if codecs and streams == 1 and journal is None and "delta" not in reply:
+            reply["codecs"] = codecs
+            _log(f"[+] Uyarlamalı sıkıştırma kabul edildi: {', '.join(codecs)}")
+        send_frame(conn, reply)
+        if "delta" in reply:
+            conn.sendall(signature)
+            _log(f"[+] Eski kopya bulundu: {basis} ({delta['blocks']} blok x {delta['block']} bayt imza gönderildi)")
+    else:
+        name, size, dest = _drive(conn, _legacy_header_steps(conn, output_dir, sock_buf))
+    chunk_size = _receive_chunk(chunk_size, size, link)
+
+    if journal is not None:
+        target = journal.part
+        if offset:
+            _log(f"[+] Kaldığı yerden devam ediliyor: {offset}/{size} bayt ({target})")
+    else:
+        target = unique_target(dest)
+    if streams > 1:
+        _emit(StartEvent("receive", target.name, size, f"[+] Alınıyor -> {target} (beklenen {size} bayt, {streams} paralel akış)"))
+    else:
+        _emit(StartEvent("receive", target.name, size, f"[+] Alınıyor -> {target} (beklenen {size} bayt, motor: {engine})"))
+
+    start = time.time()
+    # w+b: the splice engine hashes by reading the written ranges back.
+    with target.open("r+b" if offset else "w+b") as f:
+        try:
+            if streams > 1:
+                _recv_parallel(joins, conn, target, f, size, chunk_size, streams, session, offset, journal, hasher)
+            elif journal is not None:
+                _recv_resumable(conn, target, f, offset, size, chunk_size, journal, hasher)
+            elif "delta" in reply:
+                copied, literal = _recv_delta(conn, basis, f, size, delta["block"], delta["blocks"], hasher)
+                _print_delta_summary(copied, literal, time.time() - start)
+            elif "codecs" in reply:
+                _recv_payload_compressed(conn, f, size, hasher)
+            else:
+                controller = chunk_controller(chunk_policy, chunk_size)
+                _recv_payload(conn, f, size, chunk_size, engine, hasher, controller)
+                _print_chunk_report(controller)
+        except BaseException:
+            if journal is not None:
+                # Keep whatever reached the disk for the next attempt.
+                saved = journal.save()
+                _log(f"[!] Aktarım yarıda kaldı; {saved} bayt devam için saklandı.")
+            else:
+                # Without a journal a half-written file would pass for a complete one.
+                f.close()
+                target.unlink(missing_ok=True)
+                _log(f"[!] Aktarım yarıda kaldı; yarım dosya silindi: {target.name}")
+            raise
+        finally:
+            if session is not None:
+                joins.close(session)
+    if _drive(conn, _close_recv_steps(target, size, hasher)):
+        if journal is not None:
+            final = unique_target(dest)
+            os.replace(target, final)
+            journal.remove()
+            target = final
+        duration = time.time() - start
+        speed = size / duration / (1024 * 1024) if duration > 0 else 0
+        _emit(FinishedEvent("receive", target.name, size - offset, duration,
+                            message=f"[✓] Aktarım başarıyla doğrulandı ({duration:.2f}s, {speed:.2f} MiB/s)."))
+        _print_memory_report()
+        return {"name": target.name, "files": 1, "bytes": size - offset, "seconds": time.time() - started}
+    try:
+        target.unlink()
+    except FileNotFoundError:
+        pass
+    if journal is not None:
+        journal.remove()
+    raise ValueError("Hash eşleşmedi; dosya silindi.")
+
+
+def _listen(bind: str, port: int, backlog: int) -> socket.socket:
+    """
+    Listening socket for bind: a wildcard bind ("0.0.0.0", "::" or "") is one
+    dual-stack IPv6 socket accepting IPv4 too where the platform supports it.
+    """
+    if bind in ("", "0.0.0.0", "::") and socket.has_dualstack_ipv6():
+        return socket.create_server(("::", port), family=socket.AF_INET6, backlog=backlog, dualstack_ipv6=True)
+    family = socket.AF_INET6 if ":" in bind else socket.AF_INET
+    srv = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        srv.bind((bind, port))
+        srv.listen(backlog)
+    except BaseException:
+        srv.close()
+        raise
+    return srv
+
+
+def _peer_addr(addr: tuple) -> tuple:
+    """(host, port) of an accepted peer, with IPv4-mapped IPv6 addresses from a dual-stack listener unmapped."""
+    host = addr[0]
+    try:
+        mapped = ipaddress.ip_address(host).ipv4_mapped if ":" in host else None
+    except ValueError:
+        mapped = None
+    return (str(mapped) if mapped else host, addr[1])
+
+
+def receive_file(bind: str, port: int, pin: str, output_dir: Path, chunk_size: int = None, engine: str = "auto",
+                 resume: bool = False, digest: str = "auto", chunk_policy: str = "static",
+                 sock_buf: Optional[int] = None, announce: Optional[str] = None,
+                 observer: Optional[Callable[[TransferEvent], None]] = None,
+                 progress_interval: Optional[float] = PROGRESS_INTERVAL) -> None:
+    """Blocking wrapper over async_receive_file; also callable from inside a running event loop."""
+    _run_blocking(async_receive_file, bind, port, pin, output_dir, chunk_size, engine, resume, digest, chunk_policy,
+                  sock_buf, announce, observer, progress_interval)
+
+
+class ReceiverDaemon:
+    """
+    Long-running receiver: one listener serving many concurrent senders.
+
+    Every accepted connection is authenticated on its own short-lived thread
+    (bounded by JOIN_TIMEOUT), so a slow or hostile peer cannot stall the
+    accept loop. Transfers then run on a worker pool of `max_transfers`
+    threads; senders beyond the overall or per-peer limit are turned away
+    with a "busy" reply. Extra parallel-stream connections are routed to
+    their session and do not count against the limits.
+
+    A sender that asks for it (ConnectionPool) keeps its connection after a
+    transfer: it waits up to `keep_idle` seconds on a light thread, holding
+    neither a worker nor a limit slot, and its next header is admitted like
+    a new transfer without another handshake. keep_idle=0 closes every
+    connection after its transfer. With announce, the daemon is announced
+    on the LAN under that name while it serves (see Announcer). Events go to
+    observer, labelled with the sender's "host:port".
+    """
+
+    def __init__(self, bind: str, port: int, pin: str, output_dir: Path, chunk_size: int = None,
+                 engine: str = "auto", resume: bool = False, max_transfers: int = 8, max_per_peer: int = 2,
+                 digest: str = "auto", chunk_policy: str = "static", sock_buf: Optional[int] = None,
+                 keep_idle: float = KEEP_IDLE_TIMEOUT, announce: Optional[str] = None,
+                 observer: Optional[Callable[[TransferEvent], None]] = None,
+                 progress_interval: Optional[float] = PROGRESS_INTERVAL):
+        if max_transfers <= 0 or max_per_peer <= 0:
+            raise ValueError("Eşzamanlı aktarım sınırları pozitif olmalı.")
+        if keep_idle < 0:
+            raise ValueError("Bekleme süresi negatif olamaz.")
+        if digest not in DIGEST_POLICIES:
+            raise ValueError(f"Bilinmeyen özet ilkesi: {digest}")
+        if chunk_policy not in CHUNK_POLICIES:
+            raise ValueError(f"Bilinmeyen blok boyutu ilkesi: {chunk_policy}")
+        self.bind = bind
+        self.port = port
+        self.key = derive_key(pin)
+        self.output_dir = output_dir
+        self.chunk_size = chunk_size or 1024 * 1024
+        self.engine = resolve_recv_engine(engine)
+        self.resume = resume
+        self.digest = digest
+        self.chunk_policy = chunk_policy
+        self.sock_buf = sock_buf
+        self.keep_idle = keep_idle
+        self.announce = announce
+        self.observer = observer
+        self.progress_interval = progress_interval
+        self.max_transfers = max_transfers
+        self.max_per_peer = max_per_peer
+        self.stats: list[dict] = []
+        self._joins = _SessionJoins()
+        self._active: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        """Stop accepting; serve_forever returns once running transfers finish."""
+        self._stop.set()
+
+    def serve_forever(self) -> None:
+        with _observing(self.observer, self.progress_interval):
+            self._serve()
+
+    def _serve(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with _listen(self.bind, self.port, 128) as srv, \
+                ThreadPoolExecutor(max_workers=self.max_transfers, thread_name_prefix="p2p-recv") as pool:
+            srv.settimeout(0.5)
+            _emit(ListeningEvent(self.bind, self.port,
+                                 f"[+] Sunucu dinleniyor: {self.bind}:{self.port} (en fazla {self.max_transfers} "
+                                 f"eşzamanlı aktarım, eş başına {self.max_per_peer}; motor: {self.engine})"))
+            announcer = _announcer(self.announce, self.bind, self.port, self.key,
+                                   _receiver_caps("serve", self.resume, self.keep_idle))
+            try:
+                while not self._stop.is_set():
+                    try:
+                        conn, addr = srv.accept()
+                        addr = _peer_addr(addr)
+                    except socket.timeout:
+                        continue
+                    except OSError as exc:
+                        _log(f"[!] Bağlantı kabul edilemedi: {exc}")
+                        continue
+                    reporter = TransferReporter(self.observer, self.progress_interval, f"{addr[0]}:{addr[1]}")
+                    threading.Thread(target=_carry(self._admit, reporter), args=(pool, conn, addr), daemon=True).start()
+            except KeyboardInterrupt:
+                _log("\n[!] Kapatılıyor; süren aktarımlar bekleniyor (iptal için tekrar Ctrl+C)...")
+            self._stop.set()
+            if announcer is not None:
+                announcer.stop()
+        self._print_summary()
+
+    def _admit(self, pool: ThreadPoolExecutor, conn: socket.socket, addr) -> None:
+        """Authenticate a connection, then route it as a join or hand it to the pool as a transfer."""
+        try:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.settimeout(JOIN_TIMEOUT)
+            version = handshake(conn, self.key, initiator=False)
+            header = recv_frame(conn) if version >= 2 else None
+        except Exception as exc:  # pylint: disable=broad-except
+            _log(f"[!] {addr[0]}:{addr[1]} bağlantısı reddedildi: {exc}")
+            conn.close()
+            return
+        if header is None or "join" not in header:
+            _emit(HandshakeEvent("receive", f"{addr[0]}:{addr[1]}", version))
+        self._dispatch(pool, conn, addr, version, header)
+
+    def _dispatch(self, pool: ThreadPoolExecutor, conn: socket.socket, addr, version: int,
+                  header: Optional[dict]) -> None:
+        peer = addr[0]
+        try:
+            if header is not None and "join" in header:
+                if not self._joins.deliver(str(header["join"]), int(header.get("index", 0)), conn):
+                    raise ValueError("geçersiz oturum")
+                conn.settimeout(None)
+                return
+            if self._stop.is_set() or not self._reserve(peer):
+                _log(f"[!] {peer}:{addr[1]} reddedildi: eşzamanlı aktarım sınırı dolu.")
+                if header is not None:
+                    send_frame(conn, {"error": "busy"})
+                conn.close()
+                return
+        except Exception as exc:  # pylint: disable=broad-except
+            _log(f"[!] {peer}:{addr[1]} bağlantısı reddedildi: {exc}")
+            conn.close()
+            return
+        conn.settimeout(None)
+        try:
+            pool.submit(_carry(self._transfer), pool, conn, addr, version, header)
+        except RuntimeError:  # pool already shut down
+            self._release(peer)
+            conn.close()
+
+    def _await_next(self, pool: ThreadPoolExecutor, conn: socket.socket, addr) -> None:
+        """Hold a kept connection until its sender starts another transfer, closes it or idles out."""
+        deadline = time.monotonic() + self.keep_idle
+        try:
+            _enable_keepalive(conn)
+            while True:
+                remaining = deadline - time.monotonic()
+                if self._stop.is_set() or remaining <= 0:
+                    conn.close()
+                    return
+                readable, _, _ = select.select([conn], [], [], min(remaining, 0.5))
+                if readable:
+                    break
+            conn.settimeout(JOIN_TIMEOUT)
+            header = recv_frame(conn)
+        except (OSError, ValueError):  # closed by the sender (pool eviction) or garbage
+            conn.close()
+            return
+        self._dispatch(pool, conn, addr, 2, header)
+
+    def _reserve(self, peer: str) -> bool:
+        with self._lock:
+            if sum(self._active.values()) >= self.max_transfers or self._active.get(peer, 0) >= self.max_per_peer:
+                return False
+            self._active[peer] = self._active.get(peer, 0) + 1
+            return True
 
+    def _release(self, peer: str) -> None:
+        with self._lock:
+            self._active[peer] -= 1
+            if not self._active[peer]:
+                del self._active[peer]
 
-def get_optimal_chunk_size(file_size: int) -> int:
+    def _transfer(self, pool: ThreadPoolExecutor, conn: socket.socket, addr, version: int,
+                  header: Optional[dict]) -> None:
+        peer = f"{addr[0]}:{addr[1]}"
+        record = {"peer": peer, "ok": False}
+        kept = False
+        try:
+            try:
+                _log(f"[+] Bağlandı: {peer}")
+                record.update(_receive_session(conn, version, header, self.output_dir, self.chunk_size,
+                                               self.engine, self.resume, self._joins, self.digest, self.chunk_policy,
+                                               self.sock_buf, self.keep_idle))
+                kept = header is not None and bool(header.get("keep")) and self.keep_idle > 0
+            finally:
+                if not kept:
+                    conn.close()
+            record["ok"] = True
+            speed = record["bytes"] / record["seconds"] / (1024 * 1024) if record["seconds"] > 0 else 0
+            _log(f"[✓] {peer}: {record['name']} — {record['files']} dosya, {record['bytes']} bayt, "
+                  f"{record['seconds']:.2f}s, {speed:.2f} MiB/s")
+        except Exception as exc:  # pylint: disable=broad-except
+            record["error"] = str(exc)
+            _log(f"[!] {peer} aktarımı başarısız: {exc}")
+        finally:
+            self._release(addr[0])
+            with self._lock:
+                self.stats.append(record)
+            if kept:
+                threading.Thread(target=_carry(self._await_next), args=(pool, conn, addr), daemon=True).start()
+
+    def _print_summary(self) -> None:
+        ok = [s for s in self.stats if s["ok"]]
+        total = sum(s["bytes"] for s in ok)
+        files = sum(s["files"] for s in ok)
+        _log(f"[✓] Sunucu kapandı: {len(self.stats)} aktarım ({len(self.stats) - len(ok)} hatalı), "
+              f"{files} dosya, {total} bayt.")
+
+
+def serve(bind: str, port: int, pin: str, output_dir: Path, chunk_size: int = None, engine: str = "auto",
+          resume: bool = False, max_transfers: int = 8, max_per_peer: int = 2, digest: str = "auto",
+          chunk_policy: str = "static", sock_buf: Optional[int] = None,
+          keep_idle: float = KEEP_IDLE_TIMEOUT, announce: Optional[str] = None,
+          observer: Optional[Callable[[TransferEvent], None]] = None,
+          progress_interval: Optional[float] = PROGRESS_INTERVAL) -> None:
+    """Receive from many senders until interrupted (see ReceiverDaemon)."""
+    ReceiverDaemon(bind, port, pin, output_dir, chunk_size, engine, resume, max_transfers, max_per_peer,
+                   digest, chunk_policy, sock_buf, keep_idle, announce, observer, progress_interval).serve_forever()
+
+
+# --- LAN discovery --------------------------------------------------------
+#
+# A receiver started with an announce name sends a small datagram (DISCOVERY_MAGIC
+# + JSON: instance id, name, port, capabilities, TTL and a tag derived from its PIN
+# key) every ANNOUNCE_INTERVAL seconds to the multicast group and the broadcast
+# address, answers queries at once and says goodbye when it stops. A PeerTable
+# listens on the same port (SO_REUSEADDR, so several local instances coexist) and
+# keeps each peer until its TTL runs out, which turns "--host" into a lookup. The
+# tag lets a sender pick only receivers that share its PIN; it proves nothing by
+# itself, the handshake still does.
+
+
+def _discovery_tag(key: bytes, instance: str) -> str:
+    return hmac.new(key, b"P2P-discovery" + instance.encode("ascii"), hashlib.sha256).hexdigest()[:16]
+
+
+def _discovery_socket(interface: str, group: str, port: Optional[int]) -> socket.socket:
+    """UDP socket that can send to the group/broadcast and, with a port, receive on it alongside other instances."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+        if port is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if hasattr(socket, "SO_REUSEPORT"):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            sock.bind(("", port))
+            membership = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton(interface))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def _send_discovery(sock: socket.socket, message: dict, group: str, port: int) -> None:
+    data = DISCOVERY_MAGIC + json.dumps(message, separators=(",", ":")).encode("utf-8")
+    for target in (group, "255.255.255.255"):
+        try:
+            sock.sendto(data, (target, port))
+        except OSError:  # no route for broadcast/multicast on this interface; the other may still work
+            pass
+
+
+def _recv_discovery(sock: socket.socket) -> Tuple[Optional[dict], Optional[tuple]]:
+    data, addr = sock.recvfrom(DISCOVERY_MAX_DATAGRAM)
+    if not data.startswith(DISCOVERY_MAGIC):
+        return None, addr
+    try:
+        message = json.loads(data[len(DISCOVERY_MAGIC):].decode("utf-8"))
+    except ValueError:
+        return None, addr
+    return (message, addr) if isinstance(message, dict) else (None, addr)
+
+
+class Announcer:
     """
-    Dynamically determine optimal TCP buffer size based on file size.
-    
-    - < 10 MB: 64 KB (low RAM footprint)
-    - 10 MB - 100 MB: 1 MB
-    - 100 MB - 1 GB: 4 MB
-    - > 1 GB: 8 MB (maximizes Gigabit LAN throughput)
+    Announce a listening receiver on the LAN until stopped (see the section
+    comment). Usable as a context manager around the listening period.
     """
-    if file_size < 10 * 1024 * 1024:  # < 10 MB
-        return 64 * 1024
-    elif file_size < 100 * 1024 * 1024:  # < 100 MB
-        return 1024 * 1024
-    elif file_size < 1024 * 1024 * 1024:  # < 1 GB
-        return 4 * 1024 * 1024
-    else:  # >= 1 GB
-        return 8 * 1024 * 1024
 
+    def __init__(self, name: str, port: int, key: Optional[bytes] = None, caps: Optional[dict] = None,
+                 interval: float = ANNOUNCE_INTERVAL, interface: str = "0.0.0.0", group: str = DISCOVERY_GROUP,
+                 discovery_port: int = DISCOVERY_PORT, host: Optional[str] = None):
+        self.instance = secrets.token_hex(8)
+        self.message = {"t": "announce", "id": self.instance, "name": name, "port": port, "caps": caps or {},
+                        "ttl": 3 * interval + 1}
+        # A receiver bound to one address names it; otherwise peers use the datagram's source address.
+        if host and not ipaddress.ip_address(host).is_unspecified:
+            self.message["host"] = host
+        if key is not None:
+            self.message["tag"] = _discovery_tag(key, self.instance)
+        self.interval = interval
+        self.interface = interface
+        self.group = group
+        self.discovery_port = discovery_port
+        self.sent = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sock: Optional[socket.socket] = None
 
-def derive_key(pin: str) -> bytes:
-    """Derive a stable key from the PIN to use for HMAC authentication."""
-    return hashlib.pbkdf2_hmac("sha256", pin.encode("utf-8"), HANDSHAKE_SALT, 100_000, dklen=32)
+    def start(self) -> "Announcer":
+        self._sock = _discovery_socket(self.interface, self.group, self.discovery_port)
+        self._thread = threading.Thread(target=self._run, name="p2p-announce", daemon=True)
+        self._thread.start()
+        return self
 
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        _send_discovery(self._sock, {"t": "bye", "id": self.instance}, self.group, self.discovery_port)
+        self._sock.close()
+        self._thread = None
 
-def recv_exact(conn: socket.socket, num_bytes: int) -> bytes:
-    """Receive exactly num_bytes or raise on unexpected EOF."""
-    buf = bytearray()
-    while len(buf) < num_bytes:
-        chunk = conn.recv(num_bytes - len(buf))
-        if not chunk:
+    def __enter__(self) -> "Announcer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _announce(self) -> None:
+        _send_discovery(self._sock, self.message, self.group, self.discovery_port)
+        self.sent += 1
+
+    def _run(self) -> None:
+        next_at = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_at:
+                self._announce()
+                next_at = now + self.interval
+            readable, _, _ = select.select([self._sock], [], [], min(0.25, max(0.0, next_at - now)))
+            if not readable:
+                continue
+            try:
+                message, _ = _recv_discovery(self._sock)
+            except OSError:
+                continue
+            # Answer a query right away, but never more than a few times a second.
+            if message is not None and message.get("t") == "query":
+                next_at = min(next_at, time.monotonic() + 0.05)
+
+
+class Peer:
+    """A receiver heard by a PeerTable."""
+
+    def __init__(self, message: dict, host: str):
+        self.instance = str(message["id"])
+        self.name = str(message["name"])
+        self.host = str(ipaddress.ip_address(message["host"])) if message.get("host") else host
+        self.port = int(message["port"])
+        self.caps = message.get("caps") if isinstance(message.get("caps"), dict) else {}
+        self.tag = message.get("tag")
+        self.seen = time.monotonic()
+        self.expires = self.seen + min(float(message.get("ttl", PEER_TTL)), 10 * PEER_TTL)
+
+    def matches(self, key: bytes) -> bool:
+        """Whether the receiver announced the same PIN key (only a hint; the handshake decides)."""
+        return self.tag is not None and hmac.compare_digest(str(self.tag), _discovery_tag(key, self.instance))
+
+    def __repr__(self) -> str:
+        return f"Peer({self.name!r}, {self.host}:{self.port})"
+
+
+class PeerTable:
+    """
+    Cached table of announced receivers; each entry lives until the TTL of
+    its last announcement runs out or the receiver says goodbye. start()
+    sends a query so running receivers answer at once instead of at their
+    next interval.
+    """
+
+    def __init__(self, interface: str = "0.0.0.0", group: str = DISCOVERY_GROUP,
+                 discovery_port: int = DISCOVERY_PORT):
+        self.interface = interface
+        self.group = group
+        self.discovery_port = discovery_port
+        self._peers: dict[str, Peer] = {}
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sock: Optional[socket.socket] = None
+
+    def start(self) -> "PeerTable":
+        self._sock = _discovery_socket(self.interface, self.group, self.discovery_port)
+        self._thread = threading.Thread(target=self._run, name="p2p-discovery", daemon=True)
+        self._thread.start()
+        self.query()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._sock.close()
+        self._thread = None
+
+    def __enter__(self) -> "PeerTable":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def query(self) -> None:
+        _send_discovery(self._sock, {"t": "query"}, self.group, self.discovery_port)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._sock], [], [], 0.25)
+            if not readable:
+                continue
+            try:
+                message, addr = _recv_discovery(self._sock)
+            except OSError:
+                continue
+            if message is None:
+                continue
+            try:
+                if message.get("t") == "announce":
+                    peer = Peer(message, addr[0])
+                elif message.get("t") == "bye":
+                    peer = None
+                else:
+                    continue
+            except (KeyError, TypeError, ValueError):
+                continue
+            with self._cond:
+                if peer is None:
+                    self._peers.pop(str(message.get("id")), None)
+                else:
+                    self._peers[peer.instance] = peer
+                self._cond.notify_all()
+
+    def _live(self, key: Optional[bytes]) -> list[Peer]:
+        now = time.monotonic()
+        for instance in [i for i, peer in self._peers.items() if peer.expires <= now]:
+            del self._peers[instance]
+        return sorted((peer for peer in self._peers.values() if key is None or peer.matches(key)),
+                      key=lambda peer: (peer.name, peer.host, peer.port))
+
+    def peers(self, key: Optional[bytes] = None) -> list[Peer]:
+        """Live peers, optionally only those announcing the same PIN key."""
+        with self._cond:
+            return self._live(key)
+
+    def find(self, name: str, key: Optional[bytes] = None, wait: float = 0.0) -> Optional[Peer]:
+        """The most recently heard live peer called `name`, waiting up to `wait` seconds for one to appear."""
+        deadline = time.monotonic() + wait
+        with self._cond:
+            while True:
+                found = [peer for peer in self._live(key) if peer.name == name]
+                if found:
+                    return max(found, key=lambda peer: peer.seen)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+
+_PEER_TABLE: Optional[PeerTable] = None
+_PEER_TABLE_LOCK = threading.Lock()
+
+
+def peer_table() -> PeerTable:
+    """The process-wide PeerTable, started on first use."""
+    global _PEER_TABLE
+    with _PEER_TABLE_LOCK:
+        if _PEER_TABLE is None:
+            _PEER_TABLE = PeerTable().start()
+        return _PEER_TABLE
+
+
+def find_peer(name: str, key: Optional[bytes] = None, wait: float = DISCOVERY_WAIT) -> Optional[Peer]:
+    """Look `name` up in the shared peer table, waiting briefly on a cold start."""
+    return peer_table().find(name, key, wait)
+
+
+def peer_address(host: str, port: int, key: Optional[bytes] = None) -> Tuple[str, int]:
+    """Address and port of the LAN peer announced as `host`; the arguments unchanged for IPs and unknown names."""
+    try:
+        ipaddress.ip_address(host)
+        return host, port
+    except ValueError:
+        pass
+    peer = _PEER_TABLE.find(host, key) if _PEER_TABLE is not None else None
+    return (peer.host, peer.port) if peer is not None else (host, port)
+
+
+def _receiver_caps(kind: str, resume: bool, keep: float = 0) -> dict:
+    return {"kind": kind, "proto": 2, "tickets": True, "resume": resume, "keep": keep > 0,
+            "digests": list(DIGESTS), "codecs": available_codecs()}
+
+
+def _announcer(announce: Optional[str], bind: str, port: int, key: bytes, caps: dict) -> Optional[Announcer]:
+    if not announce:
+        return None
+    try:
+        announcer = Announcer(announce, port, key, caps, host=str(resolve_ip(bind))).start()
+    except (OSError, ValueError) as exc:
+        _log(f"[!] Ağ duyurusu başlatılamadı: {exc}")
+        return None
+    _log(f"[+] Yerel ağda duyuruluyor: {announce!r} (UDP {DISCOVERY_GROUP}:{DISCOVERY_PORT})")
+    return announcer
+
+
+# --- asyncio engine -------------------------------------------------------
+#
+# Single-stream file transfers run natively on the event loop through the
+# loop.sock_* primitives: sock_sendall/sock_sendfile only complete once the
+# kernel has taken the data, which gives natural backpressure, and receives
+# land in pooled buffers. Disk I/O, hashing and PIN key derivation run in the
+# loop's default executor, double-buffered against the socket. The control
+# protocol is shared with the threaded code: the same step generators run
+# under _aio_drive (see "protocol steps"). Transfers that need several
+# blocking connections or the splice/pipeline engines (parallel streams,
+# resume journals, directories, batch/mux sessions) are handed to the
+# threaded implementation on a daemon thread (_aio_in_thread).
+
+
+async def _aio_recv_exact_into(loop: asyncio.AbstractEventLoop, conn: socket.socket, buf) -> None:
+    view = memoryview(buf).cast("B")
+    got = 0
+    while got < len(view):
+        n = await loop.sock_recv_into(conn, view[got:])
+        if not n:
             raise ConnectionError("Bağlantı beklenmedik şekilde kapandı.")
-        buf.extend(chunk)
+        got += n
+
+
+async def _aio_recv_exact(loop: asyncio.AbstractEventLoop, conn: socket.socket, num_bytes: int) -> bytes:
+    buf = bytearray(num_bytes)
+    await _aio_recv_exact_into(loop, conn, buf)
     return bytes(buf)
 
 
-def handshake(conn: socket.socket, key: bytes, initiator: bool) -> None:
+async def _aio_drive(loop: asyncio.AbstractEventLoop, conn: socket.socket, steps):
+    """asyncio counterpart of _drive: protocol steps on a non-blocking socket, blocking work in the executor."""
+    value = None
+    while True:
+        try:
+            op = steps.send(value)
+        except StopIteration as done:
+            return done.value
+        if op[0] == "recv":
+            value = await _aio_recv_exact(loop, conn, op[1])
+        elif op[0] == "send":
+            await loop.sock_sendall(conn, op[1])
+            value = None
+        else:
+            value = await loop.run_in_executor(None, op[1], *op[2:])
+
+
+async def async_handshake(loop: asyncio.AbstractEventLoop, conn: socket.socket, key: bytes, initiator: bool) -> int:
+    """asyncio counterpart of handshake() on a non-blocking socket; returns the negotiated version."""
+    return await _aio_drive(loop, conn, _handshake_steps(conn, key, initiator))
+
+
+async def _aio_recv_frame(loop: asyncio.AbstractEventLoop, conn: socket.socket) -> dict:
+    return await _aio_drive(loop, conn, _frame_steps())
+
+
+async def _aio_connect(loop: asyncio.AbstractEventLoop, host: str, port: int) -> socket.socket:
+    """asyncio counterpart of _connect: staggered connects raced on the loop; returns a non-blocking socket."""
+    candidates = await loop.run_in_executor(None, RESOLVER.candidates, host, port)
+    attempts: dict[asyncio.Task, tuple[socket.socket, tuple]] = {}
+    errors: list[OSError] = []
+    deadline = loop.time() + CONNECT_TIMEOUT
+
+    def start(family: int, sockaddr: tuple) -> None:
+        try:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+        except OSError as exc:
+            errors.append(OSError(exc.errno, f"{exc.strerror} ({sockaddr[0]})"))
+            return
+        sock.setblocking(False)
+        attempts[loop.create_task(loop.sock_connect(sock, sockaddr))] = (sock, sockaddr)
+
+    winner = None
+    try:
+        while winner is None and (candidates or attempts) and loop.time() < deadline:
+            if candidates and not attempts:
+                start(*candidates.pop(0))
+                if not attempts:
+                    continue
+            wait = deadline - loop.time()
+            if candidates:
+                wait = min(wait, CONNECT_ATTEMPT_DELAY)
+            done, _ = await asyncio.wait(list(attempts), timeout=max(0.0, wait), return_when=asyncio.FIRST_COMPLETED)
+            if not done and candidates:
+                start(*candidates.pop(0))
+            for task in done:
+                sock, sockaddr = attempts.pop(task)
+                if task.exception() is None and winner is None:
+                    winner = sock, sockaddr
+                    continue
+                sock.close()
+                if task.exception() is not None:
+                    exc = task.exception()
+                    errors.append(exc if isinstance(exc, OSError) else OSError(str(exc)))
+    finally:
+        for task, (sock, _) in attempts.items():
+            task.cancel()
+            sock.close()
+    if winner is None:
+        RESOLVER.forget(host)
+        raise _connect_error(host, port, errors)
+    conn, sockaddr = winner
+    RESOLVER.prefer(host, sockaddr)
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return conn
+
+
+def _read_hashed(f, sha, view, timings: StageTimings) -> int:
+    start = time.perf_counter()
+    n = f.readinto(view)
+    sha.update(view[:n])
+    timings.add("disk+özet", time.perf_counter() - start)
+    return n
+
+
+def _write_hashed(f, sha, view, timings: StageTimings) -> None:
+    start = time.perf_counter()
+    f.write(view)
+    sha.update(view)
+    timings.add("disk+özet", time.perf_counter() - start)
+
+
+async def _aio_settle(pending: Optional[asyncio.Future]) -> None:
+    """Let an executor job that still uses a buffer finish before the buffer goes back to the pool."""
+    if pending is not None and not pending.done():
+        await asyncio.wait([pending])
+
+
+async def _aio_send_payload(loop: asyncio.AbstractEventLoop, conn: socket.socket, file_path: Path, size: int,
+                            chunk_size: int, engine: str, offset: int = 0, hasher=None,
+                            controller: Optional[ChunkController] = None) -> bytes:
     """
-    HMAC tabanlı karşılıklı doğrulama.
-    Server (alıcı) nonce gönderir; client (gönderici) HMAC ile yanıtlar.
+    Send [offset, size) of a file; returns the digest of the whole file.
+    Double-buffered: the next chunk is read and hashed in the executor while
+    the current one is being sent.
     """
-    if initiator:
-        peer_nonce = recv_exact(conn, NONCE_SIZE)
-        token = hmac.new(key, MAGIC + peer_nonce, hashlib.sha256).digest()
-        conn.sendall(token)
-        status = recv_exact(conn, 2)
-        if status != b"OK":
-            raise PermissionError("PIN doğrulaması başarısız.")
-    else:
-        nonce = secrets.token_bytes(NONCE_SIZE)
-        conn.sendall(nonce)
-        token = recv_exact(conn, HASH_SIZE)
-        expected = hmac.new(key, MAGIC + nonce, hashlib.sha256).digest()
-        if not hmac.compare_digest(token, expected):
-            conn.sendall(b"NO")
-            raise PermissionError("PIN doğrulaması başarısız.")
-        conn.sendall(b"OK")
+    step = 50 * chunk_size
+    meter = _reporter().meter("send", size - offset)
+    with file_path.open("rb") as f:
+        if engine == "sendfile" and size - offset >= SENDFILE_MIN_SIZE:
+            digest = loop.run_in_executor(None, hash_file, file_path, chunk_size, hasher)
+            sent = offset
+            while sent < size:
+                start = time.perf_counter()
+                n = await loop.sock_sendfile(conn, f, sent, min(controller.size if controller else step, size - sent))
+                if n == 0:
+                    raise ConnectionError("Dosya gönderim sırasında beklenmedik şekilde bitti.")
+                if controller:
+                    controller.record(n, time.perf_counter() - start)
+                meter.add(n)
+                sent += n
+            return await digest
+        sha = await loop.run_in_executor(None, file_hasher, file_path, chunk_size, offset, hasher) if offset \
+            else hasher or hashlib.sha256()
+        f.seek(offset)
+        timings = StageTimings("disk+özet", "ağ")
+        read = sent = offset
+        pending = None
+        bufs = [None, None]
+        try:
+            pending = loop.run_in_executor(None, _read_hashed, f, sha,
+                                           _pooled_view(bufs, 0, min(controller.size if controller else chunk_size,
+                                                                     size - read)), timings)
+            turn = 0
+            while sent < size:
+                n = await pending
+                if not n:
+                    raise ConnectionError("Dosya gönderim sırasında beklenmedik şekilde bitti.")
+                read += n
+                current, turn = memoryview(bufs[turn])[:n], turn ^ 1
+                if read < size:
+                    view = _pooled_view(bufs, turn, min(controller.size if controller else chunk_size, size - read))
+                    pending = loop.run_in_executor(None, _read_hashed, f, sha, view, timings)
+                start = time.perf_counter()
+                await loop.sock_sendall(conn, current)
+                timings.add("ağ", time.perf_counter() - start)
+                if controller:
+                    controller.record(n, time.perf_counter() - start)
+                meter.add(n)
+                sent += n
+        finally:
+            await _aio_settle(pending)
+            _release_views(bufs)
+    if size >= step:
+        _log(timings.report())
+    return sha.digest()
 
 
-def resolve_ip(addr: str) -> ipaddress.IPv4Address | ipaddress.IPv6Address:
+async def _aio_recv_payload(loop: asyncio.AbstractEventLoop, conn: socket.socket, f, size: int,
+                            chunk_size: int, hasher=None, controller: Optional[ChunkController] = None) -> bytes:
     """
-    Resolve host/address to an IP object. Raises if resolution fails.
-    Prefers literal parsing; falls back to DNS/hosts.
+    Receive into two pooled buffers in turn: while one chunk is written and
+    hashed in the executor the next is read from the socket. Returns the digest.
     """
+    sha = hasher or hashlib.sha256()
+    timings = StageTimings("ağ", "disk+özet")
+    meter = _reporter().meter("receive", size)
+    remaining = size
+    pending = None
+    bufs = [None, None]
+    turn = 0
     try:
-        return ipaddress.ip_address(addr)
-    except ValueError:
-        # Try resolve hostname
-        resolved = socket.gethostbyname(addr)
-        return ipaddress.ip_address(resolved)
+        while remaining > 0:
+            data = _pooled_view(bufs, turn, min(controller.size if controller else chunk_size, remaining))
+            turn ^= 1
+            start = time.perf_counter()
+            await _aio_recv_exact_into(loop, conn, data)
+            timings.add("ağ", time.perf_counter() - start)
+            if controller:
+                controller.record(len(data), time.perf_counter() - start)
+            if pending is not None:
+                await pending
+            pending = loop.run_in_executor(None, _write_hashed, f, sha, data, timings)
+            meter.add(len(data))
+            remaining -= len(data)
+        if pending is not None:
+            await pending
+    finally:
+        await _aio_settle(pending)
+        _release_views(bufs)
+    if size >= 50 * chunk_size:
+        _log(timings.report())
+    return sha.digest()
 
 
-def ensure_local(addr: str) -> None:
+async def _aio_send_over(loop: asyncio.AbstractEventLoop, conn: socket.socket, version: int, host: str, port: int,
+                         file_path: Path, chunk_size: int, engine: str, digest: str = "auto",
+                         chunk_policy: str = "static", sock_buf: Optional[int] = None) -> None:
+    """asyncio counterpart of _send_over for a single stream (resume offsets included)."""
+    stat = file_path.stat()
+    size = stat.st_size
+    start = time.time()
+    plan = await _aio_drive(loop, conn, _offer_steps(conn, version, host, port, file_path, stat, chunk_size, engine, 1,
+                                                     digest, sock_buf=sock_buf))
+    controller = chunk_controller(chunk_policy, plan.chunk_size)
+    await _aio_send_payload(loop, conn, file_path, size, plan.chunk_size, engine, plan.offset, plan.hasher, controller)
+    _print_chunk_report(controller)
+    await _aio_drive(loop, conn, _close_send_steps(file_path, size, plan, start))
+
+
+async def _aio_receive_session(loop: asyncio.AbstractEventLoop, conn: socket.socket, header: Optional[dict],
+                               output_dir: Path, chunk_size: int, digest: str = "auto",
+                               chunk_policy: str = "static", sock_buf: Optional[int] = None) -> dict:
+    """asyncio counterpart of _receive_session for a plain single-stream file (v2 or legacy header)."""
+    started = time.time()
+    hasher, link = hashlib.sha256(), None
+    if header is not None:
+        digest, dest, link = await _aio_drive(loop, conn, _accept_steps(conn, header, output_dir, digest, sock_buf))
+        size = int(header["size"])
+        reply = {"streams": 1, "offset": 0, "digest": digest, **SESSION_TICKETS.answer(conn, header)}
+        if link:
+            reply.update(rtt=link["rtt"], rate=link["rate"])
+        hasher = _reply_hasher(header, reply, digest)
+        await loop.sock_sendall(conn, _encode_frame(reply))
+    else:
+        _, size, dest = await _aio_drive(loop, conn, _legacy_header_steps(conn, output_dir, sock_buf))
+    chunk_size = _receive_chunk(chunk_size, size, link)
+    target = unique_target(dest)
+    _emit(StartEvent("receive", target.name, size, f"[+] Alınıyor -> {target} (beklenen {size} bayt, motor: asyncio)"))
+
+    start = time.time()
+    with target.open("wb") as f:
+        controller = chunk_controller(chunk_policy, chunk_size)
+        try:
+            await _aio_recv_payload(loop, conn, f, size, chunk_size, hasher, controller)
+        except BaseException:
+            f.close()
+            target.unlink(missing_ok=True)
+            _log(f"[!] Aktarım yarıda kaldı; yarım dosya silindi: {target.name}")
+            raise
+    _print_chunk_report(controller)
+    if not await _aio_drive(loop, conn, _close_recv_steps(target, size, hasher)):
+        target.unlink()
+        raise ValueError("Hash eşleşmedi; dosya silindi.")
+    duration = time.time() - start
+    speed = size / duration / (1024 * 1024) if duration > 0 else 0
+    _emit(FinishedEvent("receive", target.name, size, duration,
+                        message=f"[✓] Aktarım başarıyla doğrulandı ({duration:.2f}s, {speed:.2f} MiB/s)."))
+    _print_memory_report()
+    return {"name": target.name, "files": 1, "bytes": size, "seconds": time.time() - started}
+
+
+async def _aio_in_thread(fn, *args):
     """
-    Ensure the given host/bind is private or loopback.
-    Raises ValueError if not.
+    Like asyncio.to_thread, but on a daemon thread: asyncio.run joins the
+    default executor on exit, which would hold Ctrl+C until a blocking
+    transfer finished by itself.
     """
-    ip_obj = resolve_ip(addr)
-    if not (ip_obj.is_private or ip_obj.is_loopback):
-        raise ValueError(f"{addr} yerel degil; yerel IP veya localhost kullanin.")
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    fn = _carry(fn)
 
+    def settle(method, value) -> None:
+        if not future.done():
+            method(value)
 
-def send_file(host: str, port: int, pin: str, file_path: Path, chunk_size: int = None) -> None:
-    key = derive_key(pin)
-    file_path = Path(file_path)
-    
-    # Auto-determine chunk size if not provided
-    if chunk_size is None:
-        chunk_size = 1024 * 1024  # Default 1 MB
-    
-    # Handle directory: automatically zip it
-    temp_zip = None
-    if file_path.is_dir():
-        print(f"[+] Dizin algılandı: {file_path}")
-        print(f"[+] Arşivleniyor...")
-        with tempfile.TemporaryDirectory() as tmpdir:
-            temp_zip = Path(tmpdir) / f"{file_path.name}.zip"
-            shutil.make_archive(str(temp_zip.with_suffix('')), 'zip', file_path)
-            file_path = temp_zip
-            print(f"[+] Arşiv oluşturuldu: {file_path}")
-            _send_file_internal(host, port, pin, key, file_path, chunk_size)
-    else:
-        if not file_path.is_file():
-            raise FileNotFoundError(f"Gönderilecek dosya bulunamadı: {file_path}")
-        _send_file_internal(host, port, pin, key, file_path, chunk_size)
+    def run() -> None:
+        try:
+            result = fn(*args)
+        except BaseException as exc:  # pylint: disable=broad-except
+            outcome = (future.set_exception, exc)
+        else:
+            outcome = (future.set_result, result)
+        try:
+            loop.call_soon_threadsafe(settle, *outcome)
+        except RuntimeError:  # loop already closed after cancellation
+            pass
 
+    threading.Thread(target=run, daemon=True).start()
+    return await future
 
-def _send_file_internal(host: str, port: int, pin: str, key: bytes, file_path: Path, chunk_size: int) -> None:
-    """Internal function to send a file with automatic chunk size optimization."""
-    size = file_path.stat().st_size
-    
-    # Auto-optimize chunk size if it looks like default
-    if chunk_size == 1024 * 1024:
-        optimal_size = get_optimal_chunk_size(size)
-        if optimal_size != chunk_size:
-            print(f"[+] Blok boyutu optimize edildi: {chunk_size} -> {optimal_size} (dosya boyutu: {size} bayt)")
-            chunk_size = optimal_size
-    
-    name_bytes = file_path.name.encode("utf-8")
-    if len(name_bytes) > 65535:
-        raise ValueError("Dosya adı çok uzun.")
 
-    print(f"[+] {file_path} ({size} bayt) gönderiliyor -> {host}:{port}")
-    start = time.time()
+def _runs_natively(header: Optional[dict], engine: str, resume: bool) -> bool:
+    """Whether a received transfer can stay on the event loop (see the section comment)."""
+    if engine in ("splice", "pipeline") or resume:
+        return False
+    if header is None:
+        return True
+    return not {"kind", "join", "delta", "codecs"} & header.keys() and \
+        accepted_streams(int(header.get("streams", 1)), int(header["size"])) == 1
 
-    with socket.create_connection((host, port), timeout=10) as conn:
-        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-        handshake(conn, key, initiator=True)
 
-        conn.sendall(struct.pack(">H", len(name_bytes)) + name_bytes + struct.pack(">Q", size))
+async def async_send_file(host: str, port: int, pin: str, file_path: Path, chunk_size: int = None,
+                          engine: str = "auto", streams: int = 1, dir_mode: str = "stream",
+                          digest: str = "auto", delta: bool = False, compress: str = "off",
+                          chunk_policy: str = "static", sock_buf: Optional[int] = None,
+                          pool: Optional[ConnectionPool] = None,
+                          observer: Optional[Callable[[TransferEvent], None]] = None,
+                          progress_interval: Optional[float] = PROGRESS_INTERVAL) -> None:
+    """
+    Send a file or directory without blocking the event loop; same options
+    and wire protocol as send_file. Many calls can run concurrently on one loop.
+    With a ConnectionPool, the connection is leased from it (threaded path).
+    Events go to observer (see TransferReporter), each call's to its own.
+    """
+    with _observing(observer, progress_interval):
+        await _aio_send_file(host, port, pin, file_path, chunk_size, engine, streams, dir_mode, digest, delta,
+                             compress, chunk_policy, sock_buf, pool)
 
-        sha = hashlib.sha256()
-        sent = 0
-        with file_path.open("rb") as f:
-            while True:
-                chunk = f.read(chunk_size)
-                if not chunk:
-                    break
-                sha.update(chunk)
-                conn.sendall(chunk)
-                sent += len(chunk)
-                if sent and sent % (50 * chunk_size) == 0:
-                    print(f"    gönderildi: {sent}/{size} bayt")
-
-        conn.sendall(sha.digest())
-        status = recv_exact(conn, 2)
-        duration = time.time() - start
-        speed = size / duration / (1024 * 1024) if duration > 0 else 0
-        if status != b"OK":
-            raise ConnectionError("Alıcı doğrulama hatası bildirdi.")
-        print(f"[✓] Aktarım tamamlandı ({duration:.2f}s, {speed:.2f} MiB/s).")
 
+async def _aio_send_file(host: str, port: int, pin: str, file_path: Path, chunk_size: Optional[int], engine: str,
+                         streams: int, dir_mode: str, digest: str, delta: bool, compress: str, chunk_policy: str,
+                         sock_buf: Optional[int], pool: Optional[ConnectionPool]) -> None:
+    loop = asyncio.get_running_loop()
+    key = await loop.run_in_executor(None, derive_key, pin)
+    file_path = Path(file_path)
+    if chunk_size is None:
+        chunk_size = 1024 * 1024
+    if file_path.is_dir():
+        _log(f"[+] Dizin algılandı: {file_path}")
+        await _aio_in_thread(_send_dir_internal, host, port, key, file_path, chunk_size, engine, streams, dir_mode,
+                             digest, compress, chunk_policy, sock_buf, pool)
+        return
+    if not file_path.is_file():
+        raise FileNotFoundError(f"Gönderilecek dosya bulunamadı: {file_path}")
+    engine = resolve_send_engine(engine)
+    if streams > 1 or engine == "pipeline" or delta or compress_offer(compress) or pool is not None:
+        await _aio_in_thread(_send_file_internal, host, port, pin, key, file_path, chunk_size, engine, streams,
+                             digest, delta, compress, chunk_policy, sock_buf, pool)
+        return
+    conn = await _aio_connect(loop, host, port)
+    with conn:
+        version = await async_handshake(loop, conn, key, initiator=True)
+        _emit(HandshakeEvent("send", f"{host}:{port}", version))
+        await _aio_send_over(loop, conn, version, host, port, file_path, chunk_size, engine, digest, chunk_policy,
+                             sock_buf)
 
-def unique_target(path: Path) -> Path:
-    """Avoid overwriting: append numeric suffix if needed."""
-    if not path.exists():
-        return path
-    stem, suffix = path.stem, path.suffix
-    parent = path.parent
-    for i in range(1, 10_000):
-        candidate = parent / f"{stem}_{i}{suffix}"
-        if not candidate.exists():
-            return candidate
-    raise FileExistsError("Uygun hedef adı bulunamadı (çok fazla çakışma).")
 
+async def async_receive_file(bind: str, port: int, pin: str, output_dir: Path, chunk_size: int = None,
+                             engine: str = "auto", resume: bool = False, digest: str = "auto",
+                             chunk_policy: str = "static", sock_buf: Optional[int] = None,
+                             announce: Optional[str] = None,
+                             observer: Optional[Callable[[TransferEvent], None]] = None,
+                             progress_interval: Optional[float] = PROGRESS_INTERVAL) -> None:
+    """
+    Accept and receive one transfer without blocking the event loop; same
+    options as receive_file. With announce, the receiver is announced on the
+    LAN under that name until a sender connects (see Announcer). Events go to
+    observer (see TransferReporter).
+    """
+    with _observing(observer, progress_interval):
+        await _aio_receive_file(bind, port, pin, output_dir, chunk_size, engine, resume, digest, chunk_policy,
+                                sock_buf, announce)
 
-def receive_file(bind: str, port: int, pin: str, output_dir: Path, chunk_size: int = None) -> None:
-    key = derive_key(pin)
+
+async def _aio_receive_file(bind: str, port: int, pin: str, output_dir: Path, chunk_size: Optional[int], engine: str,
+                            resume: bool, digest: str, chunk_policy: str, sock_buf: Optional[int],
+                            announce: Optional[str]) -> None:
+    loop = asyncio.get_running_loop()
+    key = await loop.run_in_executor(None, derive_key, pin)
     output_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Auto-determine chunk size if not provided
     if chunk_size is None:
-        chunk_size = 1024 * 1024  # Default 1 MB
+        chunk_size = 1024 * 1024
+    engine = resolve_recv_engine(engine)
 
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as srv:
-        srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        srv.bind((bind, port))
-        srv.listen(1)
-        print(f"[+] Dinleniyor: {bind}:{port}")
-        conn, addr = srv.accept()
+    with _listen(bind, port, MAX_STREAMS) as srv:
+        srv.setblocking(False)
+        _emit(ListeningEvent(bind, port, f"[+] Dinleniyor: {bind}:{port}"))
+        announcer = _announcer(announce, bind, port, key, _receiver_caps("receive", resume))
+        try:
+            conn, addr = await loop.sock_accept(srv)
+            addr = _peer_addr(addr)
+        finally:
+            if announcer is not None:
+                await loop.run_in_executor(None, announcer.stop)
         with conn:
             conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-            print(f"[+] Bağlandı: {addr[0]}:{addr[1]}")
-            handshake(conn, key, initiator=False)
-
-            name_len = struct.unpack(">H", recv_exact(conn, 2))[0]
-            name = recv_exact(conn, name_len).decode("utf-8", errors="replace")
-            size = struct.unpack(">Q", recv_exact(conn, 8))[0]
-            
-            # Auto-optimize chunk size based on incoming file size
-            if chunk_size == 1024 * 1024:
-                optimal_size = get_optimal_chunk_size(size)
-                if optimal_size != chunk_size:
-                    print(f"[+] Blok boyutu optimize edildi: {chunk_size} -> {optimal_size} (dosya boyutu: {size} bayt)")
-                    chunk_size = optimal_size
-
-            target = unique_target(output_dir / name)
-            print(f"[+] Alınıyor -> {target} (beklenen {size} bayt)")
-
-            sha = hashlib.sha256()
-            remaining = size
-            start = time.time()
-            with target.open("wb") as f:
-                while remaining > 0:
-                    chunk = conn.recv(min(chunk_size, remaining))
-                    if not chunk:
-                        raise ConnectionError("Beklenmedik bağlantı kesildi.")
-                    f.write(chunk)
-                    sha.update(chunk)
-                    remaining -= len(chunk)
-            expected_hash = recv_exact(conn, HASH_SIZE)
-            actual_hash = sha.digest()
-            ok = hmac.compare_digest(actual_hash, expected_hash)
-            if ok:
-                conn.sendall(b"OK")
-                duration = time.time() - start
-                speed = size / duration / (1024 * 1024) if duration > 0 else 0
-                print(f"[✓] Aktarım başarıyla doğrulandı ({duration:.2f}s, {speed:.2f} MiB/s).")
+            _log(f"[+] Bağlandı: {addr[0]}:{addr[1]}")
+            version = await async_handshake(loop, conn, key, initiator=False)
+            _emit(HandshakeEvent("receive", f"{addr[0]}:{addr[1]}", version))
+            header = await _aio_recv_frame(loop, conn) if version >= 2 else None
+            if _runs_natively(header, engine, resume):
+                await _aio_receive_session(loop, conn, header, output_dir, chunk_size, digest, chunk_policy, sock_buf)
+                return
+            conn.setblocking(True)
+            srv.setblocking(True)
+            await _aio_in_thread(_receive_session, conn, version, header, output_dir, chunk_size, engine, resume,
+                                 _ListenerJoins(srv, key), digest, chunk_policy, sock_buf)
+
+
+class _BenchObserver:
+    """Observer for one bench run's receiver: swallows its messages and timestamps the events bench keys on."""
+
+    def __init__(self):
+        self.listening = threading.Event()
+        self.first_byte: Optional[float] = None
+
+    def __call__(self, event: TransferEvent) -> None:
+        if isinstance(event, ListeningEvent):
+            self.listening.set()
+        elif isinstance(event, StartEvent) and self.first_byte is None:
+            self.first_byte = time.perf_counter()
+
+
+def _quiet(event: TransferEvent) -> None:
+    return
+
+
+def make_bench_file(path: Path, size: int, compressibility: float = 0.0, seed: int = 0) -> Path:
+    """
+    Write a reproducible synthetic file of `size` bytes. Every BENCH_UNIT
+    piece is random bytes followed by zeros making up `compressibility`
+    (0: incompressible, 1: all zeros) of it.
+    """
+    if not 0.0 <= compressibility <= 1.0:
+        raise ValueError("Sıkıştırılabilirlik 0 ile 1 arasında olmalı.")
+    rng = random.Random(seed)
+    noise = BENCH_UNIT - round(BENCH_UNIT * compressibility)
+    padding = bytes(BENCH_UNIT - noise)
+    units = (1024 * 1024) // BENCH_UNIT
+    with open(path, "wb") as f:
+        left = size
+        while left > 0:
+            block = b"".join(rng.randbytes(noise) + padding for _ in range(units))
+            f.write(block[:left])
+            left -= len(block)
+    return path
+
+
+def available_send_engines() -> list[str]:
+    return [engine for engine in SEND_ENGINES[1:] if engine != "sendfile" or hasattr(os, "sendfile")]
+
+
+def machine_info() -> dict:
+    """What a benchmark result depends on besides the code: host, CPU, OS and interpreter."""
+    return {
+        "host": socket.gethostname(),
+        "system": platform.system(),
+        "release": platform.release(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _bench_run(src: Path, out_dir: Path, size: int, chunk_size: int, engine: str, recv_engine: str, digest: str,
+               compress: str, chunk_policy: str, sock_buf: Optional[int]) -> dict:
+    """One loopback transfer of src with receive_file on a thread; returns its measurements."""
+    port = _free_port()
+    capture = _BenchObserver()
+    failure: list[BaseException] = []
+
+    def receiver():
+        try:
+            receive_file("127.0.0.1", port, BENCH_PIN, out_dir, chunk_size, recv_engine, digest=digest,
+                         chunk_policy=chunk_policy, sock_buf=sock_buf, observer=capture, progress_interval=None)
+        except BaseException as exc:  # pylint: disable=broad-except
+            failure.append(exc)
+            capture.listening.set()
+
+    thread = threading.Thread(target=receiver, name="p2p-bench-recv", daemon=True)
+    thread.start()
+    if not capture.listening.wait(JOIN_TIMEOUT) or failure:
+        raise failure[0] if failure else TimeoutError("Kıyaslama alıcısı başlamadı.")
+    rss_reset = reset_peak_rss()
+    cpu = time.process_time()
+    start = time.perf_counter()
+    send_file("127.0.0.1", port, BENCH_PIN, src, chunk_size, engine, digest=digest, compress=compress,
+              chunk_policy=chunk_policy, sock_buf=sock_buf, observer=_quiet, progress_interval=None)
+    thread.join(BENCH_TIMEOUT)
+    seconds = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    for item in out_dir.iterdir():
+        if item.is_dir():
+            shutil.rmtree(item)
+        else:
+            item.unlink()
+    if failure:
+        raise failure[0]
+    if thread.is_alive():
+        raise TimeoutError("Kıyaslama alıcısı aktarımı bitirmedi.")
+    gib = size / (1 << 30)
+    rss = peak_rss_bytes()
+    return {
+        "seconds": seconds,
+        "mib_s": size / (1024 * 1024) / seconds if seconds > 0 else 0.0,
+        "cpu_s_per_gib": cpu / gib if gib else 0.0,
+        "peak_rss": rss if rss_reset else None,
+        "ttfb_ms": (capture.first_byte - start) * 1000 if capture.first_byte is not None else None,
+    }
+
+
+def _bench_summary(runs: list[dict]) -> dict:
+    summary = {}
+    for field in ("mib_s", "cpu_s_per_gib", "ttfb_ms", "seconds"):
+        values = [run[field] for run in runs if run[field] is not None]
+        summary[field] = statistics.median(values) if values else None
+    peaks = [run["peak_rss"] for run in runs if run["peak_rss"] is not None]
+    summary["peak_rss"] = max(peaks) if peaks else None
+    return summary
+
+
+def bench(sizes=(BENCH_SIZE,), chunk_sizes=BENCH_CHUNKS, engines=None, recv_engines=("auto",),
+          compressibility=(0.0,), repeat: int = BENCH_REPEAT, digest: str = "auto", compress: str = "off",
+          chunk_policy: str = "static", sock_buf: Optional[int] = None, workdir: Optional[Path] = None,
+          verbose: bool = True, observer: Optional[Callable[[TransferEvent], None]] = None) -> dict:
+    """
+    Loopback benchmark: for every size x compressibility x chunk size x send
+    engine x receive engine, run receive_file and send_file over 127.0.0.1
+    `repeat` times (after one discarded warm-up) and record throughput,
+    process CPU seconds per GiB (sender and receiver together), peak RSS
+    (Linux) and time to first byte (send call to the receiver starting on the
+    payload). A chunk size of 1 MiB means automatic sizing, as on the CLI.
+    Returns a JSON-serialisable dict; cases that fail carry an "error".
+    With verbose, a line per run goes to observer (see TransferReporter).
+    """
+    with _observing(observer, None):
+        return _bench(sizes, chunk_sizes, engines, recv_engines, compressibility, repeat, digest, compress,
+                      chunk_policy, sock_buf, workdir, verbose)
+
+
+def _bench(sizes, chunk_sizes, engines, recv_engines, compressibility, repeat: int, digest: str, compress: str,
+           chunk_policy: str, sock_buf: Optional[int], workdir: Optional[Path], verbose: bool) -> dict:
+    engines = list(engines or available_send_engines())
+    for engine in engines:
+        if engine not in SEND_ENGINES:
+            raise ValueError(f"Bilinmeyen gönderim motoru: {engine}")
+    cases = [{"size": size, "compressibility": comp, "chunk_size": chunk, "engine": engine, "recv_engine": recv}
+             for size in sizes for comp in compressibility for chunk in chunk_sizes
+             for engine in engines for recv in recv_engines]
+    derive_key(BENCH_PIN)
+    digest_costs()
+    with tempfile.TemporaryDirectory(prefix="p2p-bench-", dir=workdir) as tmp:
+        src_dir, out_dir = Path(tmp, "src"), Path(tmp, "out")
+        src_dir.mkdir()
+        out_dir.mkdir()
+        sources: dict[tuple, Path] = {}
+        for size in sizes:
+            for comp in compressibility:
+                sources[size, comp] = make_bench_file(src_dir / f"bench-{size}-{comp:g}.bin", size, comp)
+        warm = cases[0] if cases else None
+        if warm is not None:
+            try:
+                _bench_run(sources[warm["size"], warm["compressibility"]], out_dir, warm["size"], warm["chunk_size"],
+                           warm["engine"], warm["recv_engine"], digest, compress, chunk_policy, sock_buf)
+            except Exception:  # pylint: disable=broad-except
+                pass  # the same case reports the error below
+        for number, case in enumerate(cases, 1):
+            src = sources[case["size"], case["compressibility"]]
+            runs = []
+            try:
+                for attempt in range(repeat):
+                    run = _bench_run(src, out_dir, case["size"], case["chunk_size"], case["engine"],
+                                     case["recv_engine"], digest, compress, chunk_policy, sock_buf)
+                    runs.append(run)
+                    if verbose:
+                        _log(f"[+] Kıyaslama {number}/{len(cases)} #{attempt + 1}: {_bench_label(case)} -> "
+                             f"{run['mib_s']:.1f} MiB/s")
+            except Exception as exc:  # pylint: disable=broad-except
+                case["error"] = str(exc)
+                if verbose:
+                    _log(f"[!] Kıyaslama {number}/{len(cases)}: {_bench_label(case)} başarısız: {exc}")
+            case["runs"] = runs
+            case["median"] = _bench_summary(runs) if runs else None
+    return {
+        "machine": machine_info(),
+        "settings": {"repeat": repeat, "digest": digest, "compress": compress, "chunk_policy": chunk_policy,
+                     "sock_buf": sock_buf},
+        "digest_costs": digest_costs(),
+        "cases": cases,
+    }
+
+
+def _format_bytes(size: int) -> str:
+    for unit, scale in (("GiB", 1 << 30), ("MiB", 1 << 20), ("KiB", 1 << 10)):
+        if size >= scale and size % scale == 0:
+            return f"{size // scale} {unit}"
+    return f"{size} B"
+
+
+def _bench_label(case: dict) -> str:
+    label = f"{_format_bytes(case['size'])}, blok {_format_bytes(case['chunk_size'])}, " \
+            f"{case['engine']}/{case['recv_engine']}"
+    if case["compressibility"]:
+        label += f", sıkıştırılabilirlik {case['compressibility']:g}"
+    return label
+
+
+def format_bench(result: dict) -> str:
+    """Readable table of bench() medians."""
+    header = ("Boyut", "Sıkış.", "Blok", "Motor", "MiB/s", "CPU s/GiB", "RSS MiB", "TTFB ms")
+    rows = []
+    for case in result["cases"]:
+        median = case.get("median")
+        if median is None:
+            cells = ("hata: " + case.get("error", "?"),)
+        else:
+            cells = (f"{median['mib_s']:.1f}", f"{median['cpu_s_per_gib']:.2f}",
+                     "-" if median["peak_rss"] is None else f"{median['peak_rss'] / (1 << 20):.1f}",
+                     "-" if median["ttfb_ms"] is None else f"{median['ttfb_ms']:.1f}")
+        rows.append((_format_bytes(case["size"]), f"{case['compressibility']:g}", _format_bytes(case["chunk_size"]),
+                     f"{case['engine']}/{case['recv_engine']}") + cells)
+    widths = [max(len(row[i]) for row in rows + [header] if i < len(row)) for i in range(len(header))]
+    lines = ["  ".join(cell.ljust(widths[i]) for i, cell in enumerate(row)).rstrip() for row in [header] + rows]
+    costs = result["digest_costs"]
+    lines.append("Özet maliyeti: " + ", ".join(f"{name} {costs[name]:.2f}s/GiB" for name in sorted(costs, key=costs.get)))
+    return "\n".join(lines)
+
+
+def machine_fingerprint(info: Optional[dict] = None) -> str:
+    """Stable key for baselines: results are only comparable on the same host, CPU, OS and interpreter line."""
+    info = info or machine_info()
+    fields = [str(info.get(name, "")) for name in ("host", "system", "machine", "processor", "cpus", "implementation")]
+    fields.append(".".join(str(info.get("python", "")).split(".")[:2]))
+    return hashlib.sha256("|".join(fields).encode()).hexdigest()[:16]
+
+
+def median_ci(values: list[float], confidence: float = GATE_CONFIDENCE,
+              resamples: int = GATE_RESAMPLES) -> Tuple[float, float, float]:
+    """(median, low, high): the median with a percentile-bootstrap confidence interval (seeded, reproducible)."""
+    if not values:
+        raise ValueError("Değer yok.")
+    median = statistics.median(values)
+    if len(values) < 2:
+        return median, median, median
+    rng = random.Random(0)
+    medians = sorted(statistics.median(rng.choices(values, k=len(values))) for _ in range(resamples))
+    tail = (1 - confidence) / 2
+    low = medians[int(tail * (resamples - 1))]
+    high = medians[int(math.ceil((1 - tail) * (resamples - 1)))]
+    return median, low, high
+
+
+def run_scenarios(names=None, repeat: int = GATE_REPEAT, workdir: Optional[Path] = None,
+                  verbose: bool = True,
+                  observer: Optional[Callable[[TransferEvent], None]] = None) -> dict[str, dict]:
+    """
+    Run the standard BENCH_SCENARIOS (or the named subset) with bench(); returns
+    {name: case}. With verbose, each scenario's name goes to observer.
+    """
+    results = {}
+    with _observing(observer, None):
+        for name in names or BENCH_SCENARIOS:
+            if name not in BENCH_SCENARIOS:
+                raise ValueError(f"Bilinmeyen senaryo: {name}")
+            scenario = BENCH_SCENARIOS[name]
+            if verbose:
+                _log(f"[+] Senaryo: {name}")
+            result = bench((scenario["size"],), (scenario["chunk_size"],), (scenario.get("engine", "auto"),),
+                           (scenario.get("recv_engine", "auto"),), (scenario.get("compressibility", 0.0),), repeat,
+                           compress=scenario.get("compress", "off"), workdir=workdir, verbose=False)
+            results[name] = result["cases"][0]
+    return results
+
+
+class BaselineStore:
+    """
+    Benchmark baselines on disk: one JSON file holding, per machine
+    fingerprint, the machine description and for each scenario the raw
+    per-run values of every GATE_METRICS metric, so intervals can be
+    recomputed later. Written atomically.
+    """
+
+    def __init__(self, path: Path, data: Optional[dict] = None):
+        self.path = Path(path)
+        self.data = data or {"version": 1, "machines": {}}
+
+    @classmethod
+    def open(cls, path: Path) -> "BaselineStore":
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            data = None
+        return cls(path, data)
+
+    def scenarios(self, fingerprint: str) -> dict[str, dict]:
+        return self.data["machines"].get(fingerprint, {}).get("scenarios", {})
+
+    def record(self, fingerprint: str, machine: dict, results: dict[str, dict]) -> None:
+        entry = self.data["machines"].setdefault(fingerprint, {"machine": machine, "scenarios": {}})
+        entry["machine"] = machine
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        for name, case in results.items():
+            if not case.get("runs"):
+                continue
+            entry["scenarios"][name] = {
+                "recorded": stamp,
+                "runs": {metric: [run[metric] for run in case["runs"] if run[metric] is not None]
+                         for metric in GATE_METRICS},
+            }
+
+    def save(self) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.data, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def compare_to_baseline(baseline: dict[str, dict], results: dict[str, dict],
+                        thresholds: Optional[dict[str, float]] = None) -> list[dict]:
+    """
+    One row per scenario and metric present on both sides: baseline and
+    current median with confidence intervals, relative change (positive is
+    worse) and whether it counts as a regression: worse than the metric's
+    threshold, by more than its GATE_NOISE_FLOOR in absolute terms, and with
+    the intervals not overlapping. Failed scenarios count as regressions.
+    """
+    thresholds = {**GATE_THRESHOLDS, **(thresholds or {})}
+    rows = []
+    for name, case in results.items():
+        if name not in baseline:
+            continue
+        if not case.get("runs"):
+            rows.append({"scenario": name, "metric": None, "regressed": True, "error": case.get("error", "?")})
+            continue
+        for metric, better in GATE_METRICS.items():
+            old = baseline[name]["runs"].get(metric) or []
+            new = [run[metric] for run in case["runs"] if run[metric] is not None]
+            if not old or not new:
+                continue
+            base, base_lo, base_hi = median_ci(old)
+            cur, cur_lo, cur_hi = median_ci(new)
+            change = (cur - base) / base if base else 0.0
+            if better == "higher":
+                change = -change
+                separated = cur_hi < base_lo
             else:
-                conn.sendall(b"NO")
-                try:
-                    target.unlink()
-                except FileNotFoundError:
-                    pass
-                raise ValueError("Hash eşleşmedi; dosya silindi.")
+                separated = cur_lo > base_hi
+            noticeable = abs(cur - base) > GATE_NOISE_FLOOR.get(metric, 0.0)
+            rows.append({"scenario": name, "metric": metric, "baseline": base, "baseline_ci": [base_lo, base_hi],
+                         "current": cur, "current_ci": [cur_lo, cur_hi], "change": change,
+                         "threshold": thresholds[metric],
+                         "regressed": separated and noticeable and change > thresholds[metric]})
+    return rows
+
+
+def format_comparison(rows: list[dict]) -> str:
+    """Readable lines for compare_to_baseline() rows, with the plain relative change of each median."""
+    lines = []
+    for row in rows:
+        if row["metric"] is None:
+            lines.append(f"[!] {row['scenario']}: çalıştırılamadı ({row['error']})")
+            continue
+        mark = "!" if row["regressed"] else "✓"
+        lines.append(f"[{mark}] {row['scenario']} {row['metric']}: {row['baseline']:.2f} "
+                     f"[{row['baseline_ci'][0]:.2f}, {row['baseline_ci'][1]:.2f}] -> {row['current']:.2f} "
+                     f"[{row['current_ci'][0]:.2f}, {row['current_ci'][1]:.2f}] "
+                     f"({(row['current'] - row['baseline']) / row['baseline'] * 100 if row['baseline'] else 0.0:+.1f}%; "
+                     f"kötüleşme eşiği {row['threshold'] * 100:.0f}%)")
+    return "\n".join(lines)
 
 
 def positive_int(value: str) -> int:
@@ -259,11 +5312,36 @@ def positive_int(value: str) -> int:
     return ivalue
 
 
+def byte_size(value: str) -> int:
+    """Byte count with an optional binary suffix: 65536, 64K, 1M, 2G."""
+    text = value.strip().upper().removesuffix("B").removesuffix("I")
+    scale = 1
+    if text and text[-1] in "KMG":
+        scale = 1024 ** ("KMG".index(text[-1]) + 1)
+        text = text[:-1]
+    try:
+        size = int(float(text) * scale)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Geçersiz boyut: {value}") from None
+    if size <= 0:
+        raise argparse.ArgumentTypeError("Değer pozitif olmalı.")
+    return size
+
+
+def fraction(value: str) -> float:
+    fvalue = float(value)
+    if not 0.0 <= fvalue <= 1.0:
+        raise argparse.ArgumentTypeError("Değer 0 ile 1 arasında olmalı.")
+    return fvalue
+
+
 def parse_args(argv: Tuple[str, ...]) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="PIN korumalı, sunucusuz P2P dosya gönderme/alma aracı."
     )
     parser.add_argument("--chunk-size", type=positive_int, default=1024 * 1024, help="Blok boyutu (bayt). Varsayılan 1 MiB.")
+    parser.add_argument("--sock-buf", type=positive_int, default=None, help="SO_SNDBUF/SO_RCVBUF boyutunu sabitle (bayt; kıyaslama için). Verilmezse bağlantı RTT ölçümüyle BDP'ye göre ayarlanır.")
+    parser.add_argument("--chunk-policy", choices=CHUNK_POLICIES, default="static", help="static: dosya boyutuna göre sabit blok (varsayılan); adaptive: aktarım sırasında ölçülen hız ve sistem çağrısı maliyetine göre bloğu büyüt/küçült (başlangıç --chunk-size ya da boyut kademesi).")
 
     subparsers = parser.add_subparsers(dest="command", required=True)
 
@@ -273,28 +5351,150 @@ def parse_args(argv: Tuple[str, ...]) -> argparse.Namespace:
     recv_p.add_argument("--pin", required=True, help="Paylaşılan PIN.")
     recv_p.add_argument("--output-dir", type=Path, default=Path("."), help="Dosyanın yazılacağı klasör.")
     recv_p.add_argument("--local-only", action="store_true", help="Sadece yerel ağdan erişime izin ver (bind adresi özel/loopback olmalı).")
+    recv_p.add_argument("--resume", action="store_true", help="Yarıda kalan aktarımları .part dosyası ve kontrol noktası günlüğüyle kaldığı yerden sürdür.")
+    recv_p.add_argument("--engine", choices=RECV_ENGINES, default="auto", help="Alım motoru: recv_into (havuzlu tampon), pipeline (alım, yazma ve özet ayrı iş parçacıklarında), splice (Linux, çekirdek içi kopya), loop (klasik) veya auto (varsayılan).")
+    recv_p.add_argument("--digest", choices=DIGEST_POLICIES, default="auto", help="Kabul edilen özet: auto (yalnızca kriptografik, varsayılan), fast (güvenilir LAN'da CRC-32 de) veya tek bir algoritma.")
+    recv_p.add_argument("--announce", nargs="?", const=socket.gethostname(), default=None, metavar="AD",
+                        help="Yerel ağda bu adla UDP çoklu yayın/yayın duyurusu yap; göndericiler --peer AD ile bulur (ad verilmezse makine adı).")
+
+    serve_p = subparsers.add_parser("serve", help="Sürekli dinle; birden çok göndericiden eşzamanlı dosya kabul et.")
+    serve_p.add_argument("--bind", default="0.0.0.0", help="Dinleme adresi (varsayılan 0.0.0.0).")
+    serve_p.add_argument("--port", type=int, required=True, help="Dinlenecek port.")
+    serve_p.add_argument("--pin", required=True, help="Paylaşılan PIN.")
+    serve_p.add_argument("--output-dir", type=Path, default=Path("."), help="Dosyaların yazılacağı klasör.")
+    serve_p.add_argument("--local-only", action="store_true", help="Sadece yerel ağdan erişime izin ver (bind adresi özel/loopback olmalı).")
+    serve_p.add_argument("--resume", action="store_true", help="Yarıda kalan aktarımları kaldığı yerden sürdür.")
+    serve_p.add_argument("--engine", choices=RECV_ENGINES, default="auto", help="Alım motoru (bkz. receive).")
+    serve_p.add_argument("--digest", choices=DIGEST_POLICIES, default="auto", help="Kabul edilen özet (bkz. receive).")
+    serve_p.add_argument("--max-transfers", type=positive_int, default=8, help="Toplam eşzamanlı aktarım sınırı (varsayılan 8).")
+    serve_p.add_argument("--max-per-peer", type=positive_int, default=2, help="Aynı IP adresinden eşzamanlı aktarım sınırı (varsayılan 2).")
+    serve_p.add_argument("--announce", nargs="?", const=socket.gethostname(), default=None, metavar="AD",
+                         help="Yerel ağda bu adla UDP çoklu yayın/yayın duyurusu yap; göndericiler --peer AD ile bulur (ad verilmezse makine adı).")
+    serve_p.add_argument("--keep-idle", type=float, default=KEEP_IDLE_TIMEOUT,
+                         help="Bağlantı havuzu kullanan göndericilerin bağlantısını aktarımdan sonra açık tutma süresi "
+                              f"(saniye, varsayılan {KEEP_IDLE_TIMEOUT:.0f}; 0: kapat).")
 
     send_p = subparsers.add_parser("send", help="Dosya gönder.")
-    send_p.add_argument("--host", required=True, help="Alıcı adresi.")
-    send_p.add_argument("--port", type=int, required=True, help="Alıcı portu.")
+    send_p.add_argument("--host", help="Alıcı adresi (ya da --peer).")
+    send_p.add_argument("--port", type=int, help="Alıcı portu (--peer ile duyurudan alınır).")
+    send_p.add_argument("--peer", metavar="AD", help="Yerel ağda bu adla duyurulan ve aynı PIN'i kullanan alıcıya gönder (--host/--port yerine).")
     send_p.add_argument("--pin", required=True, help="Paylaşılan PIN.")
-    send_p.add_argument("--file", type=Path, required=True, help="Gönderilecek dosya yolu.")
+    send_p.add_argument("--file", nargs="+", action="extend", required=True, help="Gönderilecek dosya/dizin yolu. Birden fazla yol veya glob deseni (\"*.log\") verilirse tek bağlantıda toplu gönderilir.")
     send_p.add_argument("--local-only", action="store_true", help="Hedef adres yerel/özel IP olmalı.")
+    send_p.add_argument("--streams", type=positive_int, default=1, help=f"Tek dosya için paralel TCP akışı sayısı (en fazla {MAX_STREAMS}).")
+    send_p.add_argument("--sequential", action="store_true", help="Toplu gönderimde dosyaları çoklamadan, sırayla gönder.")
+    send_p.add_argument("--dir-mode", choices=DIR_MODES, default="stream", help="Dizinler için: stream (geçici arşiv olmadan girdi girdi akış, varsayılan) veya zip.")
+    send_p.add_argument("--engine", choices=SEND_ENGINES, default="auto", help="Gönderim motoru: sendfile (sıfır kopya), pipeline (okuma, özet ve gönderim ayrı iş parçacıklarında), loop (klasik) veya auto (varsayılan; sendfile yoksa pipeline).")
+    send_p.add_argument("--compress", choices=COMPRESS_POLICIES, default="off", help="Ağ üzerinde uyarlamalı sıkıştırma: auto (zlib/lzma arasından blok başına seçer), zlib, lzma veya off (varsayılan). Sıkıştırılamayan bloklar ve CPU darboğazında ham gönderilir.")
+    send_p.add_argument("--delta", action="store_true", help="Alıcıda aynı adlı eski bir kopya varsa yalnızca değişen blokları gönder (rsync benzeri); yeni dosya eskisinin yanına kurulur.")
+    send_p.add_argument("--digest", choices=DIGEST_POLICIES, default="auto", help="Önerilen özet: auto (bu makinede en ucuz kriptografik özet önce, varsayılan), fast (önce CRC-32; yalnızca güvenilir LAN) veya tek bir algoritma.")
+
+    peers_p = subparsers.add_parser("peers", help="Yerel ağda duyurulan alıcıları listele.")
+    peers_p.add_argument("--pin", help="Yalnızca bu PIN'i kullanan alıcıları göster.")
+    peers_p.add_argument("--wait", type=float, default=2 * ANNOUNCE_INTERVAL, help=f"Duyuruları bekleme süresi (saniye, varsayılan {2 * ANNOUNCE_INTERVAL:.0f}).")
+
+    bench_p = subparsers.add_parser("bench", help="Loopback üzerinde aktarım hızı kıyaslaması (blok boyutu/motor taraması).")
+    bench_p.add_argument("--sizes", nargs="+", type=byte_size, default=[BENCH_SIZE], metavar="BOYUT",
+                         help=f"Sentetik dosya boyutları (ör. 64M 1G; varsayılan {_format_bytes(BENCH_SIZE)}).")
+    bench_p.add_argument("--chunk-sizes", nargs="+", type=byte_size, default=list(BENCH_CHUNKS), metavar="BOYUT",
+                         help="Taranacak blok boyutları (varsayılan 64K 256K 1M 4M; 1M otomatik boyutlandırmadır).")
+    bench_p.add_argument("--engines", nargs="+", choices=SEND_ENGINES[1:], default=None,
+                         help="Taranacak gönderim motorları (varsayılan: bu platformda kullanılabilenlerin hepsi).")
+    bench_p.add_argument("--recv-engines", nargs="+", choices=RECV_ENGINES, default=["auto"],
+                         help="Taranacak alım motorları (varsayılan auto).")
+    bench_p.add_argument("--compressibility", nargs="+", type=fraction, default=[0.0], metavar="ORAN",
+                         help="Sentetik verinin sıkıştırılabilir oranı, 0 (rastgele, varsayılan) ile 1 (sıfırlar) arası.")
+    bench_p.add_argument("--repeat", type=positive_int, default=BENCH_REPEAT, help=f"Her durum için tekrar sayısı (varsayılan {BENCH_REPEAT}).")
+    bench_p.add_argument("--digest", choices=DIGEST_POLICIES, default="auto", help="Özet ilkesi (bkz. send).")
+    bench_p.add_argument("--compress", choices=COMPRESS_POLICIES, default="off", help="Sıkıştırma ilkesi (bkz. send).")
+    bench_p.add_argument("--json", metavar="DOSYA", help="Tüm ölçümleri JSON olarak bu dosyaya yaz ('-': standart çıktı).")
+    bench_p.add_argument("--dir", type=Path, default=None, help="Sentetik dosyalar için geçici klasörün konumu (varsayılan sistem geçici klasörü).")
 
     return parser.parse_args(argv)
 
 
+def _batch_paths(paths: list[Path], args: argparse.Namespace, observer) -> list[Path]:
+    """
+    Files to send for several --file arguments. Directories cannot travel in a
+    batch and are skipped with a message; options that only apply to a single
+    transfer are refused when a batch remains.
+    """
+    files = []
+    for path in paths:
+        if path.is_dir():
+            observer(LogEvent(f"[!] Dizin toplu gönderimde atlanıyor: {path} (dizinleri ayrı gönderin)"))
+        else:
+            files.append(path)
+    if not files:
+        raise ValueError("Gönderilecek dosya kalmadı: toplu gönderim dizin içeremez.")
+    single = {"--streams": args.streams > 1, "--delta": args.delta, "--compress": args.compress != "off",
+              "--dir-mode": args.dir_mode != "stream"}
+    unsupported = [flag for flag, given in single.items() if given]
+    if len(files) > 1 and unsupported:
+        raise ValueError(f"{', '.join(unsupported)} toplu gönderimde desteklenmez; dosyaları tek tek gönderin.")
+    return files
+
+
 def main(argv: Tuple[str, ...]) -> int:
     args = parse_args(argv)
+    observer = PrintObserver()
     try:
         if args.command == "send":
+            if args.peer:
+                peer = find_peer(args.peer, derive_key(args.pin))
+                if peer is None:
+                    raise LookupError(f"'{args.peer}' adlı alıcı yerel ağda bulunamadı (alıcı --announce ile çalışıyor mu?).")
+                print(f"[+] Eş bulundu: {peer.name} -> {peer.host}:{peer.port}")
+                args.host, args.port = peer.host, args.port or peer.port
+            elif not args.host or not args.port:
+                raise ValueError("--host ve --port (ya da --peer) gerekli.")
             if args.local_only:
                 ensure_local(args.host)
-            send_file(args.host, args.port, args.pin, args.file, args.chunk_size)
+            paths = expand_paths(args.file)
+            if len(paths) > 1:
+                paths = _batch_paths(paths, args, observer)
+            if len(paths) == 1:
+                send_file(args.host, args.port, args.pin, paths[0], args.chunk_size, args.engine, args.streams, args.dir_mode,
+                          args.digest, args.delta, args.compress, args.chunk_policy, args.sock_buf, observer=observer)
+            else:
+                send_files(args.host, args.port, args.pin, paths, args.chunk_size, args.engine, mux=not args.sequential,
+                           digest=args.digest, observer=observer)
         elif args.command == "receive":
             if args.local_only:
                 ensure_local(args.bind)
-            receive_file(args.bind, args.port, args.pin, args.output_dir, args.chunk_size)
+            receive_file(args.bind, args.port, args.pin, args.output_dir, args.chunk_size, args.engine, args.resume,
+                         args.digest, args.chunk_policy, args.sock_buf, args.announce, observer=observer)
+        elif args.command == "serve":
+            if args.local_only:
+                ensure_local(args.bind)
+            serve(args.bind, args.port, args.pin, args.output_dir, args.chunk_size, args.engine, args.resume,
+                  args.max_transfers, args.max_per_peer, args.digest, args.chunk_policy, args.sock_buf,
+                  args.keep_idle, args.announce, observer=observer)
+        elif args.command == "peers":
+            key = derive_key(args.pin) if args.pin else None
+            table = peer_table()
+            time.sleep(args.wait)
+            peers = table.peers(key)
+            if not peers:
+                print("[!] Duyuru yapan alıcı bulunamadı.")
+            for peer in peers:
+                caps = peer.caps
+                print(f"{peer.name}\t{peer.host}:{peer.port}\t{caps.get('kind', '?')}"
+                      f"{'' if key is None else ' (PIN eşleşiyor)'}\tözet: {','.join(caps.get('digests', []))}"
+                      f"\tsıkıştırma: {','.join(caps.get('codecs', [])) or '-'}")
+        elif args.command == "bench":
+            result = bench(args.sizes, args.chunk_sizes, args.engines, args.recv_engines, args.compressibility,
+                           args.repeat, args.digest, args.compress, args.chunk_policy, args.sock_buf, args.dir,
+                           verbose=args.json != "-", observer=observer)
+            if args.json == "-":
+                print(json.dumps(result, indent=2))
+            else:
+                print(format_bench(result))
+                if args.json:
+                    Path(args.json).write_text(json.dumps(result, indent=2), encoding="utf-8")
+                    print(f"[+] Sonuçlar yazıldı: {args.json}")
+            if any("error" in case for case in result["cases"]):
+                return 1
         else:
             raise ValueError("Geçersiz komut.")
     except KeyboardInterrupt:
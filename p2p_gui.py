@@ -2,34 +2,18 @@
 Basit tkinter arayüzü: sunucusuz P2P dosya gönder/al (PIN doğrulamalı).
 Komut satırı yerine form doldurarak çalıştırmak için.
 """
-"""
-Basit tkinter arayüzü: sunucusuz P2P dosya gönder/al (PIN doğrulamalı).
-Komut satırı yerine form doldurarak çalıştırmak için.
-"""
 from __future__ import annotations
 
+import socket
 import threading
-from contextlib import redirect_stdout
 from pathlib import Path
 from tkinter import filedialog, messagebox, scrolledtext, StringVar, IntVar
 import tkinter as tk
 
-from p2p import send_file, receive_file, ensure_local
-
-
-class LogWriter:
-    """stdout'u arayüz loguna yönlendirmek için hafif yardımcı."""
+from p2p import DIGEST_POLICIES, send_file, receive_file, ensure_local, prefetch_key, ConnectionPool, \
+    derive_key, peer_address, peer_table
 
-    def __init__(self, log_fn):
-        self.log_fn = log_fn
-
-    def write(self, data: str) -> None:
-        text = data.rstrip("\n")
-        if text:
-            self.log_fn(text)
-
-    def flush(self) -> None:  # stdout uyumluluğu
-        return
+PIN_PREFETCH_DELAY_MS = 400
 
 
 class App(tk.Tk):
@@ -47,11 +31,25 @@ class App(tk.Tk):
         self.file_path = StringVar()
         self.output_dir = StringVar(value=str(Path.cwd()))
         self.chunk_size = IntVar(value=1024 * 1024)
+        self.sock_buf = StringVar(value="")  # boş: RTT ölçümüyle BDP'ye göre otomatik
         self.local_only = IntVar(value=1)  # 1: LAN, 0: Genel
+        self.resume = IntVar(value=0)  # receive: yarıda kalanı sürdür
+        self.digest = StringVar(value="auto")  # özet ilkesi: auto, fast veya tek algoritma
 
         self._running = False
+        self._pin_job = None
+        self.pool = ConnectionPool()  # aynı alıcıya sonraki gönderimler bağlantıyı yeniden kullanır
+        self._start_discovery()
+        self.pin.trace_add("write", self._on_pin_change)
+        prefetch_key(self.pin.get().strip())
         self._build_ui()
 
+    def _on_pin_change(self, *_) -> None:
+        # PIN anahtarı yazma durunca arka planda türetilir; Başlat'a basıldığında hazırdır.
+        if self._pin_job is not None:
+            self.after_cancel(self._pin_job)
+        self._pin_job = self.after(PIN_PREFETCH_DELAY_MS, lambda: prefetch_key(self.pin.get().strip()))
+
     def _build_ui(self) -> None:
         header = tk.Label(
             self,
@@ -84,9 +82,10 @@ class App(tk.Tk):
         self._add_labeled_entry(form, "Pin", self.pin, row=0)
         self._add_labeled_entry(form, "Port", self.port, row=1)
         self._add_labeled_entry(form, "Blok boyutu (bayt)", self.chunk_size, row=2)
+        self._add_labeled_entry(form, "Soket tamponu (bayt, boş: otomatik)", self.sock_buf, row=7)
 
         # Send specific
-        self.host_row = self._add_labeled_entry(form, "Alıcı host (send)", self.host, row=3)
+        self.host_row = self._add_labeled_entry(form, "Alıcı host ya da eş adı (send)", self.host, row=3)
         self.file_row = self._add_path_picker(form, "Gönderilecek dosya", self.file_path, row=4, pick_file=True)
 
         # Receive specific
@@ -117,6 +116,33 @@ class App(tk.Tk):
             activebackground="#1e293b",
         ).pack(side=tk.LEFT, padx=10)
 
+        resume_row = tk.Frame(self, bg="#0f172a")
+        resume_row.pack(fill=tk.X, padx=20, pady=(2, 2))
+        self.resume_check = tk.Checkbutton(
+            resume_row,
+            text="Yarıda kalan aktarımı kaldığı yerden sürdür (receive)",
+            variable=self.resume,
+            bg="#0f172a",
+            fg="#e2e8f0",
+            selectcolor="#1e293b",
+            activebackground="#1e293b",
+        )
+        self.resume_check.pack(side=tk.LEFT)
+
+        digest_row = tk.Frame(self, bg="#0f172a")
+        digest_row.pack(fill=tk.X, padx=20, pady=(2, 2))
+        tk.Label(digest_row, text="Özet ilkesi", bg="#0f172a", fg="#cbd5e1", font=("Segoe UI", 10)).pack(side=tk.LEFT)
+        digest_menu = tk.OptionMenu(digest_row, self.digest, *DIGEST_POLICIES)
+        digest_menu.configure(bg="#1e293b", fg="#e2e8f0", activebackground="#334155", relief=tk.FLAT, highlightthickness=0)
+        digest_menu.pack(side=tk.LEFT, padx=10)
+        tk.Label(
+            digest_row,
+            text="fast: CRC-32 (yalnızca güvenilir LAN)",
+            bg="#0f172a",
+            fg="#64748b",
+            font=("Segoe UI", 9),
+        ).pack(side=tk.LEFT)
+
         self.start_btn = tk.Button(
             self,
             text="Başlat",
@@ -206,6 +232,7 @@ class App(tk.Tk):
                 widget.configure(state=tk.NORMAL if recv_visible else tk.DISABLED)
             except tk.TclError:
                 pass
+        self.resume_check.configure(state=tk.NORMAL if recv_visible else tk.DISABLED)
 
     def log(self, text: str) -> None:
         self.log_box.configure(state=tk.NORMAL)
@@ -231,6 +258,13 @@ class App(tk.Tk):
         except ValueError:
             messagebox.showerror("Hata", "Blok boyutu pozitif olmalı.")
             return
+        try:
+            sock_buf = int(self.sock_buf.get()) if self.sock_buf.get().strip() else None
+            if sock_buf is not None and sock_buf <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Hata", "Soket tamponu pozitif olmalı (otomatik için boş bırakın).")
+            return
 
         mode = self.mode.get()
         pin = self.pin.get().strip()
@@ -238,6 +272,7 @@ class App(tk.Tk):
             messagebox.showerror("Hata", "PIN boş olamaz.")
             return
         local_only = bool(self.local_only.get())
+        digest = self.digest.get()
 
         if mode == "send":
             host = self.host.get().strip()
@@ -248,35 +283,55 @@ class App(tk.Tk):
             if not file_path.is_file():
                 messagebox.showerror("Hata", "Gönderilecek dosya bulunamadı.")
                 return
+            # Yerel ağda duyurulan bir eş adı yazıldıysa adresi ve portu duyurudan alınır.
+            host, port = peer_address(host, port, derive_key(pin))
             if local_only:
                 try:
                     ensure_local(host)
                 except Exception as exc:  # pylint: disable=broad-except
                     messagebox.showerror("Hata", str(exc))
                     return
-            target_fn = lambda: send_file(host, port, pin, file_path, chunk_size)
+            target_fn = lambda: self._send(host, port, pin, file_path, chunk_size, digest, sock_buf)
         else:
             bind_addr = self.bind_addr.get().strip() or "0.0.0.0"
             output_dir = Path(self.output_dir.get() or ".")
+            resume = bool(self.resume.get())
             if local_only:
                 try:
                     ensure_local(bind_addr)
                 except Exception as exc:  # pylint: disable=broad-except
                     messagebox.showerror("Hata", str(exc))
                     return
-            target_fn = lambda: receive_file(bind_addr, port, pin, output_dir, chunk_size)
+            announce = socket.gethostname() if local_only else None  # yerel ağda bu adla duyur
+            target_fn = lambda: receive_file(bind_addr, port, pin, output_dir, chunk_size, resume=resume, digest=digest,
+                                             sock_buf=sock_buf, announce=announce, observer=self._on_event)
 
         self._run_thread(target_fn)
 
+    def _start_discovery(self) -> None:
+        # Yerel ağdaki alıcıların duyurularını arka planda dinle; host alanına eş adı yazılabilir.
+        try:
+            peer_table()
+        except OSError:
+            pass
+
+    def _send(self, host, port, pin, file_path, chunk_size, digest, sock_buf) -> None:
+        send_file(host, port, pin, file_path, chunk_size, digest=digest, sock_buf=sock_buf, pool=self.pool,
+                  observer=self._on_event)
+        self.after(0, self.log, self.pool.report())
+
+    def _on_event(self, event) -> None:
+        # Aktarım olayları iş parçacığından gelir; loga Tk döngüsünde yazılır.
+        if event.message is not None:
+            self.after(0, self.log, event.message)
+
     def _run_thread(self, target_fn) -> None:
         self._running = True
         self.start_btn.configure(state=tk.DISABLED, text="Çalışıyor...")
-        writer = LogWriter(self.log)
 
         def runner():
             try:
-                with redirect_stdout(writer):
-                    target_fn()
+                target_fn()
                 self.log("[✓] İşlem tamamlandı.")
             except Exception as exc:  # pylint: disable=broad-except
                 self.log(f"[!] Hata: {exc}")
@@ -6,10 +6,9 @@ Android APK üretimi için buildozer/python-for-android ile paketlenebilir.
 """
 from __future__ import annotations
 
+import socket
 import threading
-from contextlib import redirect_stdout
 from pathlib import Path
-from typing import Callable
 
 from kivy.app import App
 from kivy.clock import Clock
@@ -22,22 +21,10 @@ from kivy.uix.switch import Switch
 from kivy.uix.textinput import TextInput
 from kivy.uix.filechooser import FileChooserListView
 
-from p2p import send_file, receive_file, ensure_local
+from p2p import DIGEST_POLICIES, send_file, receive_file, ensure_local, prefetch_key, ConnectionPool, \
+    derive_key, peer_address, peer_table
 
-
-class LogWriter:
-    """stdout'u Kivy log ekranına yönlendirmek için."""
-
-    def __init__(self, append_fn: Callable[[str], None]):
-        self.append_fn = append_fn
-
-    def write(self, data: str) -> None:
-        text = data.rstrip("\n")
-        if text:
-            self.append_fn(text)
-
-    def flush(self) -> None:
-        return
+PIN_PREFETCH_DELAY = 0.4
 
 
 class PickerPopup(Popup):
@@ -67,6 +54,8 @@ class PickerPopup(Popup):
 class P2PApp(App):
     def build(self):
         self.mode = "send"
+        self.pool = ConnectionPool()  # aynı alıcıya sonraki gönderimler bağlantıyı yeniden kullanır
+        self._start_discovery()
         root = BoxLayout(orientation="vertical", padding=12, spacing=10)
 
         header = Label(
@@ -93,10 +82,15 @@ class P2PApp(App):
         root.add_widget(scope_row)
 
         self.pin_input = self._add_field(root, "PIN", "123456")
+        self._pin_event = None
+        self.pin_input.bind(text=self._on_pin_change)
+        prefetch_key(self.pin_input.text.strip())
         self.port_input = self._add_field(root, "Port", "5000", input_filter="int")
         self.chunk_input = self._add_field(root, "Blok boyutu (bayt)", "1048576", input_filter="int")
+        self.digest_input = self._add_field(root, "Özet ilkesi (auto/fast/...)", "auto")
+        self.sock_buf_input = self._add_field(root, "Soket tamponu (bayt, boş: otomatik)", "", input_filter="int")
 
-        self.host_input = self._add_field(root, "Alıcı host (send)", "192.168.1.50")
+        self.host_input = self._add_field(root, "Alıcı host ya da eş adı (send)", "192.168.1.50")
         self.file_input = self._add_field_with_picker(root, "Gönderilecek dosya", pick_dir=False)
 
         self.bind_input = self._add_field(root, "Dinlenecek adres (receive)", "0.0.0.0")
@@ -140,6 +134,12 @@ class P2PApp(App):
         self.log_label.height = max(self.log_label.texture_size[1], self.log_label.parent.height)
         self.log_label.text_size = (self.log_label.width, None)
 
+    def _on_pin_change(self, _instance, _text):
+        # PIN anahtarı yazma durunca arka planda türetilir; Başlat'a basıldığında hazırdır.
+        if self._pin_event is not None:
+            self._pin_event.cancel()
+        self._pin_event = Clock.schedule_once(lambda *_: prefetch_key(self.pin_input.text.strip()), PIN_PREFETCH_DELAY)
+
     def on_mode_toggle(self, _instance, value: bool):
         self.mode = "send" if value else "receive"
         self._toggle_visibility()
@@ -169,10 +169,11 @@ class P2PApp(App):
         try:
             port = int(self.port_input.text)
             chunk_size = int(self.chunk_input.text)
-            if port <= 0 or port > 65535 or chunk_size <= 0:
+            sock_buf = int(self.sock_buf_input.text) if self.sock_buf_input.text.strip() else None
+            if port <= 0 or port > 65535 or chunk_size <= 0 or (sock_buf is not None and sock_buf <= 0):
                 raise ValueError
         except ValueError:
-            self.append_log("[!] Port 1-65535 ve blok boyutu pozitif olmalı.")
+            self.append_log("[!] Port 1-65535, blok boyutu ve soket tamponu pozitif olmalı.")
             return
 
         pin = self.pin_input.text.strip()
@@ -180,6 +181,10 @@ class P2PApp(App):
             self.append_log("[!] PIN boş olamaz.")
             return
         local_only = bool(self.scope_switch.active)
+        digest = self.digest_input.text.strip().lower() or "auto"
+        if digest not in DIGEST_POLICIES:
+            self.append_log(f"[!] Özet ilkesi şunlardan biri olmalı: {', '.join(DIGEST_POLICIES)}")
+            return
 
         if self.mode == "send":
             host = self.host_input.text.strip()
@@ -190,13 +195,15 @@ class P2PApp(App):
             if not file_path.is_file():
                 self.append_log("[!] Gönderilecek dosya bulunamadı.")
                 return
+            # Yerel ağda duyurulan bir eş adı yazıldıysa adresi ve portu duyurudan alınır.
+            host, port = peer_address(host, port, derive_key(pin))
             if local_only:
                 try:
                     ensure_local(host)
                 except Exception as exc:  # pylint: disable=broad-except
                     self.append_log(f"[!] {exc}")
                     return
-            target_fn = lambda: send_file(host, port, pin, file_path, chunk_size)
+            target_fn = lambda: self._send(host, port, pin, file_path, chunk_size, digest, sock_buf)
         else:
             bind_addr = self.bind_input.text.strip() or "0.0.0.0"
             output_dir = Path(self.out_input.text or ".")
@@ -206,19 +213,37 @@ class P2PApp(App):
                 except Exception as exc:  # pylint: disable=broad-except
                     self.append_log(f"[!] {exc}")
                     return
-            target_fn = lambda: receive_file(bind_addr, port, pin, output_dir, chunk_size)
+            announce = socket.gethostname() if local_only else None  # yerel ağda bu adla duyur
+            target_fn = lambda: receive_file(bind_addr, port, pin, output_dir, chunk_size, digest=digest,
+                                             sock_buf=sock_buf, announce=announce, observer=self._on_event)
 
         self._run_thread(target_fn)
 
+    def _start_discovery(self):
+        # Yerel ağdaki alıcıların duyurularını arka planda dinle; host alanına eş adı yazılabilir.
+        try:
+            peer_table()
+        except OSError:
+            pass
+
+    def _send(self, host, port, pin, file_path, chunk_size, digest, sock_buf):
+        send_file(host, port, pin, file_path, chunk_size, digest=digest, sock_buf=sock_buf, pool=self.pool,
+                  observer=self._on_event)
+        report = self.pool.report()
+        Clock.schedule_once(lambda *_: self.append_log(report))
+
+    def _on_event(self, event):
+        # Aktarım olayları iş parçacığından gelir; günlüğe UI iş parçacığında yazılır.
+        if event.message is not None:
+            Clock.schedule_once(lambda *_: self.append_log(event.message))
+
     def _run_thread(self, target_fn):
         self._running = True
         self.start_btn.disabled = True
-        writer = LogWriter(lambda t: Clock.schedule_once(lambda *_: self.append_log(t)))
 
         def runner():
             try:
-                with redirect_stdout(writer):
-                    target_fn()
+                target_fn()
                 Clock.schedule_once(lambda *_: self.append_log("[✓] Tamamlandı."))
             except Exception as exc:  # pylint: disable=broad-except
                 Clock.schedule_once(lambda *_: self.append_log(f"[!] Hata: {exc}"))
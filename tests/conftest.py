@@ -0,0 +1,100 @@
+"""Loopback fixtures: a receiver on a background thread, free ports and raw authenticated clients."""
+
+import random
+import socket
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import p2p  # noqa: E402
+
+PIN = "424242"
+HOST = "127.0.0.1"
+
+
+def quiet(event) -> None:
+    pass
+
+
+class Receiver:
+    """receive_file (or serve-style callable) on a daemon thread; its events and error are kept for the test."""
+
+    def __init__(self, output_dir: Path, port: int, target=None, **kwargs):
+        self.events: list = []
+        self.error = None
+        self.listening = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(target or p2p.receive_file, output_dir, port, kwargs),
+                                       daemon=True)
+        self.thread.start()
+        assert self.listening.wait(10), "receiver did not start listening"
+
+    def _observe(self, event) -> None:
+        self.events.append(event)
+        if isinstance(event, p2p.ListeningEvent):
+            self.listening.set()
+
+    def _run(self, target, output_dir: Path, port: int, kwargs: dict) -> None:
+        try:
+            target(HOST, port, PIN, output_dir, observer=self._observe, **kwargs)
+        except Exception as exc:  # pylint: disable=broad-except
+            self.error = exc
+        finally:
+            self.listening.set()
+
+    def join(self, timeout: float = 30) -> "Receiver":
+        self.thread.join(timeout)
+        assert not self.thread.is_alive(), "receiver did not finish"
+        return self
+
+    def messages(self) -> list[str]:
+        return [event.message for event in self.events if event.message]
+
+
+@pytest.fixture(autouse=True)
+def _fresh_tickets():
+    p2p.SESSION_TICKETS.clear()
+    yield
+    p2p.SESSION_TICKETS.clear()
+
+
+@pytest.fixture
+def port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def out(tmp_path: Path) -> Path:
+    path = tmp_path / "out"
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def receiver(out: Path, port: int):
+    """Start a receiver on `port` writing into `out`; call it with receive_file keyword arguments."""
+    def start(**kwargs) -> Receiver:
+        return Receiver(out, port, **kwargs)
+    return start
+
+
+def send(port: int, path: Path, **kwargs) -> None:
+    p2p.send_file(HOST, port, PIN, path, observer=kwargs.pop("observer", quiet), **kwargs)
+
+
+def make_file(path: Path, size: int, seed: int = 1) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(random.Random(seed).randbytes(size))
+    return path
+
+
+def client(port: int) -> socket.socket:
+    """A raw connection that has passed the v2 handshake, for hand-written (hostile) senders."""
+    conn = socket.create_connection((HOST, port), timeout=30)
+    assert p2p.handshake(conn, p2p.derive_key(PIN), initiator=True) == 2
+    return conn
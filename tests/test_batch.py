@@ -0,0 +1,58 @@
+"""Batch sessions over loopback: multiplexed and sequential, and how the CLI builds them."""
+
+import pytest
+
+import p2p
+from conftest import HOST, PIN, make_file, quiet
+
+
+def make_files(root, count: int) -> list:
+    # Mixed sizes so small files have to get past larger ones in the mux scheduler.
+    return [make_file(root / f"f{i:02d}.bin", 1000 + (i % 5) * 700_000, seed=i + 1) for i in range(count)]
+
+
+@pytest.mark.parametrize("mux", [True, False], ids=["mux", "sequential"])
+def test_batch(tmp_path, out, port, receiver, mux):
+    paths = make_files(tmp_path / "src", p2p.MUX_MAX_OPEN + 8)
+    rx = receiver()
+    p2p.send_files(HOST, port, PIN, paths, mux=mux, observer=quiet)
+    assert rx.join().error is None
+    for path in paths:
+        assert (out / path.name).read_bytes() == path.read_bytes()
+
+
+def test_batch_hash_mismatch_is_reported_per_file(tmp_path, out, port, receiver, monkeypatch):
+    paths = make_files(tmp_path / "src", 3)
+    real = p2p._send_payload
+    calls = []
+
+    def wrong_second_digest(*args):
+        digest = real(*args)
+        calls.append(digest)
+        return bytes(len(digest)) if len(calls) == 2 else digest
+
+    monkeypatch.setattr(p2p, "_send_payload", wrong_second_digest)
+    rx = receiver()
+    with pytest.raises(ConnectionError, match="1 dosyada"):
+        p2p.send_files(HOST, port, PIN, paths, mux=False, observer=quiet)
+    assert isinstance(rx.join().error, ValueError)
+    assert sorted(path.name for path in out.iterdir()) == [paths[0].name, paths[2].name]
+
+
+def test_cli_rejects_single_transfer_options_for_a_batch(tmp_path, capsys):
+    paths = make_files(tmp_path, 2)
+    argv = ("send", "--host", HOST, "--port", "9", "--pin", PIN, "--file", *map(str, paths), "--delta",
+            "--streams", "4")
+    assert p2p.main(argv) == 1
+    assert "--streams, --delta toplu gönderimde desteklenmez" in capsys.readouterr().out
+
+
+def test_cli_skips_directories_in_a_batch(tmp_path, out, port, receiver, capsys):
+    paths = make_files(tmp_path / "src", 2)
+    (tmp_path / "src" / "folder").mkdir()
+    rx = receiver()
+    argv = ("send", "--host", HOST, "--port", str(port), "--pin", PIN, "--file", str(tmp_path / "src" / "*"))
+    assert p2p.main(argv) == 0
+    assert rx.join().error is None
+    assert "Dizin toplu gönderimde atlanıyor" in capsys.readouterr().out
+    assert sorted(path.name for path in out.iterdir()) == sorted(path.name for path in paths)
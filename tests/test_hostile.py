@@ -0,0 +1,201 @@
+"""Transfers that must fail cleanly: hostile names and framing, hash mismatches and streams that break off."""
+
+import json
+import os
+
+import pytest
+
+import p2p
+from conftest import HOST, Receiver, client, make_file, quiet, send
+
+
+def session(port: int, header: dict):
+    """A raw client past the handshake and the v2 header; returns (connection, receiver reply)."""
+    conn = client(port)
+    p2p.send_frame(conn, {"digests": ["sha256"], **header})
+    return conn, p2p.recv_reply(conn)
+
+
+@pytest.mark.parametrize("name", [".", "", "..", "/"])
+def test_unusable_name_is_refused(out, port, receiver, name):
+    rx = receiver()
+    with pytest.raises(ConnectionError, match="reddetti: name"):
+        session(port, {"name": name, "size": 1})
+    assert isinstance(rx.join().error, ValueError)
+    assert list(out.iterdir()) == []
+
+
+def test_name_is_reduced_to_its_last_component(tmp_path, out, port, receiver):
+    rx = receiver()
+    conn, reply = session(port, {"name": "../../escape.bin", "size": 5, "streams": 1})
+    with conn:
+        assert reply["offset"] == 0
+        conn.sendall(b"hello")
+        conn.sendall(p2p.new_digest(reply["digest"], b"hello").digest())
+        assert p2p.recv_exact(conn, 2) == b"OK"
+    assert rx.join().error is None
+    assert [path.name for path in out.iterdir()] == ["escape.bin"]
+    assert not (tmp_path.parent / "escape.bin").exists()
+
+
+@pytest.mark.parametrize("rel", ["../x", "sub/../../x", "/etc/x", "a\\..\\x", "."])
+def test_tree_entry_outside_root_is_refused(tmp_path, out, port, receiver, rel):
+    rx = receiver()
+    conn, _ = session(port, {"kind": "tree", "name": "evil"})
+    with conn:
+        p2p.send_frame(conn, {"type": "dir", "path": "ok"})
+        p2p.send_frame(conn, {"type": "file", "path": rel, "size": 1})
+        conn.sendall(b"x")
+    assert isinstance(rx.join().error, ValueError)
+    assert list(out.iterdir()) == []
+    assert not (tmp_path / "x").exists()
+
+
+def test_tree_hash_mismatch_removes_the_directory(tmp_path, out, port, receiver, monkeypatch):
+    root = tmp_path / "tree"
+    for i in range(3):
+        make_file(root / f"{i}.bin", 50_000, seed=i + 1)
+    real = p2p._send_payload
+    calls = []
+
+    def wrong_second_digest(*args):
+        digest = real(*args)
+        calls.append(digest)
+        return bytes(len(digest)) if len(calls) == 2 else digest
+
+    monkeypatch.setattr(p2p, "_send_payload", wrong_second_digest)
+    rx = receiver()
+    with pytest.raises(ConnectionError):
+        send(port, root)
+    assert "hash'i eşleşmedi" in str(rx.join().error)
+    assert list(out.iterdir()) == []
+
+
+def test_single_file_hash_mismatch(out, port, receiver):
+    rx = receiver()
+    conn, reply = session(port, {"name": "data.bin", "size": 5, "streams": 1})
+    with conn:
+        conn.sendall(b"hello")
+        conn.sendall(p2p.new_digest(reply["digest"], b"other").digest())
+        assert p2p.recv_exact(conn, 2) == b"NO"
+    assert rx.join().error is not None
+    assert list(out.iterdir()) == []
+
+
+def test_truncated_stream_without_resume(out, port, receiver):
+    rx = receiver()
+    conn, _ = session(port, {"name": "data.bin", "size": 1_000_000, "streams": 1})
+    conn.sendall(os.urandom(300_000))
+    conn.close()
+    assert isinstance(rx.join().error, ConnectionError)
+    assert not (out / "data.bin").exists()
+
+
+def test_file_shrinking_under_the_sender(tmp_path, out, port, receiver, monkeypatch):
+    src = make_file(tmp_path / "big.bin", 4 * 1024 * 1024)
+    real = p2p._aio_send_payload
+
+    async def shrink(*args, **kwargs):
+        os.truncate(src, 1024 * 1024)
+        return await real(*args, **kwargs)
+
+    monkeypatch.setattr(p2p, "_aio_send_payload", shrink)
+    rx = receiver()
+    with pytest.raises(ConnectionError):
+        send(port, src, engine="sendfile")
+    assert rx.join().error is not None
+    assert not (out / "big.bin").exists()
+
+
+def mux_open(sid: int, name: str, size: int) -> bytes:
+    meta = json.dumps({"name": name, "size": size}).encode("utf-8")
+    return p2p.MUX_HEADER.pack(p2p.MUX_OPEN, sid, len(meta)) + meta
+
+
+def mux_data(sid: int, data: bytes) -> bytes:
+    return p2p.MUX_HEADER.pack(p2p.MUX_DATA, sid, len(data)) + data
+
+
+def mux_close(sid: int, digest: bytes) -> bytes:
+    return p2p.MUX_HEADER.pack(p2p.MUX_CLOSE, sid, len(digest)) + digest
+
+
+def mux_ack(conn) -> tuple:
+    """Skip credit frames up to the next per-file ack; returns (sid, verdict)."""
+    while True:
+        kind, sid, length = p2p.MUX_HEADER.unpack(p2p.recv_exact(conn, p2p.MUX_HEADER.size))
+        payload = p2p.recv_exact(conn, length)
+        if kind == p2p.MUX_ACK:
+            return sid, payload
+
+
+def mux_session(port: int, count: int):
+    conn, reply = session(port, {"kind": "mux", "count": count})
+    assert reply["window"] == p2p.MUX_WINDOW
+    return conn
+
+
+def sha(data: bytes) -> bytes:
+    return p2p.new_digest("sha256", data).digest()
+
+
+def test_mux_keeps_verified_files_and_drops_open_ones_on_disconnect(out, port, receiver):
+    rx = receiver()
+    with mux_session(port, 2) as conn:
+        conn.sendall(mux_open(1, "done.txt", 4) + mux_open(2, "half.txt", 10))
+        conn.sendall(mux_data(1, b"good") + mux_data(2, b"half"))
+        conn.sendall(mux_close(1, sha(b"good")))
+        assert mux_ack(conn) == (1, b"OK")
+    assert isinstance(rx.join().error, ConnectionError)
+    assert [path.name for path in out.iterdir()] == ["done.txt"]
+    assert any("Yarım kalan dosya silindi: half.txt" in message for message in rx.messages())
+
+
+def test_mux_hash_mismatch_is_acknowledged_no(out, port, receiver):
+    rx = receiver()
+    with mux_session(port, 2) as conn:
+        conn.sendall(mux_open(1, "a.txt", 3) + mux_data(1, b"abc") + mux_close(1, sha(b"xyz")))
+        assert mux_ack(conn) == (1, b"NO")
+        conn.sendall(mux_open(2, "b.txt", 3) + mux_data(2, b"abc") + mux_close(2, sha(b"abc")))
+        assert mux_ack(conn) == (2, b"OK")
+        conn.sendall(p2p.MUX_HEADER.pack(p2p.MUX_END, 0, 0))
+    assert "1 dosya doğrulanamadı" in str(rx.join().error)
+    assert [path.name for path in out.iterdir()] == ["b.txt"]
+
+
+@pytest.mark.parametrize("frames", [
+    pytest.param(mux_open(1, "a.txt", 3) + mux_open(1, "b.txt", 3), id="duplicate-open"),
+    pytest.param(b"".join(mux_open(sid, f"{sid}.txt", 1) for sid in range(1, p2p.MUX_MAX_OPEN + 2)),
+                 id="too-many-open"),
+    pytest.param(mux_open(1, "a.txt", 3) + mux_data(1, b"abcd"), id="data-past-size"),
+    pytest.param(mux_data(7, b"abc"), id="data-unknown-stream"),
+    pytest.param(mux_close(7, sha(b"")), id="close-unknown-stream"),
+    pytest.param(mux_open(1, "a.txt", -1), id="negative-size"),
+    pytest.param(p2p.MUX_HEADER.pack(99, 1, 0), id="unknown-kind"),
+])
+def test_mux_framing_violations(out, port, receiver, frames):
+    rx = receiver()
+    with mux_session(port, p2p.MUX_MAX_OPEN + 1) as conn:
+        conn.sendall(frames)
+        rx.join()
+    assert isinstance(rx.error, ValueError)
+    assert list(out.iterdir()) == []
+
+
+def test_mux_names_are_reduced_to_their_last_component(tmp_path, out, port, receiver):
+    rx = receiver()
+    with mux_session(port, 1) as conn:
+        conn.sendall(mux_open(1, "../../up.txt", 2) + mux_data(1, b"hi") + mux_close(1, sha(b"hi")))
+        assert mux_ack(conn) == (1, b"OK")
+        conn.sendall(p2p.MUX_HEADER.pack(p2p.MUX_END, 0, 0))
+    assert rx.join().error is None
+    assert [path.name for path in out.iterdir()] == ["up.txt"]
+    assert not (tmp_path.parent / "up.txt").exists()
+
+
+def test_batch_with_a_wrong_pin_never_writes(tmp_path, out, port):
+    rx = Receiver(out, port)
+    with pytest.raises(PermissionError):
+        p2p.send_files(HOST, port, "111111", [make_file(tmp_path / "a.bin", 10)], observer=quiet)
+    assert isinstance(rx.join().error, PermissionError)
+    assert list(out.iterdir()) == []
@@ -0,0 +1,255 @@
+"""Loopback transfers that should succeed: every engine, parallel streams, trees, delta, compression and resume."""
+
+import asyncio
+import socket
+import threading
+import zipfile
+
+import pytest
+
+import p2p
+from conftest import HOST, PIN, Receiver, client, make_file, quiet, send
+
+SIZE = 3 * 1024 * 1024 + 12345  # above SENDFILE_MIN_SIZE, not a multiple of any block size
+
+
+@pytest.mark.parametrize("send_engine", p2p.available_send_engines())
+@pytest.mark.parametrize("recv_engine", ["auto", "recv_into", "pipeline", "splice", "loop"])
+def test_engines(tmp_path, out, port, receiver, send_engine, recv_engine):
+    src = make_file(tmp_path / "data.bin", SIZE)
+    rx = receiver(engine=recv_engine)
+    send(port, src, engine=send_engine)
+    assert rx.join().error is None
+    assert (out / "data.bin").read_bytes() == src.read_bytes()
+
+
+@pytest.mark.parametrize("size", [0, 1, 65536])
+def test_small_and_empty_files(tmp_path, out, port, receiver, size):
+    src = make_file(tmp_path / "small.bin", size)
+    rx = receiver()
+    send(port, src)
+    assert rx.join().error is None
+    assert (out / "small.bin").read_bytes() == src.read_bytes()
+
+
+def test_parallel_streams(tmp_path, out, port, receiver):
+    src = make_file(tmp_path / "big.bin", 8 * 1024 * 1024)
+    rx = receiver()
+    send(port, src, streams=4)
+    assert rx.join().error is None
+    assert (out / "big.bin").read_bytes() == src.read_bytes()
+    assert any("4 paralel akış" in message for message in rx.messages())
+
+
+def test_existing_file_is_not_overwritten(tmp_path, out, port, receiver):
+    src = make_file(tmp_path / "data.bin", 1000)
+    (out / "data.bin").write_bytes(b"keep me")
+    rx = receiver()
+    send(port, src)
+    assert rx.join().error is None
+    assert (out / "data.bin").read_bytes() == b"keep me"
+    assert (out / "data_1.bin").read_bytes() == src.read_bytes()
+
+
+def test_async_transfers_share_one_loop(tmp_path, port):
+    srcs = [make_file(tmp_path / f"f{i}.bin", 500_000 + i, seed=i + 1) for i in range(3)]
+    outs = [tmp_path / f"out{i}" for i in range(3)]
+
+    async def main() -> None:
+        listening = [asyncio.Event() for _ in srcs]
+
+        def observer(index):
+            def seen(event) -> None:
+                if isinstance(event, p2p.ListeningEvent):
+                    listening[index].set()
+            return seen
+
+        receivers = [asyncio.create_task(p2p.async_receive_file(HOST, port + i, PIN, outs[i], observer=observer(i)))
+                     for i in range(len(srcs))]
+        for event in listening:
+            await event.wait()
+        await asyncio.gather(*(p2p.async_send_file(HOST, port + i, PIN, src, observer=quiet)
+                               for i, src in enumerate(srcs)))
+        await asyncio.gather(*receivers)
+
+    asyncio.run(main())
+    for src, path in zip(srcs, outs):
+        assert (path / src.name).read_bytes() == src.read_bytes()
+
+
+def test_blocking_api_inside_running_loop(tmp_path, out, port, receiver):
+    src = make_file(tmp_path / "data.bin", 200_000)
+    rx = receiver()
+
+    async def host_app() -> None:
+        send(port, src)
+
+    asyncio.run(host_app())
+    assert rx.join().error is None
+    assert (out / "data.bin").read_bytes() == src.read_bytes()
+
+
+TREE = {"a.txt": 10, "sub/b.bin": 300_000, "sub/deeper/c.bin": 2_000_000, "empty.txt": 0}
+
+
+def make_tree(root):
+    for rel, size in TREE.items():
+        make_file(root / rel, size, seed=size + 1)
+    (root / "empty_dir").mkdir()
+    return root
+
+
+def test_directory_tree(tmp_path, out, port, receiver):
+    root = make_tree(tmp_path / "tree")
+    rx = receiver()
+    send(port, root)
+    assert rx.join().error is None
+    for rel in TREE:
+        assert (out / "tree" / rel).read_bytes() == (root / rel).read_bytes()
+    assert (out / "tree" / "empty_dir").is_dir()
+
+
+def test_directory_as_zip(tmp_path, out, port, receiver):
+    root = make_tree(tmp_path / "tree")
+    rx = receiver()
+    send(port, root, dir_mode="zip")
+    assert rx.join().error is None
+    with zipfile.ZipFile(out / "tree.zip") as archive:
+        for rel in TREE:
+            assert archive.read(rel) == (root / rel).read_bytes()
+
+
+def test_compressed_directory_tree(tmp_path, out, port, receiver):
+    root = tmp_path / "logs"
+    for i in range(3):
+        (root / f"{i}.log").parent.mkdir(parents=True, exist_ok=True)
+        (root / f"{i}.log").write_bytes(b"timestamp=1 level=info message=ok\n" * 40_000)
+    rx = receiver()
+    send(port, root, compress="zlib")
+    assert rx.join().error is None
+    for i in range(3):
+        assert (out / "logs" / f"{i}.log").read_bytes() == (root / f"{i}.log").read_bytes()
+
+
+def test_compressed_file(tmp_path, out, port, receiver):
+    src = tmp_path / "text.csv"
+    src.write_bytes(b"id,name,value\n" + b"".join(b"%d,row,%d\n" % (i, i * 7) for i in range(200_000)))
+    rx = receiver()
+    send(port, src, compress="zlib")
+    assert rx.join().error is None
+    assert (out / "text.csv").read_bytes() == src.read_bytes()
+    assert any("sıkıştırma kabul edildi" in message for message in rx.messages())
+
+
+def test_delta_against_old_copy(tmp_path, out, port, receiver):
+    old = make_file(out / "doc.bin", 2_000_000, seed=7).read_bytes()
+    new = old[:500_000] + b"inserted bytes" + old[500_000:1_500_000] + old[1_600_000:]
+    src = tmp_path / "doc.bin"
+    src.write_bytes(new)
+    rx = receiver()
+    send(port, src, delta=True)
+    assert rx.join().error is None
+    assert (out / "doc.bin").read_bytes() == old
+    assert (out / "doc_1.bin").read_bytes() == new
+    assert any("Delta:" in message for message in rx.messages())
+
+
+def test_resume_after_truncated_stream(tmp_path, out, port):
+    src = make_file(tmp_path / "movie.bin", 4 * 1024 * 1024)
+    stat = src.stat()
+    rx = Receiver(out, port, resume=True)
+    conn = client(port)
+    p2p.send_frame(conn, {"name": src.name, "size": stat.st_size, "mtime": stat.st_mtime_ns, "streams": 1,
+                          "digests": ["sha256"]})
+    assert p2p.recv_reply(conn)["offset"] == 0
+    conn.sendall(src.read_bytes()[:1_500_000])
+    conn.close()
+    assert isinstance(rx.join().error, ConnectionError)
+    assert (out / "movie.bin.part").exists()
+
+    rx = Receiver(out, port, resume=True)
+    messages: list[str] = []
+    send(port, src, observer=lambda event: messages.append(event.message))
+    assert rx.join().error is None
+    assert (out / "movie.bin").read_bytes() == src.read_bytes()
+    assert not (out / "movie.bin.part").exists()
+    assert any("Alıcıda" in (message or "") and "bayt mevcut" in (message or "") for message in messages)
+
+
+def test_merkle_repair_of_corrupted_block(tmp_path, out, port, receiver, monkeypatch):
+    src = make_file(tmp_path / "data.bin", SIZE)
+    real = p2p._send_payload_loop
+
+    class FlipOnce:
+        """Socket proxy that corrupts one byte of the first large send."""
+
+        def __init__(self, conn):
+            self.conn, self.done = conn, False
+
+        def sendall(self, data):
+            if not self.done and len(data) > 1000:
+                self.done = True
+                data = bytes(data[:100]) + bytes([data[100] ^ 0xFF]) + bytes(data[101:])
+            return self.conn.sendall(data)
+
+        def __getattr__(self, name):
+            return getattr(self.conn, name)
+
+    monkeypatch.setattr(p2p, "_send_payload_loop", lambda conn, *args: real(FlipOnce(conn), *args))
+    rx = receiver(engine="pipeline")
+    send(port, src, engine="loop", pool=p2p.ConnectionPool())
+    assert rx.join().error is None
+    assert (out / "data.bin").read_bytes() == src.read_bytes()
+    assert any("blok onarıldı" in message for message in rx.messages())
+
+
+def test_session_ticket_resumes_second_handshake(tmp_path, out, port):
+    src = make_file(tmp_path / "data.bin", 100_000)
+    before = p2p.SESSION_TICKETS.resumed
+    for _ in range(2):
+        rx = Receiver(out, port)
+        send(port, src)
+        assert rx.join().error is None
+    assert p2p.SESSION_TICKETS.resumed == before + 1
+    assert sorted(path.name for path in out.iterdir()) == ["data.bin", "data_1.bin"]
+
+
+def test_handshake_nonce_keeps_its_random_bytes():
+    a, b = socket.socketpair()
+    with a, b:
+        b.sendall(b"x" * p2p.HASH_SIZE)
+        b.settimeout(5)
+        key = p2p.derive_key(PIN)
+        steps = p2p._handshake_steps(a, key, initiator=False)
+        op, nonce = next(steps)
+        assert op == "send" and nonce.startswith(p2p.MAGIC_V2)
+        assert len(nonce) - len(p2p.MAGIC_V2) == 12
+
+
+def test_wrong_pin_is_refused(tmp_path, out, port, receiver):
+    src = make_file(tmp_path / "data.bin", 1000)
+    rx = receiver()
+    with pytest.raises(PermissionError):
+        p2p.send_file(HOST, port, "000000", src, observer=quiet)
+    assert isinstance(rx.join().error, PermissionError)
+    assert list(out.iterdir()) == []
+
+
+def test_daemon_serves_pooled_senders(tmp_path, out, port):
+    listening = threading.Event()
+    daemon = p2p.ReceiverDaemon(HOST, port, PIN, out, observer=lambda e: isinstance(e, p2p.ListeningEvent) and listening.set())
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    assert listening.wait(10)
+    pool = p2p.ConnectionPool()
+    try:
+        for i in range(3):
+            send(port, make_file(tmp_path / f"f{i}.bin", 100_000 + i, seed=i + 1), pool=pool)
+        p2p.send_files(HOST, port, PIN, [make_file(tmp_path / f"b{i}.bin", 5000, seed=i + 9) for i in range(2)],
+                       pool=pool, observer=quiet)
+    finally:
+        pool.close()
+        daemon.stop()
+        thread.join(10)
+    assert sorted(path.name for path in out.iterdir()) == ["b0.bin", "b1.bin", "f0.bin", "f1.bin", "f2.bin"]
+    assert len(daemon.stats) == 4